@@ -0,0 +1,68 @@
+from datetime import date
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractYear
+
+# Age in whole years: from date_of_birth when known, otherwise the age
+# entered in Section A. Computed in the database for listing and export,
+# so filtering and ordering by age never loads rows into Python.
+
+# band -> (label, lowest age, first age past the band)
+AGE_BANDS = {
+    'paediatric': ('Paediatric (under 18)', None, 18),
+    'adult': ('Adult (18-64)', 18, 65),
+    'elderly': ('Elderly (65+)', 65, None),
+}
+
+
+def age_on(date_of_birth, day):
+    return day.year - date_of_birth.year - ((day.month, day.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def years_before(day, years):
+    # The date someone born `years` earlier turns `years` old; 29 February
+    # birthdays fall on the 28th in common years
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+# ------------------------------
+# Queryset helpers
+# ------------------------------
+def age_expression(as_of=None):
+    """Age on `as_of` (default today) as an annotation: .annotate(age_years=age_expression())."""
+    as_of = as_of or date.today()
+    birthday_still_ahead = (
+        Q(date_of_birth__month__gt=as_of.month)
+        | Q(date_of_birth__month=as_of.month, date_of_birth__day__gt=as_of.day)
+    )
+    return Case(
+        When(date_of_birth__isnull=True, then=F('age')),
+        default=Value(as_of.year) - ExtractYear('date_of_birth') - Case(
+            When(birthday_still_ahead, then=Value(1)), default=Value(0),
+        ),
+        output_field=IntegerField(),
+    )
+
+
+def age_band_q(band, as_of=None):
+    """
+    Filter for consults whose age on `as_of` falls in `band`. Written as
+    ranges on date_of_birth and age (both indexed) rather than on the
+    computed age. Raises ValueError for an unknown band.
+    """
+    if band not in AGE_BANDS:
+        raise ValueError(f"Unknown age band {band!r}; choose from {', '.join(AGE_BANDS)}")
+    as_of = as_of or date.today()
+    _, low, high = AGE_BANDS[band]
+    with_dob = Q(date_of_birth__isnull=False)
+    without_dob = Q(date_of_birth__isnull=True, age__isnull=False)
+    if low is not None:
+        with_dob &= Q(date_of_birth__lte=years_before(as_of, low))
+        without_dob &= Q(age__gte=low)
+    if high is not None:
+        with_dob &= Q(date_of_birth__gt=years_before(as_of, high))
+        without_dob &= Q(age__lt=high)
+    return with_dob | without_dob
@@ -0,0 +1,198 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ConsultRollup, ICUConsultation, ReasonRollup
+
+# Columns that decide which rollup rows a consult counts towards
+ROLLUP_FIELDS = ('submitted', 'request_datetime', 'ward', 'requesting_discipline', 'decision', 'reason')
+
+# Rollup model -> its key columns, in key tuple order
+ROLLUP_KEYS = {
+    ConsultRollup: ('day', 'ward', 'requesting_discipline', 'decision'),
+    ReasonRollup: ('day', 'reason', 'decision'),
+}
+
+# Backends with INSERT ... ON CONFLICT (...) DO UPDATE
+UPSERT_VENDORS = ('sqlite', 'postgresql')
+
+DEFAULT_ANALYTICS_DAYS = 30
+REBUILD_CHUNK_SIZE = 2000
+
+
+# ------------------------------
+# Which rollup rows one consult counts towards
+# ------------------------------
+def consult_day(request_datetime):
+    if timezone.is_aware(request_datetime):
+        return timezone.localdate(request_datetime)
+    return request_datetime.date()
+
+
+def rollup_counts(values):
+    """Counter of (model, key) -> 1 for a consult's ROLLUP_FIELDS values."""
+    counts = Counter()
+    if not values['submitted']:
+        return counts
+    day = consult_day(values['request_datetime'])
+    decision = values['decision'] or ''
+    counts[ConsultRollup, (day, values['ward'], values['requesting_discipline'], decision)] += 1
+    for reason in set(values['reason'] or []):
+        counts[ReasonRollup, (day, reason, decision)] += 1
+    return counts
+
+
+def consult_rollup_counts(consult):
+    return rollup_counts({name: getattr(consult, name) for name in ROLLUP_FIELDS})
+
+
+# ------------------------------
+# Applying changes: one UPDATE ... SET count = count + n per touched row
+# ------------------------------
+def apply_rollup_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if connection.vendor in UPSERT_VENDORS:
+        upsert_rollup_deltas(deltas)
+        return
+    with transaction.atomic():
+        # Make sure every touched row exists; rows already there are skipped
+        for model, key_fields in ROLLUP_KEYS.items():
+            model.objects.bulk_create(
+                [model(**dict(zip(key_fields, key))) for row_model, key in deltas if row_model is model],
+                ignore_conflicts=True, batch_size=500,
+            )
+        for (model, key), delta in deltas.items():
+            model.objects.filter(**dict(zip(ROLLUP_KEYS[model], key))).update(count=F('count') + delta)
+
+
+def upsert_rollup_deltas(deltas):
+    # Bulk imports touch thousands of rows at once: one prepared
+    # INSERT ... ON CONFLICT DO UPDATE through executemany() per table
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, key_fields in ROLLUP_KEYS.items():
+            rows = [[*key, delta] for (row_model, key), delta in deltas.items() if row_model is model]
+            if not rows:
+                continue
+            table = quote(model._meta.db_table)
+            columns = ', '.join(quote(name) for name in key_fields)
+            placeholders = ', '.join(['%s'] * (len(key_fields) + 1))
+            cursor.executemany(
+                f"INSERT INTO {table} ({columns}, {quote('count')}) VALUES ({placeholders}) "
+                f"ON CONFLICT ({columns}) DO UPDATE SET {quote('count')} = {table}.{quote('count')} + excluded.{quote('count')}",
+                rows,
+            )
+
+
+def rollups_before_save(consult, update_fields):
+    """
+    The rollup rows `consult` counted towards before this save, or None if
+    the save cannot change them (so the post_save side has nothing to do).
+    """
+    if consult._state.adding:
+        return Counter()
+    if update_fields is not None:
+        if not set(update_fields) & set(ROLLUP_FIELDS):
+            return None
+        if not consult.submitted and 'submitted' not in update_fields:
+            return None  # a draft staying a draft
+    return stored_rollups(consult)
+
+
+def stored_rollups(consult):
+    # What the database row counts towards, however stale `consult` is
+    previous = ICUConsultation.objects.filter(pk=consult.pk).values(*ROLLUP_FIELDS).first()
+    return rollup_counts(previous) if previous else Counter()
+
+
+def update_rollups(before, after):
+    deltas = Counter(after)
+    deltas.subtract(before)
+    apply_rollup_deltas(deltas)
+
+
+def add_to_rollups(consults):
+    # Bulk inserts skip the model signals
+    counts = Counter()
+    for consult in consults:
+        counts.update(consult_rollup_counts(consult))
+    apply_rollup_deltas(counts)
+
+
+# ------------------------------
+# Full rebuild (backfill, or repair after raw SQL edits)
+# ------------------------------
+def rebuild_rollups():
+    """Recount every rollup row from the consult table; returns the number of consults counted."""
+    counts = Counter()
+    total = 0
+    rows = ICUConsultation.objects.filter(submitted=True).values(*ROLLUP_FIELDS)
+    for values in rows.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        counts.update(rollup_counts(values))
+        total += 1
+
+    with transaction.atomic():
+        for model, key_fields in ROLLUP_KEYS.items():
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [
+                    model(count=count, **dict(zip(key_fields, key)))
+                    for (row_model, key), count in counts.items()
+                    if row_model is model
+                ],
+                batch_size=500,
+            )
+    return total
+
+
+# ------------------------------
+# Dashboard queries: rollup tables only
+# ------------------------------
+def rollup_totals(model, since, *group_by):
+    return (
+        model.objects.filter(day__gte=since)
+        .values(*group_by)
+        .annotate(total=Sum('count'))
+        .filter(total__gt=0)
+        .order_by(*group_by)
+    )
+
+
+def pivot(rows, row_field, decisions):
+    # [{row_field: x, decision: d, total: n}] -> [(x, [n per decision], row total)]
+    table = {}
+    for row in rows:
+        table.setdefault(row[row_field], Counter())[row['decision']] += row['total']
+    return [
+        (value, [counts[decision] for decision in decisions], sum(counts.values()))
+        for value, counts in sorted(table.items(), key=lambda item: -sum(item[1].values()))
+    ]
+
+
+def analytics_summary(days=DEFAULT_ANALYTICS_DAYS):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    decisions = [''] + [value for value, _ in ICUConsultation.DECISION_CHOICES]
+    by_decision = Counter()
+    for row in rollup_totals(ConsultRollup, since, 'decision'):
+        by_decision[row['decision']] = row['total']
+    return {
+        'since': since,
+        'days': days,
+        'decision_labels': ['Pending'] + [label for _, label in ICUConsultation.DECISION_CHOICES],
+        'total': sum(by_decision.values()),
+        'by_decision': [by_decision[decision] for decision in decisions],
+        'by_day': [(row['day'], row['total']) for row in rollup_totals(ConsultRollup, since, 'day')],
+        'breakdowns': [
+            ('By ward', pivot(rollup_totals(ConsultRollup, since, 'ward', 'decision'), 'ward', decisions)),
+            ('By requesting discipline', pivot(
+                rollup_totals(ConsultRollup, since, 'requesting_discipline', 'decision'),
+                'requesting_discipline', decisions,
+            )),
+            ('By reason', pivot(rollup_totals(ReasonRollup, since, 'reason', 'decision'), 'reason', decisions)),
+        ],
+    }
@@ -0,0 +1,181 @@
+import hashlib
+import json
+from datetime import date, datetime
+
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+
+from .exports import filter_consults
+from .models import ICUConsultation
+from .pagination import encode_position, get_page_size, keyset_queryset
+
+# Read-only JSON API for other hospital systems (bed management, the ED
+# whiteboard), versioned in the URL: /api/v1/consults/. Rows are read
+# with values_list() -- only the requested columns, no model instances --
+# and serialised in one call, so a 10k row page is mostly database time.
+
+API_FIELDS = [field.name for field in ICUConsultation._meta.concrete_fields]
+DEFAULT_API_PAGE_SIZE = 100
+MAX_API_PAGE_SIZE = 10000
+MAX_BATCH_IDS = 1000
+
+# ?<param>= filters on top of the export ones (ward, discipline, decision,
+# date_from, date_to, age_band)
+API_EXACT_FILTERS = {'hospital_number': 'hospital_number'}
+BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+class APIError(ValueError):
+    pass
+
+
+# ------------------------------
+# Query parameters
+# ------------------------------
+def api_fields(value):
+    """?fields=a,b,c -> column list ('id' always first); all columns when absent."""
+    if not value:
+        return list(API_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise APIError(f"Unknown field(s): {', '.join(unknown)}")
+    return ['id'] + [name for name in dict.fromkeys(fields) if name != 'id']
+
+
+def batch_ids(value):
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise APIError("ids must be a comma-separated list of integers")
+    if not ids or len(ids) > MAX_BATCH_IDS:
+        raise APIError(f"ids takes between 1 and {MAX_BATCH_IDS} ids")
+    return list(dict.fromkeys(ids))
+
+
+def api_queryset(params):
+    try:
+        consults = filter_consults(ICUConsultation.objects.all(), params)
+    except ValueError as exc:
+        raise APIError(str(exc))
+    for param, field in API_EXACT_FILTERS.items():
+        if params.get(param):
+            consults = consults.filter(**{field: params[param]})
+    if params.get('submitted'):
+        if params['submitted'].lower() not in BOOLEAN_VALUES:
+            raise APIError("submitted must be true or false")
+        consults = consults.filter(submitted=BOOLEAN_VALUES[params['submitted'].lower()])
+    return consults
+
+
+# ------------------------------
+# Serialisation
+# ------------------------------
+def json_default(value):
+    # Same text as orjson with OPT_UTC_Z, so both encoders agree byte for byte
+    if isinstance(value, datetime):
+        return value.isoformat().replace('+00:00', 'Z')
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def dumps(payload):
+    try:
+        import orjson  # optional dependency; several times faster on big pages
+    except ImportError:
+        return json.dumps(payload, default=json_default, ensure_ascii=False, separators=(',', ':')).encode()
+    return orjson.dumps(payload, default=json_default, option=orjson.OPT_UTC_Z)
+
+
+def json_response(payload, status=200):
+    return HttpResponse(dumps(payload), status=status, content_type='application/json')
+
+
+def error_response(exc):
+    return json_response({'error': str(exc)}, status=400)
+
+
+def rows_as_dicts(rows, fields):
+    return [dict(zip(fields, row)) for row in rows]
+
+
+# ------------------------------
+# Conditional GET: any consult, submitted or not, may be listed
+# ------------------------------
+def api_etag(request, *args, **kwargs):
+    if not hasattr(request, '_consult_api_mark'):
+        request._consult_api_mark = ICUConsultation.objects.aggregate(last_updated=Max('updated_at'), total=Count('id'))
+    mark = request._consult_api_mark
+    stamp = mark['last_updated'].isoformat() if mark['last_updated'] else ''
+    raw = f"api|{stamp}|{mark['total']}|{request.GET.urlencode()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# ------------------------------
+# Views
+# ------------------------------
+def list_page(request, fields):
+    consults = api_queryset(request.GET)
+    page_size = get_page_size(request, default=DEFAULT_API_PAGE_SIZE, maximum=MAX_API_PAGE_SIZE)
+    # The cursor needs (request_datetime, id) of the last row, asked for or not
+    columns = fields + [name for name in ('request_datetime',) if name not in fields]
+    rows = list(keyset_queryset(consults.values_list(*columns), request.GET.get('cursor'), page_size))
+
+    next_url = next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = encode_position(last['request_datetime'], last['id'])
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"?{params.urlencode()}")
+    if len(columns) > len(fields):
+        rows = [row[:len(fields)] for row in rows]
+    return {'results': rows_as_dicts(rows, fields), 'next_cursor': next_cursor, 'next': next_url}
+
+
+def batch(fields, ids):
+    # One query for the lot, answered in the order asked
+    found = {row[0]: row for row in ICUConsultation.objects.filter(id__in=ids).values_list(*fields)}
+    return {
+        'results': rows_as_dicts([found[pk] for pk in ids if pk in found], fields),
+        'missing': [pk for pk in ids if pk not in found],
+    }
+
+
+@require_GET
+@gzip_page
+@cache_control(no_cache=True)
+@condition(etag_func=api_etag)
+def consult_list(request):
+    """
+    GET /api/v1/consults/: newest first, keyset-paginated (?cursor=,
+    ?page_size= up to 10000), filtered by ?ward= ?discipline= ?decision=
+    ?hospital_number= ?submitted= ?date_from= ?date_to= ?age_band=.
+    ?ids=1,2,3 fetches those consults instead, in one query.
+    ?fields=a,b limits the columns read and returned.
+    """
+    try:
+        fields = api_fields(request.GET.get('fields'))
+        if request.GET.get('ids'):
+            return json_response(batch(fields, batch_ids(request.GET['ids'])))
+        return json_response(list_page(request, fields))
+    except APIError as exc:
+        return error_response(exc)
+
+
+@require_GET
+@gzip_page
+def consult_detail(request, pk):
+    try:
+        fields = api_fields(request.GET.get('fields'))
+    except APIError as exc:
+        return error_response(exc)
+    row = ICUConsultation.objects.filter(pk=pk).values_list(*fields).first()
+    if row is None:
+        raise Http404("No such consult")
+    return json_response(dict(zip(fields, row)))
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ConsultsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'consults'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_timer
+        connection_created.connect(install_query_timer)
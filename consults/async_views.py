@@ -0,0 +1,244 @@
+import asyncio
+from functools import wraps
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.views import View
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .forms import (
+    SectionAForm,
+    SectionBForm,
+    SectionCForm,
+    SectionDForm,
+    SectionEForm,
+    SectionFForm,
+    SectionGForm
+)
+from .events import RESYNC_PAYLOAD, get_broker
+from .fragments import asummary_fragment
+from .locking import awrite_with_retry
+from .models import ICUConsultation
+from .pagination import akeyset_page, get_page_size
+from .signals import decision_recorded, severity_changed
+from .views import (
+    LIST_MARK,
+    consult_etag,
+    consult_last_modified,
+    consult_versions,
+    list_etag,
+    list_last_modified,
+    section_fields,
+    submit_consult,
+    summary_list_context,
+    summary_list_queryset,
+)
+
+# Async counterparts of the consult workflow views, served when
+# CONSULT_ASYNC_VIEWS is on. Templates, forms and conditional-GET
+# validators are shared with views.py; only the database calls differ.
+
+
+async def asave_section(form):
+    # save_section() for async views
+    if not form.has_changed():
+        return form.instance
+    consult = form.save(commit=False)
+    await awrite_with_retry(consult.save, update_fields=section_fields(form) + ['updated_at'])
+    return consult
+
+
+# ------------------------------
+# Section A: Patient Details
+# ------------------------------
+class SectionAView(View):
+    async def get(self, request):
+        form = SectionAForm()
+        return render(request, 'consults/section_a.html', {'form': form})
+
+    async def post(self, request):
+        form = SectionAForm(request.POST)
+        if form.is_valid():
+            consult = form.save(commit=False)
+            await awrite_with_retry(consult.save)
+            await request.session.aset('consult_id', consult.id)
+            return redirect('consults:section_b', pk=consult.id)
+        return render(request, 'consults/section_a.html', {'form': form})
+
+
+# ------------------------------
+# Sections B-G: edit one section of an existing consult
+# ------------------------------
+class SectionView(View):
+    form_class = None
+    template_name = None
+    next_view = None
+
+    async def get(self, request, pk):
+        consult = await aget_object_or_404(ICUConsultation, pk=pk)
+        form = self.form_class(instance=consult)
+        return render(request, self.template_name, {'form': form, 'consult': consult})
+
+    async def post(self, request, pk):
+        consult = await aget_object_or_404(ICUConsultation, pk=pk)
+        form = self.form_class(request.POST, instance=consult)
+        if form.is_valid():
+            await asave_section(form)
+            await self.saved(form, consult)
+            return redirect(self.next_view, pk=consult.pk)
+        return render(request, self.template_name, {'form': form, 'consult': consult})
+
+    async def saved(self, form, consult):
+        pass
+
+
+class SectionBView(SectionView):
+    form_class = SectionBForm
+    template_name = 'consults/section_b.html'
+    next_view = 'consults:section_c'
+
+
+class SectionCView(SectionView):
+    form_class = SectionCForm
+    template_name = 'consults/section_c.html'
+    next_view = 'consults:section_d'
+
+
+class SectionDView(SectionView):
+    form_class = SectionDForm
+    template_name = 'consults/section_d.html'
+    next_view = 'consults:section_e'
+
+    async def saved(self, form, consult):
+        if consult.submitted and getattr(form, 'severity_changed', False):
+            await severity_changed.asend(sender=ICUConsultation, consult=consult)
+
+
+class SectionEView(SectionView):
+    form_class = SectionEForm
+    template_name = 'consults/section_e.html'
+    next_view = 'consults:section_f'
+
+
+class SectionFView(SectionView):
+    form_class = SectionFForm
+    template_name = 'consults/section_f.html'
+    next_view = 'consults:section_g'
+
+
+class SectionGView(SectionView):
+    form_class = SectionGForm
+    template_name = 'consults/section_g.html'
+    next_view = 'consults:consult_summary'
+
+    async def saved(self, form, consult):
+        if 'decision' in form.changed_data:
+            await decision_recorded.asend(sender=ICUConsultation, consult=consult)
+
+
+# ------------------------------
+# Summary Page
+# ------------------------------
+class ConsultSummaryView(View):
+    async def get(self, request, pk):
+        consult = await aget_object_or_404(consult_versions(), pk=pk)
+        return render(request, 'consults/consult_summary.html', {
+            'consult': consult,
+            'summary_html': await asummary_fragment('consult_summary', consult),
+        })
+
+    async def post(self, request, pk):
+        consult = await aget_object_or_404(ICUConsultation, pk=pk)
+        newly_submitted = not consult.submitted
+        consult.submitted = True
+        await awrite_with_retry(submit_consult, consult, newly_submitted)
+        return render(request, 'consults/consult_complete.html', {'consult': consult})
+
+
+# ------------------------------
+# Conditional GET: load the validators' data before condition() runs
+# ------------------------------
+# condition() calls its ETag/Last-Modified functions synchronously, so the
+# queries behind them are awaited first and memoised on the request, where
+# the shared functions in views.py find them.
+def preload(loader):
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            await loader(request, *args, **kwargs)
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+async def load_list_mark(request):
+    request._consult_list_mark = await ICUConsultation.objects.filter(submitted=True).aaggregate(**LIST_MARK)
+
+
+async def load_consult_probe(request, id):
+    request._consult_probe = await consult_versions().filter(pk=id).afirst()
+
+
+# ------------------------------
+# View All Submitted Summaries / Review Single Summary
+# ------------------------------
+@cache_control(no_cache=True)
+@preload(load_list_mark)
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
+async def all_summaries(request):
+    summaries, next_cursor = await akeyset_page(
+        summary_list_queryset(request), request.GET.get('cursor'), get_page_size(request),
+    )
+    return render(request, 'consults/all_summaries.html', summary_list_context(request, summaries, next_cursor))
+
+
+@cache_control(no_cache=True)
+@preload(load_consult_probe)
+@condition(etag_func=consult_etag, last_modified_func=consult_last_modified)
+async def review_summary(request, id):
+    consult = request._consult_probe
+    if consult is None:
+        raise Http404("No consultation matches the given query.")
+    return render(request, 'consults/review_summary.html', {
+        'consult': consult,
+        'summary_html': await asummary_fragment('review_summary', consult),
+    })
+
+
+# ------------------------------
+# Live feed: Server-Sent Events
+# ------------------------------
+KEEPALIVE_SECONDS = 15
+RECONNECT_MS = 5000
+
+
+async def event_stream(broker, subscription):
+    try:
+        yield f'retry: {RECONNECT_MS}\n\n'
+        while True:
+            try:
+                seq, payload = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+                continue
+            yield f'id: {seq}\ndata: {payload}\n\n'
+            if payload == RESYNC_PAYLOAD:
+                break  # told to resync; the browser reloads the page
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def consult_events(request):
+    # Every open dashboard holds one connection, so the feed needs ASGI.
+    # Under WSGI a 204 tells EventSource to stop reconnecting.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    broker = get_broker()
+    response = StreamingHttpResponse(event_stream(broker, broker.subscribe()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # no proxy buffering (nginx)
+    return response
@@ -0,0 +1,332 @@
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import OperationalError, connection
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+
+from .forms import SectionGForm
+from .instrumentation import percentile
+from .locking import is_lock_error, lock_stats, reset_lock_stats
+from .models import ICUConsultation
+from .views import save_section
+
+
+# ------------------------------
+# Throwaway database for benchmark runs
+# ------------------------------
+@contextmanager
+def bench_database(verbosity=0, name=None):
+    # Same machinery as the test runner: a fresh, migrated copy of the
+    # default database that is dropped afterwards. `name` puts it in a
+    # file (SQLite otherwise uses an in-memory database).
+    if name is not None:
+        connection.settings_dict['TEST'] = {**connection.settings_dict.get('TEST', {}), 'NAME': name}
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def seed_consults(count, batch_size=1000):
+    now = timezone.now()
+    consults = [
+        ICUConsultation(
+            patient_name=f'Bench Patient {i}',
+            age=20 + i % 70,
+            gender='female' if i % 2 else 'male',
+            hospital_number=f'B{i:07d}',
+            ward=ICUConsultation.WARD_CHOICES[i % len(ICUConsultation.WARD_CHOICES)][0],
+            request_datetime=now - timedelta(minutes=i),
+            requesting_discipline='internal medicine',
+            requesting_dr='Dr Bench',
+            reason=['sepsis_syndrome'],
+            clinical_summary='Benchmark narrative. ' * 40,
+            submitted=True,
+        )
+        for i in range(count)
+    ]
+    ICUConsultation.objects.bulk_create(consults, batch_size=batch_size)
+
+
+# ------------------------------
+# Measurements
+# ------------------------------
+def measure(fn, repeat):
+    """Call fn() `repeat` times; return wall and CPU timings in milliseconds."""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn()
+        cpu.append((time.process_time() - cpu_start) * 1000)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+    return {
+        'wall_ms_mean': statistics.fmean(wall),
+        'wall_ms_p50': percentile(wall, 50),
+        'wall_ms_p95': percentile(wall, 95),
+        'cpu_ms_mean': statistics.fmean(cpu),
+    }
+
+
+# ------------------------------
+# Concurrent load: WSGI-style threads vs ASGI tasks
+# ------------------------------
+class WorkflowURLConf:
+    """Root URLconf serving the consults app from `workflow` (views or async_views)."""
+
+    def __init__(self, workflow):
+        from .urls import consult_urlpatterns
+        self.urlpatterns = [path('', include((consult_urlpatterns(workflow), 'consults')))]
+
+
+def load_summary(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'requests_per_s': len(latencies) / elapsed if elapsed else None,
+        'latency_ms_p50': percentile(latencies, 50),
+        'latency_ms_p95': percentile(latencies, 95),
+        'latency_ms_p99': percentile(latencies, 99),
+        'latency_ms_max': max(latencies) if latencies else None,
+    }
+
+
+def _split(urls, concurrency):
+    return [urls[i::concurrency] for i in range(concurrency)]
+
+
+def thread_load(urls, concurrency):
+    """GET every url from `concurrency` threads, one test Client each."""
+    def client_thread(batch):
+        client, latencies = Client(), []
+        try:
+            for url in batch:
+                start = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, (url, response.status_code)
+        finally:
+            connection.close()
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        batches = list(pool.map(client_thread, _split(urls, concurrency)))
+    return load_summary([ms for batch in batches for ms in batch], time.perf_counter() - start)
+
+
+def async_load(urls, concurrency):
+    """GET every url from `concurrency` tasks on one event loop, one AsyncClient each."""
+    async def client_task(batch):
+        client, latencies = AsyncClient(), []
+        for url in batch:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        return latencies
+
+    async def run():
+        return await asyncio.gather(*(client_task(batch) for batch in _split(urls, concurrency)))
+
+    start = time.perf_counter()
+    batches = asyncio.run(run())
+    return load_summary([ms for batch in batches for ms in batch], time.perf_counter() - start)
+
+
+# ------------------------------
+# End-to-end workflow: A -> G -> summary -> submit, then the read pages
+# ------------------------------
+# Valid POST data for every wizard section
+WORKFLOW_DATA = {
+    'section_a': {
+        'patient_name': 'Bench Flow', 'age': '61', 'gender': 'male', 'hospital_number': 'F0000001',
+        'ward': 'ward c', 'request_datetime': '2025-01-01T09:30', 'requesting_discipline': 'internal medicine',
+        'requesting_dr': 'Dr Bench', 'requesting_dr_contact': '0123', 'requesting_dr_speed_dial': '42',
+    },
+    'section_b': {'reason': ['sepsis_syndrome', 'respiratory_failure'], 'reason_other': ''},
+    'section_c': {'clinical_summary': 'Pneumonia with worsening hypoxia despite high flow oxygen. ' * 4},
+    'section_d': {
+        'airway_patent': 'on', 'intubated': 'no', 'breathing_spo2': '88', 'breathing_distress': 'yes',
+        'breathing_device': 'NRB', 'bp_systolic': '92', 'bp_diastolic': '55', 'circulation_inotropes': 'no',
+        'circulation_anti_hpt': 'no', 'heart_rate': '118', 'heart_rhythm': 'sinus', 'fluid_type': 'fluid_type1',
+        'fluid_urine_output': '20', 'temperature': '38.9', 'measures': 'paracetamol', 'gcs': '14',
+        'sedation': 'no',
+    },
+    'section_e': {
+        'latest_abg': 'pH 7.31 pCO2 6.1', 'key_labs': 'WCC 18, lactate 3.4', 'imaging_findings': 'RLL consolidation',
+        'time_tests_done': '2025-01-01T08:45',
+    },
+    'section_f': {
+        'airway': 'none', 'ventilation': 'HFNO 60L', 'iv_fluids': 'RL 1L', 'inotropes': 'none',
+        'antibiotics': 'ceftriaxone', 'other_interventions': '',
+    },
+    'section_g': {
+        'assessment': 'Needs ICU for NIV', 'decision': 'admit', 'plan_comments': 'Bed 4',
+        'consultant_name': 'Dr Jones', 'signature': 'RJ', 'datetime': '2025-01-01T11:00', 'contact_no': '555',
+    },
+}
+SECTIONS = ['section_b', 'section_c', 'section_d', 'section_e', 'section_f', 'section_g']
+
+
+class StepRecorder:
+    """Latency and query count of every request, by workflow step."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def request(self, step, call, expect=200):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = call()
+            elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code == expect, (step, response.status_code)
+        self.samples.setdefault(step, []).append((elapsed, len(ctx.captured_queries)))
+        return response
+
+    def summary(self):
+        steps = {}
+        for step, samples in self.samples.items():
+            latencies = [ms for ms, _ in samples]
+            steps[step] = {
+                **load_summary(latencies, sum(latencies) / 1000),
+                'queries_per_request': statistics.fmean(queries for _, queries in samples),
+            }
+        return steps
+
+
+def run_consult_flow(client, recorder):
+    """Create, fill in and submit one consult through the wizard URLs; returns its pk."""
+    recorder.request('section_a GET', lambda: client.get(reverse('consults:section_a')))
+    response = recorder.request(
+        'section_a POST', lambda: client.post(reverse('consults:section_a'), WORKFLOW_DATA['section_a']), 302,
+    )
+    pk = resolve(response.url).kwargs['pk']
+    for section in SECTIONS:
+        url = reverse(f'consults:{section}', args=[pk])
+        recorder.request(f'{section} GET', lambda: client.get(url))
+        recorder.request(f'{section} POST', lambda: client.post(url, WORKFLOW_DATA[section]), 302)
+    url = reverse('consults:consult_summary', args=[pk])
+    recorder.request('consult_summary GET', lambda: client.get(url))
+    recorder.request('consult_summary POST', lambda: client.post(url))
+    return pk
+
+
+def run_reads(client, recorder, pks, count, rng):
+    for _ in range(count):
+        recorder.request('all_summaries GET', lambda: client.get(reverse('consults:all_summaries')))
+        url = reverse('consults:review_summary', args=[rng.choice(pks)])
+        recorder.request('review_summary GET', lambda: client.get(url))
+
+
+def run_workflow_benchmark(flows, reads, seed=0):
+    """Drive `flows` full consults and `reads` list/review page pairs; returns the results dict."""
+    client, recorder, rng = Client(), StepRecorder(), random.Random(seed)
+    run_consult_flow(client, StepRecorder())  # warm-up: template loading, first connections
+    start = time.perf_counter()
+    created = [run_consult_flow(client, recorder) for _ in range(flows)]
+    pks = list(ICUConsultation.objects.filter(submitted=True).values_list('pk', flat=True)) or created
+    run_reads(client, recorder, pks, reads, rng)
+    elapsed = time.perf_counter() - start
+
+    steps = recorder.summary()
+    requests = sum(step['requests'] for step in steps.values())
+    return {
+        'total': {
+            'requests': requests,
+            'requests_per_s': requests / elapsed if elapsed else None,
+            'queries_per_request': sum(
+                step['queries_per_request'] * step['requests'] for step in steps.values()
+            ) / requests if requests else None,
+        },
+        'steps': steps,
+    }
+
+
+# ------------------------------
+# Comparing two benchmark runs
+# ------------------------------
+# Latency is noisy, query counts are not: any extra query is a regression
+COMPARED_METRICS = ('latency_ms_p50', 'latency_ms_p95', 'queries_per_request')
+
+
+def compare_results(baseline, current, threshold_pct):
+    """Return (rows, regressions); each row is (step, metric, before, after, change %)."""
+    rows, regressions = [], []
+    for step, after in current['steps'].items():
+        before = baseline['steps'].get(step)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            row = (step, metric, old, new, change)
+            rows.append(row)
+            limit = 0 if metric == 'queries_per_request' else threshold_pct
+            if change > limit + 1e-9:
+                regressions.append(row)
+    return rows, regressions
+
+
+# ------------------------------
+# Concurrent writers: one process per ward, all saving Section G
+# ------------------------------
+# Journal mode per stress mode (set once, before the writers start).
+# "plain" is Django's stock SQLite setup: rollback journal, deferred
+# transactions, the default 5 s busy timeout and no retries.
+STRESS_MODES = {
+    'concurrent': 'wal',
+    'plain': 'delete',
+}
+
+
+def set_journal_mode(mode):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={STRESS_MODES[mode]}')
+
+
+def stress_worker(mode, pks, writes, seed):
+    """Save Section G `writes` times on random consults; returns counts and latencies."""
+    if mode == 'plain':
+        connection.settings_dict['OPTIONS'] = {}
+        override_settings(CONSULT_DB_LOCK_RETRIES=0).enable()
+    reset_lock_stats()
+    rng = random.Random(seed)
+    decisions = [value for value, _ in ICUConsultation.DECISION_CHOICES]
+    latencies, locked, errors = [], 0, []
+    try:
+        for n in range(writes):
+            consult = ICUConsultation.objects.get(pk=rng.choice(pks))
+            form = SectionGForm({
+                'assessment': f'Reviewed by worker {seed}', 'decision': rng.choice(decisions),
+                'plan_comments': f'Plan {seed}-{n}', 'consultant_name': 'Dr Stress', 'signature': 'DS',
+                'datetime': '2025-01-01T11:00', 'contact_no': '555',
+            }, instance=consult)
+            if not form.is_valid():
+                errors.append(form.errors.as_json())
+                continue
+            start = time.perf_counter()
+            try:
+                save_section(form)
+            except OperationalError as exc:
+                if not is_lock_error(exc):
+                    raise
+                locked += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+    return {'saved': len(latencies), 'locked': locked, 'errors': errors, 'latencies': latencies, **lock_stats()}
@@ -0,0 +1,59 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.datastructures import MultiValueDict
+
+DRAFT_COOKIE = 'consult_draft'
+DRAFT_SALT = 'consults.drafts'
+DRAFT_TIMEOUT = 12 * 60 * 60  # a draft outlives a long shift, not a week
+
+
+# ------------------------------
+# Server-side buffer for an unsaved consult
+# ------------------------------
+class DraftStore:
+    """
+    Holds the raw POST data of each wizard section until the consult is
+    submitted. Sections live in the cache configured by CONSULT_DRAFT_CACHE;
+    the browser only carries a signed cookie with the draft key.
+    """
+
+    def __init__(self, request):
+        self.cache = caches[getattr(settings, 'CONSULT_DRAFT_CACHE', 'default')]
+        self.key = request.get_signed_cookie(DRAFT_COOKIE, default=None, salt=DRAFT_SALT)
+        self.is_new = self.key is None
+        if self.is_new:
+            self.key = secrets.token_urlsafe(16)
+        self._sections = None
+
+    @property
+    def cache_key(self):
+        return f'consults:draft:{self.key}'
+
+    @property
+    def sections(self):
+        if self._sections is None:
+            self._sections = self.cache.get(self.cache_key) or {}
+        return self._sections
+
+    def get(self, step):
+        data = self.sections.get(step)
+        return MultiValueDict(data) if data is not None else None
+
+    def save(self, step, post_data):
+        data = {name: values for name, values in post_data.lists() if name != 'csrfmiddlewaretoken'}
+        self.sections[step] = data
+        self.cache.set(self.cache_key, self.sections, DRAFT_TIMEOUT)
+
+    def clear(self):
+        self._sections = {}
+        self.cache.delete(self.cache_key)
+
+    def attach(self, response):
+        if self.is_new:
+            response.set_signed_cookie(
+                DRAFT_COOKIE, self.key, salt=DRAFT_SALT,
+                max_age=DRAFT_TIMEOUT, httponly=True, samesite='Lax',
+            )
+        return response
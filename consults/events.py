@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Per-subscriber backlog. A dashboard that falls this far behind is told
+# to reload instead of being fed a growing queue.
+SUBSCRIBER_QUEUE_SIZE = 100
+REDIS_CHANNEL = 'consults:events'
+
+# Stand-in event telling a lagging subscriber to reload
+RESYNC = {'type': 'resync'}
+
+
+# ------------------------------
+# Live consult events
+# ------------------------------
+def consult_event(event_type, consult):
+    # Just what the dashboards need to draw (or update) one row
+    return {
+        'type': event_type,
+        'id': consult.pk,
+        'patient_name': consult.patient_name,
+        'age': consult.get_calculated_age(),
+        'hospital_number': consult.hospital_number,
+        'requesting_dr': consult.requesting_dr,
+        'request_datetime': consult.request_datetime,
+        'decision': consult.decision,
+        'severity_score': consult.severity_score,
+    }
+
+
+def encode_event(event):
+    return json.dumps(event, cls=DjangoJSONEncoder)
+
+
+RESYNC_PAYLOAD = encode_event(RESYNC)
+
+
+# ------------------------------
+# In-process fan-out
+# ------------------------------
+class Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.lagging = False
+
+    def deliver(self, seq, payload):
+        # Runs on the subscriber's own event loop
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait((seq, payload))
+        except asyncio.QueueFull:
+            # Swap the backlog for one resync event in the same queue, so a
+            # consumer part way through it still reads the resync next
+            self.lagging = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((seq, RESYNC_PAYLOAD))
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """
+    Fans each published event out to every open subscription in this
+    process. Events are encoded once; publish() is safe to call from any
+    thread (sync views run in worker threads, the feed on the event loop).
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.sequence = itertools.count(1)
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self.fan_out(encode_event(event))
+
+    def fan_out(self, payload):
+        seq = next(self.sequence)
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, seq, payload)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # its loop has closed
+
+
+# ------------------------------
+# Cross-process: Redis pub/sub in front of the in-process fan-out
+# ------------------------------
+class RedisBroker(InProcessBroker):
+    """
+    Publishes to a Redis channel; one listener thread per process relays
+    the channel into the in-process fan-out, so every worker's dashboards
+    see events published by any worker.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        import redis  # optional dependency, only needed for this broker
+        self.redis = redis.Redis.from_url(url)
+        self.listener = None
+
+    def subscribe(self):
+        self.start_listener()
+        return super().subscribe()
+
+    def publish(self, event):
+        self.redis.publish(REDIS_CHANNEL, encode_event(event))
+
+    def start_listener(self):
+        with self.lock:
+            if self.listener is not None:
+                return
+            self.listener = threading.Thread(target=self.listen, name='consult-events', daemon=True)
+        self.listener.start()
+
+    def listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(REDIS_CHANNEL)
+        for message in pubsub.listen():
+            self.fan_out(message['data'].decode())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    # CONSULT_EVENTS_BROKER: "memory" (one process) or "redis"
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if getattr(settings, 'CONSULT_EVENTS_BROKER', 'memory') == 'redis':
+                _broker = RedisBroker(settings.CONSULT_EVENTS_REDIS_URL)
+            else:
+                _broker = InProcessBroker()
+        return _broker
+
+
+def publish_event(event_type, consult):
+    get_broker().publish(consult_event(event_type, consult))
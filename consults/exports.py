@@ -0,0 +1,131 @@
+import csv
+import io
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .ages import age_band_q
+from .models import ICUConsultation
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = [field.name for field in ICUConsultation._meta.concrete_fields if not field.generated]
+CHUNK_SIZE = 2000
+
+# value -> label for every field with choices, built once at import
+CHOICE_LABELS = {
+    field.name: dict(field.flatchoices)
+    for field in ICUConsultation._meta.concrete_fields
+    if field.choices
+}
+
+# ?<param>= / --<param> filters that match a column exactly
+EXACT_FILTERS = {
+    'ward': 'ward',
+    'discipline': 'requesting_discipline',
+    'decision': 'decision',
+}
+
+
+# ------------------------------
+# Export options (shared by the view and the management command)
+# ------------------------------
+def _day_start(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD), got {value!r}")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(options):
+    """
+    Build the export queryset from a mapping of options (request.GET or
+    command options). Raises ValueError on bad input.
+    """
+    return filter_consults(ICUConsultation.objects.filter(submitted=True), options).order_by('id')
+
+
+def filter_consults(consults, options):
+    # Also used by the JSON API (consults/api.py)
+    # Whole-day bounds on request_datetime keep the range index-friendly
+    if options.get('date_from'):
+        consults = consults.filter(request_datetime__gte=_day_start(options['date_from'], 'date_from'))
+    if options.get('date_to'):
+        end = _day_start(options['date_to'], 'date_to') + timedelta(days=1)
+        consults = consults.filter(request_datetime__lt=end)
+
+    for option, field in EXACT_FILTERS.items():
+        if options.get(option):
+            consults = consults.filter(**{field: options[option]})
+
+    # Age bands become date of birth / age ranges (indexed), not per-row ages
+    if options.get('age_band'):
+        consults = consults.filter(age_band_q(options['age_band']))
+
+    return consults
+
+
+def export_columns(value):
+    if not value:
+        return list(EXPORT_COLUMNS)
+    columns = [column.strip() for column in value.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    return columns
+
+
+# ------------------------------
+# Row streams
+# ------------------------------
+def export_rows(consults, columns, flatten_lists=False):
+    # One converter per column, picked up front instead of per value
+    converters = []
+    for column in columns:
+        if column in CHOICE_LABELS:
+            labels = CHOICE_LABELS[column]
+            converters.append(lambda value, labels=labels: labels.get(value, value))
+        elif column == 'reason' and flatten_lists:
+            converters.append(lambda value: '; '.join(value or []))
+        else:
+            converters.append(None)
+
+    for row in consults.values_list(*columns).iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            convert(value) if convert else value
+            for convert, value in zip(converters, row)
+        ]
+
+
+def csv_stream(consults, columns, rows_per_chunk=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(export_rows(consults, columns, flatten_lists=True), 1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_stream(consults, columns, rows_per_chunk=500):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    lines = []
+    for row in export_rows(consults, columns):
+        lines.append(encoder.encode(dict(zip(columns, row))))
+        if len(lines) == rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_stream(fmt, consults, columns):
+    if fmt == 'csv':
+        return csv_stream(consults, columns)
+    if fmt == 'ndjson':
+        return ndjson_stream(consults, columns)
+    raise ValueError(f"Unknown export format {fmt!r}; choose from {', '.join(EXPORT_FORMATS)}")
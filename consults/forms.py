@@ -1,5 +1,7 @@
 from django import forms
+from .ages import age_on
 from .models import ICUConsultation
+from .scoring import severity_score
 from datetime import date
 
 # ------------------------------
@@ -21,24 +23,28 @@ class SectionAForm(forms.ModelForm):
     # Ensure all fields are required
     def clean(self):
         cleaned_data = super().clean()
-        dob = cleaned_data.get("date_of_birth")
-        age = cleaned_data.get("age")
-        
-        # If DOB provided -> calculate age automatically
-        if dob:
-            today = date.today()
-            calculated_age = (
-                today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-            )
-            cleaned_data["age"] = calculated_age  # overwrite manual entry if any
-            
-        # If neither age nor DOB provided -> raise error
-        if not dob and not age:
-            raise forms.ValidationError("Please provide either Age or Date of Birth.")
-        
+        for field, message in clean_section_a(cleaned_data).items():
+            self.add_error(field, message)
         return cleaned_data
 
 
+# Section A cross-field rules, shared with the bulk importer.
+# Returns {field (None for the whole form): message}.
+def clean_section_a(cleaned_data):
+    dob = cleaned_data.get("date_of_birth")
+    age = cleaned_data.get("age")
+
+    # If DOB provided -> calculate age automatically
+    if dob:
+        cleaned_data["age"] = age_on(dob, date.today())  # overwrite manual entry if any
+
+    # If neither age nor DOB provided -> raise error
+    if not dob and not age:
+        return {None: "Please provide either Age or Date of Birth."}
+
+    return {}
+
+
 # ------------------------------
 # Section B: Reason for ICU Consult
 # ------------------------------
@@ -66,22 +72,29 @@ class SectionBForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = super().clean()
-        reasons = cleaned_data.get('reason', [])
-        reason_other = cleaned_data.get('reason_other')
-
-        if 'other' in reasons and not reason_other:
-            self.add_error('reason_other', 'Please specify the "Other" reason.')
-            
+        for field, message in clean_section_b(cleaned_data).items():
+            self.add_error(field, message)
         return cleaned_data
 
     def save(self, commit=True):
         instance = super().save(commit=False)
-        instance.reason = self.cleaned_data['reason']  # store list in JSONField
+        instance.reason = self.cleaned_data.get('reason', instance.reason)  # store list in JSONField
         if commit:
             instance.save()
         return instance
 
 
+# Section B cross-field rules, shared with the bulk importer
+def clean_section_b(cleaned_data):
+    reasons = cleaned_data.get('reason', [])
+    reason_other = cleaned_data.get('reason_other')
+
+    if 'other' in reasons and not reason_other:
+        return {'reason_other': 'Please specify the "Other" reason.'}
+
+    return {}
+
+
 # ------------------------------
 # Section C: Clinical Summary
 # ------------------------------
@@ -291,6 +304,18 @@ class SectionDForm(forms.ModelForm):
             'pupil_right_size', 'pupil_right_reactivity'
         ]
 
+    # Model columns that save() derives from this section's inputs
+    derived_fields = ['severity_score']
+
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        previous = instance.severity_score
+        instance.severity_score = severity_score(instance)
+        self.severity_changed = instance.severity_score != previous
+        if commit:
+            instance.save()
+        return instance
+
 circulation_inotropes = forms.BooleanField(required=False, widget=forms.CheckboxInput())
 circulation_anti_hpt = forms.BooleanField(required=False, widget=forms.CheckboxInput())
 # ------------------------------
@@ -0,0 +1,103 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import ICUConsultation
+
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+# Rendered summary fragments, by name
+FRAGMENT_TEMPLATES = {
+    'review_summary': 'consults/partials/review_summary_detail.html',
+    'consult_summary': 'consults/partials/consult_summary_detail.html',
+}
+
+# Per-process hit/miss counters
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def fragment_cache():
+    return caches[getattr(settings, 'CONSULT_FRAGMENT_CACHE', 'default')]
+
+
+def fragment_key(name, consult_pk):
+    return f'consults:fragment:{name}:{consult_pk}'
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+# ------------------------------
+# Rendered summary fragments
+# ------------------------------
+def summary_fragment(name, consult):
+    """
+    Return the rendered `name` fragment for `consult`, which only needs
+    `pk` and `updated_at` loaded; the full row is fetched on a miss.
+    Entries carry the updated_at they were rendered from, so a render that
+    races a section save can never be served once the save has landed.
+    """
+    version = consult.updated_at.isoformat()
+    key = fragment_key(name, consult.pk)
+
+    cached = fragment_cache().get(key)
+    if cached is not None and cached[0] == version:
+        _count('hits')
+        return mark_safe(cached[1])
+
+    _count('misses')
+    full = ICUConsultation.objects.get(pk=consult.pk)
+    html = render_to_string(FRAGMENT_TEMPLATES[name], {'consult': full})
+    fragment_cache().set(key, (version, str(html)), FRAGMENT_TIMEOUT)
+    return html
+
+
+async def asummary_fragment(name, consult):
+    # summary_fragment() for async views
+    version = consult.updated_at.isoformat()
+    key = fragment_key(name, consult.pk)
+
+    cached = await fragment_cache().aget(key)
+    if cached is not None and cached[0] == version:
+        _count('hits')
+        return mark_safe(cached[1])
+
+    _count('misses')
+    full = await ICUConsultation.objects.aget(pk=consult.pk)
+    html = render_to_string(FRAGMENT_TEMPLATES[name], {'consult': full})
+    await fragment_cache().aset(key, (version, str(html)), FRAGMENT_TIMEOUT)
+    return html
+
+
+def render_fragment(name, consult):
+    # Uncached render, for consults that only exist in a draft
+    return render_to_string(FRAGMENT_TEMPLATES[name], {'consult': consult})
+
+
+def invalidate_fragments(consult_pk):
+    fragment_cache().delete_many([fragment_key(name, consult_pk) for name in FRAGMENT_TEMPLATES])
+
+
+# ------------------------------
+# Counters
+# ------------------------------
+def cache_stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,221 @@
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import Max
+
+from .analytics import add_to_rollups
+from .exports import CHOICE_LABELS
+from .forms import (
+    SectionAForm, SectionBForm, SectionCForm, SectionDForm,
+    SectionEForm, SectionFForm, SectionGForm,
+    clean_section_a, clean_section_b,
+)
+from .models import ICUConsultation
+from .scoring import severity_score
+from .search import index_consults, index_consults_after
+
+SECTION_FORMS = [SectionAForm, SectionBForm, SectionCForm, SectionDForm, SectionEForm, SectionFForm, SectionGForm]
+
+# Form-level clean() rules, by section
+SECTION_RULES = {
+    SectionAForm: clean_section_a,
+    SectionBForm: clean_section_b,
+}
+
+# label -> value for choice columns, so exported files import unchanged
+CHOICE_VALUES = {
+    column: {str(label).lower(): value for value, label in labels.items()}
+    for column, labels in CHOICE_LABELS.items()
+}
+
+MODEL_FIELDS = {field.name: field for field in ICUConsultation._meta.concrete_fields}
+
+# Historical files repeat the same short values (wards, yes/no, dates) over
+# and over, so field cleaning is memoised per raw value.
+MEMO_MAX_LENGTH = 64
+MEMO_MAX_ENTRIES = 10000
+_NOT_MEMOISED = object()
+
+
+# ------------------------------
+# Source readers: (line number, {column: value}) per record
+# ------------------------------
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_ndjson(stream):
+    for line_num, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_num, json.loads(line)
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+# ------------------------------
+# Section validation without a form instance per row
+# ------------------------------
+class SectionValidator:
+    """
+    Runs one section form's field cleaning, clean_<field>() hooks and
+    clean() rules over plain dicts. The form's fields and hooks are looked
+    up once; the hooks are called with this object standing in for the
+    form, which is all they use (self.cleaned_data).
+    """
+
+    def __init__(self, form_class):
+        self.fields = list(form_class.base_fields.items())
+        self.memo = {name: {} for name, _ in self.fields}
+        self.hooks = {
+            name: getattr(form_class, f'clean_{name}')
+            for name, _ in self.fields
+            if hasattr(form_class, f'clean_{name}')
+        }
+        self.rules = SECTION_RULES.get(form_class)
+        self.model_fields = [name for name in form_class._meta.fields if name in MODEL_FIELDS]
+
+    def validate(self, record, errors):
+        self.cleaned_data = cleaned = {}
+        field_errors = {}
+        for name, field in self.fields:
+            try:
+                cleaned[name] = self.clean_field(name, field, record.get(name))
+                if name in self.hooks:
+                    cleaned[name] = self.hooks[name](self)
+            except ValidationError as exc:
+                field_errors[name] = exc.messages
+
+        # Like Form.clean(), the cross-field rules see whatever did clean
+        if self.rules:
+            for name, message in self.rules(cleaned).items():
+                field_errors.setdefault(name or '__all__', []).append(message)
+        errors.update(field_errors)
+
+        # Model-level conversion, as ModelForm._post_clean would do
+        values = {}
+        for name in self.model_fields:
+            model_field = MODEL_FIELDS[name]
+            value = cleaned.get(name)
+            if value in ('', None) and model_field.null:
+                value = None
+            elif value is None and not model_field.null:
+                value = model_field.get_default()
+            try:
+                values[name] = model_field.to_python(value)
+            except ValidationError as exc:
+                errors.setdefault(name, []).extend(exc.messages)
+        return values
+
+    def clean_field(self, name, field, raw):
+        key = raw if isinstance(raw, (int, float, type(None))) else _NOT_MEMOISED
+        if isinstance(raw, str) and len(raw) <= MEMO_MAX_LENGTH:
+            key = raw
+        if key is _NOT_MEMOISED:
+            return field.clean(raw)
+        # True == 1 == 1.0 as dict keys, but fields clean them differently
+        key = (type(raw), key)
+
+        memo = self.memo[name]
+        if key not in memo:
+            if len(memo) >= MEMO_MAX_ENTRIES:
+                memo.clear()
+            try:
+                memo[key] = (True, field.clean(raw))
+            except ValidationError as exc:
+                memo[key] = (False, exc)
+        ok, result = memo[key]
+        if not ok:
+            raise result
+        return result
+
+
+class ConsultImporter:
+    def __init__(self):
+        self.validators = [SectionValidator(form_class) for form_class in SECTION_FORMS]
+
+    def normalise(self, record):
+        record = {key: value for key, value in record.items() if key}
+        for column, values in CHOICE_VALUES.items():
+            value = record.get(column)
+            if isinstance(value, str):
+                record[column] = values.get(value.strip().lower(), value)
+        reason = record.get('reason')
+        if isinstance(reason, str):
+            record['reason'] = [item.strip() for item in reason.split(';') if item.strip()]
+        return record
+
+    def build(self, record):
+        """Return (ICUConsultation or None, {field: [messages]})."""
+        record = self.normalise(record)
+        errors = {}
+        values = {}
+        for validator in self.validators:
+            values.update(validator.validate(record, errors))
+        if errors:
+            return None, errors
+        consult = ICUConsultation(submitted=True, **values)
+        consult.severity_score = severity_score(consult)
+        return consult, {}
+
+
+# ------------------------------
+# Inserts
+# ------------------------------
+def _prep_column(field, conn):
+    # Repeated hashable values are converted once per chunk
+    memo = {}
+
+    def prep(value):
+        try:
+            return memo[value]
+        except KeyError:
+            prepped = memo[value] = field.get_db_prep_save(value, conn)
+            return prepped
+        except TypeError:
+            return field.get_db_prep_save(value, conn)
+
+    return prep
+
+
+def insert_consults(consults):
+    """bulk_create() the consults and add them to the search index and rollups."""
+    add_to_rollups(consults)
+    if connection.vendor != 'sqlite':
+        ICUConsultation.objects.bulk_create(consults)
+        index_consults(consults)
+        return
+
+    # SQLite caps bulk_create at 999 parameters, i.e. ~18 rows per INSERT,
+    # and compiling those statements costs more than running them. One
+    # prepared INSERT through executemany() does the same work per row.
+    conn = connections[ICUConsultation.objects.db]
+    fields = [
+        field for field in ICUConsultation._meta.concrete_fields
+        if not field.primary_key and not field.generated
+    ]
+    columns = ', '.join(conn.ops.quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f"INSERT INTO {ICUConsultation._meta.db_table} ({columns}) VALUES ({placeholders})"
+
+    # auto_now/auto_now_add fields get their value from pre_save()
+    auto = [field for field in fields if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for consult in consults:
+        for field in auto:
+            field.pre_save(consult, True)
+
+    attnames = [field.attname for field in fields]
+    preps = [_prep_column(field, conn) for field in fields]
+    rows = [
+        [prep(consult.__dict__[attname]) for prep, attname in zip(preps, attnames)]
+        for consult in consults
+    ]
+
+    last_pk = ICUConsultation.objects.aggregate(last=Max('id'))['last'] or 0
+    with conn.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    index_consults_after(last_pk)
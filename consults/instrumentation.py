@@ -0,0 +1,219 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates, Template
+
+# Per-request timing: DB queries (count, time, repeated statements) and
+# template rendering, sent back as a Server-Timing header and folded into
+# rolling per-endpoint stats (shown at /perf/ to staff). Stats live in
+# each worker process's memory.
+
+ROLLING_WINDOW = 500  # requests kept per endpoint
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# The same statement this many times in one request looks like a query
+# per row (N+1) rather than a query per page
+N_PLUS_ONE_THRESHOLD = 5
+
+_current = ContextVar('consult_request_profile', default=None)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.statements = Counter()
+        self.rendering = False
+
+    def repeated_statements(self):
+        return {sql: count for sql, count in self.statements.items() if count >= N_PLUS_ONE_THRESHOLD}
+
+
+# ------------------------------
+# Database: an execute wrapper on every connection, installed when the
+# connection opens (apps.py), reporting to the current request if any
+# ------------------------------
+_IN_LIST = re.compile(r'\((?:%s|\?)(?:,\s*(?:%s|\?))*\)')
+
+
+def statement_fingerprint(sql):
+    # IN lists of different lengths are still the same statement
+    return _IN_LIST.sub('(...)', sql)
+
+
+def time_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_ms += (time.perf_counter() - start) * 1000
+        profile.db_count += 1
+        profile.statements[statement_fingerprint(sql)] += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+# ------------------------------
+# Templates: the DjangoTemplates backend with timed top-level renders
+# ------------------------------
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None or profile.rendering:
+            return super().render(context, request)
+        profile.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_ms += (time.perf_counter() - start) * 1000
+            profile.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# ------------------------------
+# Rolling per-endpoint stats
+# ------------------------------
+class EndpointStats:
+    def __init__(self):
+        self.samples = deque(maxlen=ROLLING_WINDOW)  # (total, db, template ms, query count)
+        self.requests = 0
+        self.repeated = {}  # statement -> (requests showing it, most runs in one request)
+
+    def add(self, profile, total_ms):
+        self.requests += 1
+        self.samples.append((total_ms, profile.db_ms, profile.template_ms, profile.db_count))
+        for sql, count in profile.repeated_statements().items():
+            seen, most = self.repeated.get(sql, (0, 0))
+            self.repeated[sql] = (seen + 1, max(most, count))
+
+    def summary(self):
+        totals = [sample[0] for sample in self.samples]
+        histogram = Counter()
+        for ms in totals:
+            histogram[next((bound for bound in HISTOGRAM_BOUNDS_MS if ms <= bound), None)] += 1
+        window = len(self.samples)
+        return {
+            'requests': self.requests,
+            'window': window,
+            'total_ms_p50': percentile(totals, 50),
+            'total_ms_p95': percentile(totals, 95),
+            'total_ms_max': max(totals) if totals else None,
+            'db_ms_mean': sum(sample[1] for sample in self.samples) / window if window else None,
+            'template_ms_mean': sum(sample[2] for sample in self.samples) / window if window else None,
+            'queries_mean': sum(sample[3] for sample in self.samples) / window if window else None,
+            'histogram': [
+                {'le_ms': bound, 'count': histogram[bound]} for bound in (*HISTOGRAM_BOUNDS_MS, None)
+            ],
+            'n_plus_one': [
+                {'statement': sql, 'requests': seen, 'max_per_request': most}
+                for sql, (seen, most) in sorted(self.repeated.items(), key=lambda item: -item[1][1])
+            ],
+        }
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def record_request(endpoint, profile, total_ms):
+    with _endpoints_lock:
+        _endpoints.setdefault(endpoint, EndpointStats()).add(profile, total_ms)
+
+
+def endpoint_report():
+    """Per-endpoint summaries, slowest (p95) first."""
+    with _endpoints_lock:
+        report = [{'endpoint': endpoint, **stats.summary()} for endpoint, stats in _endpoints.items()]
+    return sorted(report, key=lambda row: -(row['total_ms_p95'] or 0))
+
+
+def reset_endpoint_stats():
+    with _endpoints_lock:
+        _endpoints.clear()
+
+
+# ------------------------------
+# Middleware
+# ------------------------------
+def server_timing(profile, total_ms):
+    app_ms = max(0.0, total_ms - profile.db_ms - profile.template_ms)
+    return (
+        f'db;dur={profile.db_ms:.1f};desc="{profile.db_count} queries", '
+        f'tpl;dur={profile.template_ms:.1f}, app;dur={app_ms:.1f}, total;dur={total_ms:.1f}'
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    Times each request and adds a Server-Timing header. Works under WSGI
+    and ASGI; the profile travels in a context variable, which the ORM's
+    sync_to_async threads inherit. Turn off with CONSULT_SERVER_TIMING=0.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CONSULT_SERVER_TIMING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        # For streamed responses this is the time to the first byte
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        response['Server-Timing'] = server_timing(profile, total_ms)
+        match = request.resolver_match
+        record_request(f'{request.method} {match.view_name if match else "(unresolved)"}', profile, total_ms)
+        return response
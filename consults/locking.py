@@ -0,0 +1,90 @@
+import asyncio
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+# Backoff between attempts: 50 ms, 100 ms, 200 ms ... capped, with jitter
+# so writers that collided once don't collide again in lockstep.
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 1.0
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked')
+
+_stats = {'retries': 0, 'gave_up': 0}
+_stats_lock = threading.Lock()
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_MESSAGES)
+
+
+def backoff(attempt):
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def lock_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_lock_stats():
+    with _stats_lock:
+        _stats.update(retries=0, gave_up=0)
+
+
+def _retries():
+    # Inside someone else's transaction the whole transaction would have
+    # to be replayed, which only its owner can do: fail straight away.
+    if connection.in_atomic_block:
+        return 0
+    return getattr(settings, 'CONSULT_DB_LOCK_RETRIES', 5)
+
+
+# ------------------------------
+# Run a write in its own transaction, retried while the database is locked
+# ------------------------------
+def write_with_retry(func, *args, **kwargs):
+    retries = _retries()
+    for attempt in range(retries + 1):
+        try:
+            return _atomic_call(func, *args, **kwargs)
+        except OperationalError as exc:
+            _check_retry(exc, attempt, retries)
+        time.sleep(backoff(attempt))
+
+
+async def awrite_with_retry(func, *args, **kwargs):
+    # Same, for async views: the backoff sleeps without holding the
+    # thread the ORM runs on.
+    retries = await sync_to_async(_retries)()
+    attempt_write = sync_to_async(_atomic_call)
+    for attempt in range(retries + 1):
+        try:
+            return await attempt_write(func, *args, **kwargs)
+        except OperationalError as exc:
+            _check_retry(exc, attempt, retries)
+        await asyncio.sleep(backoff(attempt))
+
+
+def _atomic_call(func, *args, **kwargs):
+    with transaction.atomic():
+        return func(*args, **kwargs)
+
+
+def _check_retry(exc, attempt, retries):
+    # Re-raise unless this is a lock error with attempts left
+    if not is_lock_error(exc):
+        raise exc
+    if attempt == retries:
+        _count('gave_up')
+        raise exc
+    _count('retries')
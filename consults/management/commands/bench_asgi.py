@@ -0,0 +1,64 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from consults import async_views, views
+from consults.benchmarking import WorkflowURLConf, async_load, bench_database, seed_consults, thread_load
+from consults.models import ICUConsultation
+
+# mode -> (views module, load driver)
+MODES = {
+    'wsgi': (views, thread_load),         # sync views, a thread per client
+    'asgi-sync': (views, async_load),     # sync views behind the ASGI handler
+    'asgi': (async_views, async_load),    # async views behind the ASGI handler
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the consult pages with concurrent clients: sync views under "
+        "WSGI-style threads, and sync vs async views under the ASGI handler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Consults to seed")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per mode")
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients")
+        parser.add_argument('--mode', choices=sorted(MODES), action='append', help="Repeatable; default: all")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        results = {}
+        with bench_database():
+            seed_consults(options['rows'])
+            for mode in options['mode'] or list(MODES):
+                workflow, load = MODES[mode]
+                with override_settings(ROOT_URLCONF=WorkflowURLConf(workflow)):
+                    urls = self.request_mix(options['requests'])
+                    results[mode] = load(urls, options['concurrency'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>9}: {result['requests_per_s']:8.1f} req/s  "
+                f"p50 {result['latency_ms_p50']:7.2f} ms  p95 {result['latency_ms_p95']:7.2f} ms  "
+                f"p99 {result['latency_ms_p99']:7.2f} ms"
+            )
+
+    def request_mix(self, count):
+        # Same seeded mix for every mode: list pages, summaries and section forms
+        rng = random.Random(0)
+        pks = list(ICUConsultation.objects.values_list('pk', flat=True))
+        pages = [
+            lambda: reverse('consults:all_summaries'),
+            lambda: reverse('consults:review_summary', args=[rng.choice(pks)]),
+            lambda: reverse('consults:section_b', args=[rng.choice(pks)]),
+            lambda: reverse('consults:section_d', args=[rng.choice(pks)]),
+        ]
+        return [rng.choice(pages)() for _ in range(count)]
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from consults.benchmarking import bench_database, measure, seed_consults
+from consults.models import ICUConsultation
+
+
+class Command(BaseCommand):
+    help = "Compare full and conditional (304) polls of all_summaries and review_summary."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Consults to seed")
+        parser.add_argument('--polls', type=int, default=200, help="Polls per measurement")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        with bench_database():
+            seed_consults(options['rows'])
+            consult = ICUConsultation.objects.order_by('-id').first()
+            results = {
+                'all_summaries': self.compare(reverse('consults:all_summaries'), options['polls']),
+                'review_summary': self.compare(reverse('consults:review_summary', args=[consult.pk]), options['polls']),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for page, result in results.items():
+            full, cond = result['full'], result['conditional']
+            self.stdout.write(
+                f"{page}: full {full['bytes']} B / {full['cpu_ms_mean']:.2f} ms CPU, "
+                f"304 {cond['bytes']} B / {cond['cpu_ms_mean']:.2f} ms CPU -> "
+                f"saves {result['bytes_saved']} B and {result['cpu_ms_saved']:.2f} ms CPU per poll"
+            )
+
+    def compare(self, url, polls):
+        client = Client()
+        first = client.get(url)
+        etag = first['ETag']
+
+        full = measure(lambda: client.get(url), polls)
+        full['status'] = first.status_code
+        full['bytes'] = len(first.content)
+
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        conditional = measure(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), polls)
+        conditional['status'] = not_modified.status_code
+        conditional['bytes'] = len(not_modified.content)
+
+        return {
+            'full': full,
+            'conditional': conditional,
+            'bytes_saved': full['bytes'] - conditional['bytes'],
+            'cpu_ms_saved': full['cpu_ms_mean'] - conditional['cpu_ms_mean'],
+        }
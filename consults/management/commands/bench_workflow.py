@@ -0,0 +1,93 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from consults.benchmarking import bench_database, compare_results, run_workflow_benchmark, seed_consults
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the consult workflow end to end (Section A to G, summary, submit, "
+        "then all_summaries and review_summary reads) against a seeded throwaway "
+        "database. Reports throughput, p50/p95/p99 latency and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Consults to seed")
+        parser.add_argument('--flows', type=int, default=50, help="Complete consults to drive through the wizard")
+        parser.add_argument('--reads', type=int, default=200, help="all_summaries + review_summary page pairs")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the read mix")
+        parser.add_argument('--output', help="Write the results to this JSON file")
+        parser.add_argument('--compare', help="Compare against an earlier --output file")
+        parser.add_argument(
+            '--threshold', type=float, default=20.0,
+            help="Latency increase (%%) that counts as a regression (default 20)",
+        )
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        with bench_database():
+            seed_consults(options['rows'])
+            results = run_workflow_benchmark(options['flows'], options['reads'], options['seed'])
+        results['meta'] = self.metadata(options)
+
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+
+        if options['compare']:
+            with open(options['compare']) as stream:
+                baseline = json.load(stream)
+            self.compare(baseline, results, options['threshold'])
+
+    def metadata(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'rows': options['rows'],
+            'flows': options['flows'],
+            'reads': options['reads'],
+            'seed': options['seed'],
+            'async_views': getattr(settings, 'CONSULT_ASYNC_VIEWS', False),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+    def report(self, results):
+        total = results['total']
+        self.stdout.write(
+            f"{total['requests']} requests, {total['requests_per_s']:.1f} req/s, "
+            f"{total['queries_per_request']:.1f} queries/request"
+        )
+        for step, result in results['steps'].items():
+            self.stdout.write(
+                f"{step:>22}: p50 {result['latency_ms_p50']:7.2f} ms  p95 {result['latency_ms_p95']:7.2f} ms  "
+                f"p99 {result['latency_ms_p99']:7.2f} ms  {result['queries_per_request']:5.1f} queries"
+            )
+
+    def compare(self, baseline, results, threshold):
+        rows, regressions = compare_results(baseline, results, threshold)
+        commit = baseline.get('meta', {}).get('commit') or 'baseline'
+        self.stdout.write(f"\nAgainst {commit}:")
+        for step, metric, before, after, change in rows:
+            flag = '  <-- regression' if (step, metric, before, after, change) in regressions else ''
+            self.stdout.write(f"{step:>22} {metric:>20}: {before:9.2f} -> {after:9.2f} ({change:+6.1f}%){flag}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} metric(s) regressed beyond the threshold")
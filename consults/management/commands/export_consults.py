@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from consults.ages import AGE_BANDS
+from consults.exports import EXPORT_FORMATS, export_columns, export_queryset, export_stream
+
+
+class Command(BaseCommand):
+    help = "Stream submitted consultations as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--columns', help="Comma-separated column names (default: all)")
+        parser.add_argument('--from', dest='date_from', help="First request date, YYYY-MM-DD")
+        parser.add_argument('--to', dest='date_to', help="Last request date, YYYY-MM-DD")
+        parser.add_argument('--ward')
+        parser.add_argument('--discipline')
+        parser.add_argument('--decision')
+        parser.add_argument('--age-band', choices=AGE_BANDS)
+
+    def handle(self, *args, **options):
+        try:
+            consults = export_queryset(options)
+            columns = export_columns(options['columns'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        chunks = export_stream(options['format'], consults, columns)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as out:
+                out.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
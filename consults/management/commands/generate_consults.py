@@ -0,0 +1,43 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from consults.imports import insert_consults
+from consults.synthetic import ConsultGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate N realistic synthetic consults for scale testing. The same "
+        "--seed always produces the same consults."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help="Consults to generate")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--submitted-ratio', type=float, default=0.85, help="Share of complete, submitted consults")
+        parser.add_argument('--days', type=int, default=365, help="Spread request times over this many past days")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Consults per transaction")
+
+    def handle(self, *args, **options):
+        if not 0 <= options['submitted_ratio'] <= 1:
+            raise CommandError("--submitted-ratio must be between 0 and 1")
+
+        generator = ConsultGenerator(
+            seed=options['seed'], submitted_ratio=options['submitted_ratio'], days=options['days'],
+        )
+        consults = generator.generate(options['count'])
+        started = time.perf_counter()
+        written = 0
+        while batch := list(islice(consults, options['batch_size'])):
+            with transaction.atomic():
+                insert_consults(batch)
+            written += len(batch)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{written} consults...")
+
+        elapsed = time.perf_counter() - started
+        rate = written / elapsed if elapsed else 0
+        self.stdout.write(f"Generated {written} consults in {elapsed:.1f}s ({rate:.0f}/s).")
@@ -0,0 +1,94 @@
+import csv
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from consults.imports import READERS, ConsultImporter, insert_consults
+from consults.models import ImportCheckpoint
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load historical consultations from CSV or NDJSON. Rows are "
+        "validated with the Section A-G form rules and inserted in chunked "
+        "transactions; an interrupted run resumes from its checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help="Default: from the file extension")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per transaction")
+        parser.add_argument('--checkpoint', help="Checkpoint name (default: the file's absolute path)")
+        parser.add_argument('--errors', help="Error report CSV (default: <path>.errors.csv)")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in READERS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format")
+
+        checkpoint_name = options['checkpoint'] or os.path.abspath(path)
+        errors_path = options['errors'] or f'{path}.errors.csv'
+
+        checkpoints = ImportCheckpoint.objects.filter(name=checkpoint_name)
+        if options['restart']:
+            checkpoints.delete()
+        progress = {'records': 0, 'imported': 0, 'failed': 0}
+        checkpoint = checkpoints.values(*progress).first()
+        if checkpoint:
+            progress = checkpoint
+            self.stdout.write(f"Resuming after {progress['records']} records")
+
+        importer = ConsultImporter()
+        started = time.perf_counter()
+        imported_this_run = 0
+
+        error_mode = 'a' if progress['records'] else 'w'
+        with open(path, newline='', encoding='utf-8') as source, \
+                open(errors_path, error_mode, newline='', encoding='utf-8') as error_file:
+            error_writer = csv.writer(error_file)
+            if error_mode == 'w':
+                error_writer.writerow(['line', 'field', 'message'])
+
+            records = islice(READERS[fmt](source), progress['records'], None)
+            for chunk in chunked(records, options['chunk_size']):
+                consults, error_rows = [], []
+                for line, record in chunk:
+                    consult, errors = importer.build(record)
+                    if consult is None:
+                        for field, messages in errors.items():
+                            error_rows.extend([line, field, message] for message in messages)
+                    else:
+                        consults.append(consult)
+
+                progress['records'] += len(chunk)
+                progress['imported'] += len(consults)
+                progress['failed'] += len(chunk) - len(consults)
+                # The checkpoint commits with the rows it counts, so a crash
+                # at any point resumes exactly where the database left off
+                with transaction.atomic():
+                    insert_consults(consults)
+                    ImportCheckpoint.objects.update_or_create(name=checkpoint_name, defaults=progress)
+                # Written once the chunk has committed, so a resumed run
+                # reports each rejected row exactly once
+                error_writer.writerows(error_rows)
+                error_file.flush()
+                imported_this_run += len(consults)
+
+        elapsed = time.perf_counter() - started
+        checkpoints.delete()
+        rate = imported_this_run / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Imported {progress['imported']} consults, {progress['failed']} rejected "
+            f"({rate:,.0f} rows/s this run). Errors: {errors_path}"
+        )
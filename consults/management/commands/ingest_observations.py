@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from consults.observations import (
+    DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, PARSERS, ObservationIngester, socket_lines,
+)
+
+EXTENSION_FORMATS = {'.hl7': 'hl7', '.txt': 'hl7', '.csv': 'csv'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Ingest bedside monitor observations (HL7 v2 ORU or CSV) from a file, "
+        "stdin (-) or a TCP feed (tcp://host:port). Readings are stored in "
+        "batches and the latest vitals copied into each consult's Section D."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="File path, - for stdin, or tcp://host:port")
+        parser.add_argument('--format', choices=sorted(PARSERS), help="Default: from the file extension, else hl7")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Readings per insert")
+        parser.add_argument('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                            help="Store a partial batch once its oldest reading is this many seconds old")
+
+    def handle(self, *args, **options):
+        source = options['source']
+        fmt = options['format'] or EXTENSION_FORMATS.get(os.path.splitext(source)[1].lower(), 'hl7')
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        ingester = ObservationIngester(options['batch_size'], options['flush_interval'])
+        started = time.perf_counter()
+        try:
+            if source.startswith('tcp://'):
+                host, _, port = source[len('tcp://'):].rpartition(':')
+                if not host or not port.isdigit():
+                    raise CommandError(f"Expected tcp://host:port, got {source!r}")
+                self.run(ingester, fmt, socket_lines((host, int(port)), options['flush_interval']))
+            elif source == '-':
+                self.run(ingester, fmt, sys.stdin)
+            else:
+                with open(source, encoding='utf-8', errors='replace') as stream:
+                    self.run(ingester, fmt, stream)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        except KeyboardInterrupt:
+            ingester.flush()
+
+        counts = ingester.counts
+        elapsed = time.perf_counter() - started
+        rate = counts['observations'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Stored {counts['observations']} observations ({rate:,.0f}/s); "
+            f"updated Section D of {counts['consults_updated']} consults. Skipped {counts['skipped']} unreadable, "
+            f"{counts['implausible']} implausible and {counts['unmatched']} with no consult."
+        )
+
+    def run(self, ingester, fmt, lines):
+        ingester.ingest(PARSERS[fmt](lines, ingester.counts))
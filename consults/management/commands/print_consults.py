@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from consults.printing import consults_for_day, print_consults
+
+
+class Command(BaseCommand):
+    help = (
+        "Write one PDF of every consult submitted on a day (default today), "
+        "each starting on a new page. Consults are laid out in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="YYYY-MM-DD (default: today)")
+        parser.add_argument('--output', help="PDF file to write (default: consults-<date>.pdf)")
+        parser.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+
+    def handle(self, *args, **options):
+        day = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if day is None:
+            raise CommandError(f"--date must be YYYY-MM-DD, got {options['date']!r}")
+
+        started = time.perf_counter()
+        pdf, count = print_consults(consults_for_day(day), workers=options['workers'])
+        if not count:
+            self.stdout.write(f"No consults submitted on {day}.")
+            return
+        output = options['output'] or f'consults-{day}.pdf'
+        with open(output, 'wb') as out:
+            out.write(pdf)
+        self.stdout.write(f"Wrote {count} consults to {output} in {time.perf_counter() - started:.1f}s.")
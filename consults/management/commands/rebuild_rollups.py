@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from consults.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the analytics rollup tables from the consult table. Run once "
+        "after migrating, and after any change made around the ORM (raw SQL)."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild_rollups()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Counted {total} submitted consults into the rollups in {elapsed:.2f}s.")
@@ -0,0 +1,59 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from consults.models import ICUConsultation
+from consults.scoring import SCORE_FIELDS, severity_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every consult's severity score with the current rules in "
+        "consults/scoring.py, vectorised with NumPy. Only changed rows are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000, help="Rows scored per pass")
+        parser.add_argument('--dry-run', action='store_true', help="Count changes without writing them")
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError("recompute_severity needs NumPy: pip install numpy")
+
+        started = time.perf_counter()
+        scored = changed = 0
+        rows = ICUConsultation.objects.order_by('id').values_list('id', 'severity_score', *SCORE_FIELDS)
+        iterator = rows.iterator(chunk_size=5000)
+        while batch := list(islice(iterator, options['batch_size'])):
+            ids, current, *inputs = zip(*batch)
+            scores = severity_scores(np, dict(zip(SCORE_FIELDS, inputs)))
+            current = np.array(current, dtype=float)
+
+            # NaN (no vitals) counts as equal to NaN
+            differs = ~((scores == current) | (np.isnan(scores) & np.isnan(current)))
+            scored += len(batch)
+            changed += int(differs.sum())
+            if not options['dry_run']:
+                self.write_scores(np, np.array(ids)[differs], scores[differs])
+
+        elapsed = time.perf_counter() - started
+        verb = "would change" if options['dry_run'] else "changed"
+        self.stdout.write(f"Scored {scored} consults in {elapsed:.2f}s; {verb} {changed}.")
+
+    def write_scores(self, np, ids, scores):
+        # Scores take few distinct values: one UPDATE per value (and id chunk)
+        limit = (connection.features.max_query_params or 10000) - 10
+        now = timezone.now()
+        with transaction.atomic():
+            for score in np.unique(scores):
+                value = None if np.isnan(score) else int(score)
+                matching = ids[np.isnan(scores)] if value is None else ids[scores == score]
+                for start in range(0, len(matching), limit):
+                    ICUConsultation.objects.filter(pk__in=matching[start:start + limit].tolist()).update(
+                        severity_score=value, updated_at=now,
+                    )
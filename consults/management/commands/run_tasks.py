@@ -0,0 +1,39 @@
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from consults.tasks import DEFAULT_LEASE_SECONDS, Worker, prune_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Work the background task queue (post-submit side effects). Run one "
+        "or more of these next to the web server; SIGTERM finishes running "
+        "tasks and exits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Tasks run at once by this worker")
+        parser.add_argument('--batch-size', type=int, help="Tasks claimed per dequeue (default: --concurrency)")
+        parser.add_argument('--lease', type=int, default=DEFAULT_LEASE_SECONDS,
+                            help="Seconds before a task held by a silent worker is run elsewhere")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between polls when idle")
+        parser.add_argument('--drain', action='store_true', help="Exit once no task is ready (cron, tests)")
+        parser.add_argument('--keep-days', type=int, default=7, help="Delete tasks finished longer ago than this")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        pruned = prune_tasks(timedelta(days=options['keep_days']))
+        if pruned and options['verbosity'] > 1:
+            self.stdout.write(f"Pruned {pruned} finished tasks.")
+
+        worker = Worker(
+            concurrency=options['concurrency'], batch_size=options['batch_size'], lease_seconds=options['lease'],
+        )
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+        processed = worker.run(drain=options['drain'], poll_interval=options['poll_interval'])
+        self.stdout.write(f"Worker {worker.worker_id} processed {processed} tasks.")
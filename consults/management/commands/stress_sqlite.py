@@ -0,0 +1,76 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from consults.benchmarking import (
+    STRESS_MODES, bench_database, percentile, seed_consults, set_journal_mode, stress_worker,
+)
+from consults.models import ICUConsultation
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress a throwaway file-backed SQLite database with concurrent Section G "
+        "saves from several processes, and report how many writes got through."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help="Concurrent writer processes")
+        parser.add_argument('--writes', type=int, default=100, help="Saves per process")
+        parser.add_argument('--consults', type=int, default=20, help="Consults the writers share")
+        parser.add_argument('--mode', choices=sorted(STRESS_MODES), action='append', help="Repeatable; default: all")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("stress_sqlite only applies to the SQLite backend")
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            with bench_database(name=os.path.join(tmp, 'stress.sqlite3')):
+                seed_consults(options['consults'])
+                pks = list(ICUConsultation.objects.values_list('pk', flat=True))
+                for mode in options['mode'] or ['concurrent', 'plain']:
+                    results[mode] = self.run_mode(mode, pks, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:>10}: {result['saved']}/{result['attempted']} saved, {result['locked']} locked, "
+                f"{result['retries']} retries, {result['writes_per_s']:7.1f} writes/s  "
+                f"p50 {result['latency_ms_p50'] or 0:7.2f} ms  p99 {result['latency_ms_p99'] or 0:7.2f} ms"
+            )
+
+    def run_mode(self, mode, pks, options):
+        set_journal_mode(mode)
+        # Children must open their own connections, never share the parent's
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        jobs = [(mode, pks, options['writes'], seed) for seed in range(options['processes'])]
+        start = time.perf_counter()
+        with context.Pool(options['processes']) as pool:
+            workers = pool.starmap(stress_worker, jobs)
+        elapsed = time.perf_counter() - start
+
+        errors = [error for worker in workers for error in worker['errors']]
+        if errors:
+            raise CommandError(f"Invalid Section G data: {errors[0]}")
+        latencies = [ms for worker in workers for ms in worker['latencies']]
+        return {
+            'processes': options['processes'],
+            'attempted': options['processes'] * options['writes'],
+            'saved': len(latencies),
+            'locked': sum(worker['locked'] for worker in workers),
+            'retries': sum(worker['retries'] for worker in workers),
+            'writes_per_s': len(latencies) / elapsed,
+            'latency_ms_p50': percentile(latencies, 50),
+            'latency_ms_p99': percentile(latencies, 99),
+        }
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0009_alter_icuconsultation_breathing_distress_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='icuconsultation',
+            name='intubated',
+            field=models.CharField(blank=True, choices=[('yes', 'Yes'), ('no', 'No')], max_length=3, null=True, verbose_name='intubated?'),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(condition=models.Q(('submitted', True)), fields=['-request_datetime', '-id'], name='consult_submitted_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(condition=models.Q(('submitted', False)), fields=['id'], name='consult_draft_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(fields=['hospital_number', '-request_datetime', '-id'], name='consult_hospital_no_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(fields=['ward', '-request_datetime', '-id'], name='consult_ward_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(fields=['requesting_discipline', '-request_datetime', '-id'], name='consult_discipline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(fields=['decision', '-request_datetime', '-id'], name='consult_decision_idx'),
+        ),
+    ]
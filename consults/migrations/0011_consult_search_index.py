@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Frozen copy of the DDL in consults.search as of this migration, so later
+# changes to the search backends do not rewrite history.
+SEARCH_FIELDS = ('clinical_summary', 'assessment', 'plan_comments', 'imaging_findings', 'key_labs')
+COLUMNS = ', '.join(SEARCH_FIELDS)
+DOCUMENT = " || ' ' || ".join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+VALUES = ', '.join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS consults_consult_fts "
+                f"USING fts5({COLUMNS}, tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                f"INSERT INTO consults_consult_fts (rowid, {COLUMNS}) "
+                f"SELECT id, {VALUES} FROM consults_icuconsultation"
+            )
+        elif vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS consult_search_gin ON consults_icuconsultation "
+                f"USING GIN (to_tsvector('english', {DOCUMENT}))"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute("DROP TABLE IF EXISTS consults_consult_fts")
+        elif vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS consult_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0010_consult_workflow_indexes'),
+    ]
+
+    operations = [
+        # SQLite: FTS5 table backfilled from existing rows
+        # PostgreSQL: GIN index on the narrative tsvector
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
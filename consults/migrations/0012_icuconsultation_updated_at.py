@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0011_consult_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='icuconsultation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0012_icuconsultation_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(condition=models.Q(('submitted', True)), fields=['updated_at'], name='consult_submitted_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+import re
+from bisect import bisect_left
+
+from django.db import migrations, models
+
+# Frozen copy of consults.scoring as of this migration, so later changes
+# to the bands do not change what this backfill computes.
+VITAL_BANDS = [
+    ('breathing_spo2', (91, 93, 95), (3, 2, 1, 0)),
+    ('bp_systolic', (90, 100, 110, 219), (3, 2, 1, 0, 3)),
+    ('heart_rate', (40, 50, 90, 110, 130), (3, 1, 0, 1, 2, 3)),
+    ('temperature', (35.0, 36.0, 38.0, 39.0), (3, 1, 0, 1, 2)),
+]
+ROOM_AIR = {'', 'ra', 'room air', 'none', 'nil', 'no'}
+
+
+def parse_number(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_gcs(value):
+    if not value:
+        return None
+    text = str(value).upper()
+    parts = re.fullmatch(r'\s*E(\d)\s*V(\d|T)\s*M(\d)\s*', text)
+    if parts:
+        eyes, verbal, motor = parts.groups()
+        return int(eyes) + (1 if verbal == 'T' else int(verbal)) + int(motor)
+    number = re.match(r'\s*(\d+)', text)
+    return int(number.group(1)) if number else None
+
+
+def severity_score(consult):
+    total = 0
+    recorded = False
+    for column, bounds, points in VITAL_BANDS:
+        value = parse_number(getattr(consult, column))
+        if value is not None:
+            recorded = True
+            total += points[bisect_left(bounds, value)]
+
+    gcs = parse_gcs(consult.gcs)
+    if gcs is not None:
+        recorded = True
+        if gcs < 15:
+            total += 3
+
+    if not recorded:
+        return None
+
+    if consult.intubated == 'yes' or (consult.breathing_device or '').strip().lower() not in ROOM_AIR:
+        total += 2
+    if consult.airway_threatened:
+        total += 3
+    if consult.circulation_inotropes == 'yes':
+        total += 3
+    return total
+
+
+def score_existing_consults(apps, schema_editor):
+    ICUConsultation = apps.get_model('consults', 'ICUConsultation')
+    batch = []
+    for consult in ICUConsultation.objects.iterator(chunk_size=2000):
+        consult.severity_score = severity_score(consult)
+        if consult.severity_score is not None:
+            batch.append(consult)
+        if len(batch) == 500:
+            ICUConsultation.objects.bulk_update(batch, ['severity_score'])
+            batch = []
+    ICUConsultation.objects.bulk_update(batch, ['severity_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0013_consult_submitted_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='icuconsultation',
+            name='severity_score',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(fields=['-severity_score'], name='consult_severity_idx'),
+        ),
+        migrations.RunPython(score_existing_consults, migrations.RunPython.noop),
+    ]
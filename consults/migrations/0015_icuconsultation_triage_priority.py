@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:16
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0014_icuconsultation_severity_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='icuconsultation',
+            name='triage_priority',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('decision__in', ['', 'review_later']), ('submitted', True)), then=django.db.models.functions.comparison.Coalesce('severity_score', models.Value(-1)))), output_field=models.IntegerField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(condition=models.Q(('triage_priority__isnull', False)), fields=['-triage_priority', 'request_datetime', 'id'], name='consult_triage_idx'),
+        ),
+    ]
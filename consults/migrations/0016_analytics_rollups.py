@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:19
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copy of the rollup keys and counting in consults.analytics as of
+# this migration, so later changes there do not alter this backfill.
+ROLLUP_FIELDS = ('request_datetime', 'ward', 'requesting_discipline', 'decision', 'reason')
+ROLLUP_KEYS = {
+    'ConsultRollup': ('day', 'ward', 'requesting_discipline', 'decision'),
+    'ReasonRollup': ('day', 'reason', 'decision'),
+}
+
+
+def consult_day(request_datetime):
+    if timezone.is_aware(request_datetime):
+        return timezone.localdate(request_datetime)
+    return request_datetime.date()
+
+
+def count_submitted_consults(apps, schema_editor):
+    ICUConsultation = apps.get_model('consults', 'ICUConsultation')
+    counts = Counter()
+    for values in ICUConsultation.objects.filter(submitted=True).values(*ROLLUP_FIELDS).iterator(chunk_size=2000):
+        day = consult_day(values['request_datetime'])
+        decision = values['decision'] or ''
+        counts['ConsultRollup', (day, values['ward'], values['requesting_discipline'], decision)] += 1
+        for reason in set(values['reason'] or []):
+            counts['ReasonRollup', (day, reason, decision)] += 1
+    for model_name, key_fields in ROLLUP_KEYS.items():
+        model = apps.get_model('consults', model_name)
+        model.objects.bulk_create(
+            [
+                model(count=count, **dict(zip(key_fields, key)))
+                for (row_model, key), count in counts.items()
+                if row_model == model_name
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0015_icuconsultation_triage_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('ward', models.CharField(max_length=100)),
+                ('requesting_discipline', models.CharField(max_length=100)),
+                ('decision', models.CharField(blank=True, max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'ward', 'requesting_discipline', 'decision'), name='consult_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReasonRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('reason', models.CharField(max_length=100)),
+                ('decision', models.CharField(blank=True, max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'reason', 'decision'), name='reason_rollup_key')],
+            },
+        ),
+        migrations.RunPython(count_submitted_consults, migrations.RunPython.noop),
+    ]
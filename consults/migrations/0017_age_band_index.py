@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0016_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='icuconsultation',
+            index=models.Index(fields=['date_of_birth', 'age'], name='consult_age_idx'),
+        ),
+    ]
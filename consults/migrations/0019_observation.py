@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consults', '0018_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Observation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.PositiveSmallIntegerField(choices=[(1, 'SpO2 (%)'), (2, 'BP systolic (mmHg)'), (3, 'BP diastolic (mmHg)'), (4, 'Heart rate (bpm)'), (5, 'Temperature (℃)')])),
+                ('value', models.FloatField()),
+                ('observed_at', models.DateTimeField()),
+                ('consult', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='observations', to='consults.icuconsultation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('consult', 'code', 'observed_at'), name='observation_key')],
+            },
+        ),
+    ]
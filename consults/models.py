@@ -1,6 +1,14 @@
 from django.db import models
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Coalesce
 from datetime import date
 
+from .ages import age_on
+
+# Submitted consults still waiting for an ICU decision (the triage queue)
+PENDING_TRIAGE = Q(submitted=True, decision__in=['', 'review_later'])
+
+
 # ------------------------------
 # ICU Consultation Model
 # ------------------------------
@@ -83,11 +91,9 @@ class ICUConsultation(models.Model):
     # Utility method to get age from DOB
     # ------------------------------
     def get_calculated_age(self):
+        # Querysets: annotate with ages.age_expression() instead
         if self.date_of_birth:
-            today = date.today()
-            return today.year - self.date_of_birth.year - (
-                - (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth)
-            )
+            return age_on(self.date_of_birth, date.today())
         return self.age # fallback if DOB not given
     
     def __str__(self):
@@ -160,6 +166,9 @@ class ICUConsultation(models.Model):
 
     pupils = models.CharField(max_length=50, blank=True)
 
+    # Early-warning score derived from the vitals above (consults/scoring.py)
+    severity_score = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
     # ------------------------------
     # Section E: Investigations
     # ------------------------------
@@ -200,5 +209,174 @@ class ICUConsultation(models.Model):
     # ------------------------------
     submitted = models.BooleanField(default=False)
 
+    # Bumped by every save; versions cached renders of this consult
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Triage queue position, kept up to date by the database on every write:
+    # the severity score (-1 until scored) while pending, otherwise NULL
+    triage_priority = models.GeneratedField(
+        expression=Case(When(PENDING_TRIAGE, then=Coalesce('severity_score', Value(-1)))),
+        output_field=models.IntegerField(null=True),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # all_summaries: submitted consults, newest first (keyset order)
+            models.Index(
+                fields=['-request_datetime', '-id'],
+                condition=Q(submitted=True),
+                name='consult_submitted_recent_idx',
+            ),
+            # High-water mark of the submitted list (conditional GET)
+            models.Index(fields=['updated_at'], condition=Q(submitted=True), name='consult_submitted_updated_idx'),
+            # Unfinished wizard drafts
+            models.Index(fields=['id'], condition=Q(submitted=False), name='consult_draft_idx'),
+            # Lookups and list filters, each kept in keyset order
+            models.Index(fields=['hospital_number', '-request_datetime', '-id'], name='consult_hospital_no_idx'),
+            models.Index(fields=['ward', '-request_datetime', '-id'], name='consult_ward_idx'),
+            models.Index(fields=['requesting_discipline', '-request_datetime', '-id'], name='consult_discipline_idx'),
+            models.Index(fields=['decision', '-request_datetime', '-id'], name='consult_decision_idx'),
+            # Age band filters (consults/ages.py): a date of birth range, or
+            # (no date of birth, entered age range)
+            models.Index(fields=['date_of_birth', 'age'], name='consult_age_idx'),
+            # Sickest first
+            models.Index(fields=['-severity_score'], name='consult_severity_idx'),
+            # Triage queue: pending consults only, sickest then longest waiting
+            models.Index(
+                fields=['-triage_priority', 'request_datetime', 'id'],
+                condition=Q(triage_priority__isnull=False),
+                name='consult_triage_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.patient_name} - {self.request_datetime.strftime('%Y-%m-%d %H:%M')}"
+
+
+# ------------------------------
+# Analytics rollups: submitted consult counts, kept up to date on every
+# save (consults/analytics.py) and rebuilt by manage.py rebuild_rollups
+# ------------------------------
+class ConsultRollup(models.Model):
+    day = models.DateField()
+    ward = models.CharField(max_length=100)
+    requesting_discipline = models.CharField(max_length=100)
+    decision = models.CharField(max_length=20, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'ward', 'requesting_discipline', 'decision'], name='consult_rollup_key',
+            ),
+        ]
+
+
+class ReasonRollup(models.Model):
+    # One row per ticked reason, so a consult can count under several
+    day = models.DateField()
+    reason = models.CharField(max_length=100)
+    decision = models.CharField(max_length=20, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'reason', 'decision'], name='reason_rollup_key'),
+        ]
+
+
+# ------------------------------
+# Progress of manage.py import_consults, saved in each chunk's own
+# transaction so a resumed import neither skips nor repeats rows
+# ------------------------------
+class ImportCheckpoint(models.Model):
+    name = models.CharField(max_length=500, unique=True)
+    records = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.records} records)"
+
+
+# ------------------------------
+# Background tasks: a durable queue in the main database, worked by
+# manage.py run_tasks (consults/tasks.py)
+# ------------------------------
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Enqueueing again with the same key is a no-op, even once the task is done
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField()
+    # Lease held by the worker running it; an expired lease means the
+    # worker died and the task is up for grabs again
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Dequeue: ready tasks, oldest first
+            models.Index(fields=['run_after', 'id'], condition=Q(state='queued'), name='task_queued_idx'),
+            # Reclaiming tasks from dead workers
+            models.Index(fields=['locked_until'], condition=Q(state='running'), name='task_lease_idx'),
+            # Pruning finished tasks
+            models.Index(fields=['finished_at'], condition=Q(state='done'), name='task_done_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.state})"
+
+
+# ------------------------------
+# Bedside monitor observations: a narrow time series, fed by
+# manage.py ingest_observations (consults/observations.py). The latest
+# value of each vital is copied into the consult's Section D.
+# ------------------------------
+class Observation(models.Model):
+    SPO2 = 1
+    BP_SYSTOLIC = 2
+    BP_DIASTOLIC = 3
+    HEART_RATE = 4
+    TEMPERATURE = 5
+    CODE_CHOICES = [
+        (SPO2, 'SpO2 (%)'),
+        (BP_SYSTOLIC, 'BP systolic (mmHg)'),
+        (BP_DIASTOLIC, 'BP diastolic (mmHg)'),
+        (HEART_RATE, 'Heart rate (bpm)'),
+        (TEMPERATURE, 'Temperature (℃)'),
+    ]
+
+    consult = models.ForeignKey(ICUConsultation, on_delete=models.CASCADE, related_name='observations', db_index=False)
+    code = models.PositiveSmallIntegerField(choices=CODE_CHOICES)
+    value = models.FloatField()
+    observed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # A replayed feed inserts nothing twice; also the index for
+            # "latest value of each vital for these consults"
+            models.UniqueConstraint(fields=['consult', 'code', 'observed_at'], name='observation_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_code_display()} {self.value} at {self.observed_at:%Y-%m-%d %H:%M:%S}"
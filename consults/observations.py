@@ -0,0 +1,410 @@
+import codecs
+import csv
+import re
+import socket
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .locking import write_with_retry
+from .models import ICUConsultation, Observation
+from .scoring import SCORE_FIELDS, severity_score
+from .signals import severity_changed
+
+# Bedside monitor feed -> Observation rows -> Section D. Sources are read
+# line by line and parsed by generators, so a feed of any length runs in
+# constant memory; readings are inserted a batch at a time and each batch
+# ends with the newest value of every vital copied into its consults.
+
+Reading = namedtuple('Reading', 'hospital_number code value observed_at')
+
+# Observation code -> the Section D column showing its latest value
+SECTION_D_COLUMNS = {
+    Observation.SPO2: 'breathing_spo2',
+    Observation.BP_SYSTOLIC: 'bp_systolic',
+    Observation.BP_DIASTOLIC: 'bp_diastolic',
+    Observation.HEART_RATE: 'heart_rate',
+    Observation.TEMPERATURE: 'temperature',
+}
+
+# Identifiers monitors send (OBX-3, or the CSV "vital" column) -> code
+OBSERVATION_CODES = {
+    # LOINC
+    '59408-5': Observation.SPO2,
+    '2708-6': Observation.SPO2,
+    '8480-6': Observation.BP_SYSTOLIC,
+    '8462-4': Observation.BP_DIASTOLIC,
+    '8867-4': Observation.HEART_RATE,
+    '8310-5': Observation.TEMPERATURE,
+    '8331-1': Observation.TEMPERATURE,
+    # ISO/IEEE 11073 (MDC) codes and reference ids
+    '150456': Observation.SPO2,
+    'MDC_PULS_OXIM_SAT_O2': Observation.SPO2,
+    '150301': Observation.BP_SYSTOLIC,
+    'MDC_PRESS_BLD_NONINV_SYS': Observation.BP_SYSTOLIC,
+    '150302': Observation.BP_DIASTOLIC,
+    'MDC_PRESS_BLD_NONINV_DIA': Observation.BP_DIASTOLIC,
+    '147842': Observation.HEART_RATE,
+    'MDC_ECG_HEART_RATE': Observation.HEART_RATE,
+    '150364': Observation.TEMPERATURE,
+    'MDC_TEMP_BODY': Observation.TEMPERATURE,
+    # The Section D column names themselves
+    **{column: code for code, column in SECTION_D_COLUMNS.items()},
+}
+
+# Readings outside these are probe-off or motion artefacts, not vitals
+PLAUSIBLE_RANGES = {
+    Observation.SPO2: (50, 100),
+    Observation.BP_SYSTOLIC: (30, 300),
+    Observation.BP_DIASTOLIC: (10, 200),
+    Observation.HEART_RATE: (20, 300),
+    Observation.TEMPERATURE: (25, 45),
+}
+
+FAHRENHEIT_UNITS = {'[degF]', 'degF', '°F', 'F'}
+# OBX-11 result statuses that withdraw a value
+WITHDRAWN_STATUSES = {'D', 'W', 'X'}
+
+# Section D values (and what the score and the live feed event read) of
+# the consults a batch touches
+PROJECTION_FIELDS = [
+    'id', 'submitted', 'severity_score', *SECTION_D_COLUMNS.values(), *SCORE_FIELDS,
+    'patient_name', 'date_of_birth', 'age', 'hospital_number', 'requesting_dr', 'request_datetime', 'decision',
+]
+SECTION_D_UPDATE_FIELDS = [*SECTION_D_COLUMNS.values(), 'severity_score', 'updated_at']
+
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_FLUSH_INTERVAL = 1.0
+CONSULT_LOOKUP_TTL = 60
+
+MLLP_FRAMING = str.maketrans('', '', '\x0b\x1c')
+CSV_COLUMNS = ('hospital_number', 'observed_at', 'vital', 'value')
+
+
+# ------------------------------
+# Sources: lines of text, with None for "nothing arrived for a while"
+# ------------------------------
+def socket_lines(address, timeout=DEFAULT_FLUSH_INTERVAL):
+    """Lines from a TCP feed (host, port), e.g. an HL7 gateway's MLLP output."""
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    pending = ''
+    with socket.create_connection(address) as sock:
+        sock.settimeout(timeout)
+        while True:
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                yield None
+                continue
+            if not data:
+                break
+            pending += decoder.decode(data)
+            *lines, pending = re.split(r'\r\n|\r|\n', pending)
+            yield from lines
+    if pending:
+        yield pending
+
+
+# ------------------------------
+# Parsers: lines -> Reading (or None passed through); anything unusable
+# is counted in counts['skipped']
+# ------------------------------
+def observation_code(identifier):
+    # "8867-4^Heart rate^LN": the code, else the text
+    for part in identifier.split('^')[:2]:
+        if part in OBSERVATION_CODES:
+            return OBSERVATION_CODES[part]
+    return None
+
+
+def to_celsius(value, unit):
+    return (value - 32) * 5 / 9 if unit in FAHRENHEIT_UNITS else value
+
+
+def parse_hl7_time(value):
+    """HL7 TS (YYYYMMDD[HHMM[SS[.S]]][+/-ZZZZ]) -> aware datetime; local time without an offset."""
+    value = value.split('^')[0].strip()
+    offset = None
+    if len(value) > 8 and value[-5] in '+-':
+        value, offset = value[:-5], value[-5:]
+    digits, _, fraction = value.partition('.')
+    if len(digits) < 8 or not digits.isdigit():
+        raise ValueError(f"Bad HL7 timestamp {value!r}")
+    digits = digits.ljust(14, '0')
+    moment = datetime(
+        int(digits[:4]), int(digits[4:6]), int(digits[6:8]),
+        int(digits[8:10]), int(digits[10:12]), int(digits[12:14]), int(fraction[:6].ljust(6, '0')),
+    )
+    if offset is None:
+        return timezone.make_aware(moment)
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    return moment.replace(tzinfo=dt_timezone(timedelta(minutes=minutes if offset[0] == '+' else -minutes)))
+
+
+def read_hl7(lines, counts):
+    """
+    Readings from HL7 v2 ORU^R01 results: the patient from PID-3, one
+    reading per numeric OBX, timed by OBX-14 (else OBR-7, else MSH-7).
+    MLLP framing characters are ignored, so raw gateway output works.
+    """
+    separator = '|'
+    patient = default_time = None
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        for segment in line.translate(MLLP_FRAMING).strip('\r\n').split('\r'):
+            kind = segment[:3]
+            if kind == 'MSH':
+                separator = segment[3]
+                fields = segment.split(separator)
+                patient, default_time = None, fields[6] if len(fields) > 6 else ''
+                continue
+            fields = segment.split(separator)
+            if kind == 'PID':
+                patient = fields[3].split('~')[0].split('^')[0] if len(fields) > 3 else None
+            elif kind == 'OBR':
+                if len(fields) > 7 and fields[7]:
+                    default_time = fields[7]
+            elif kind == 'OBX':
+                if len(fields) > 11 and fields[11] in WITHDRAWN_STATUSES:
+                    continue
+                code = observation_code(fields[3]) if len(fields) > 5 else None
+                if not patient or code is None or fields[2] not in ('NM', 'SN'):
+                    counts['skipped'] += 1
+                    continue
+                try:
+                    value = float(fields[5].strip('^=<>'))
+                    observed_at = parse_hl7_time(fields[14] if len(fields) > 14 and fields[14] else default_time)
+                except ValueError:
+                    counts['skipped'] += 1
+                    continue
+                unit = fields[6].split('^')[0] if len(fields) > 6 else ''
+                yield Reading(patient, code, to_celsius(value, unit), observed_at)
+
+
+def read_csv(lines, counts):
+    """
+    Readings from CSV with a header row: hospital_number, observed_at
+    (ISO 8601; local time without an offset), vital (LOINC, MDC or the
+    Section D column name), value and an optional unit.
+    """
+    header = None
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        if not line.strip():
+            continue
+        row = next(csv.reader([line]))
+        if header is None:
+            header = {name.strip(): index for index, name in enumerate(row)}
+            missing = [name for name in CSV_COLUMNS if name not in header]
+            if missing:
+                raise ValueError(f"CSV header lacks column(s): {', '.join(missing)}")
+            columns = [header[name] for name in CSV_COLUMNS]
+            unit_column = header.get('unit')
+            continue
+        try:
+            hospital_number, stamp, vital, value = (row[index].strip() for index in columns)
+            observed_at = parse_datetime(stamp)
+            value = float(value)
+        except (IndexError, ValueError):
+            counts['skipped'] += 1
+            continue
+        code = OBSERVATION_CODES.get(vital)
+        if observed_at is None or code is None or not hospital_number:
+            counts['skipped'] += 1
+            continue
+        if timezone.is_naive(observed_at):
+            observed_at = timezone.make_aware(observed_at)
+        unit = row[unit_column].strip() if unit_column is not None and unit_column < len(row) else ''
+        yield Reading(hospital_number, code, to_celsius(value, unit), observed_at)
+
+
+PARSERS = {'hl7': read_hl7, 'csv': read_csv}
+
+
+# ------------------------------
+# Writes: one prepared statement run over the whole batch, as
+# imports.insert_consults() does; building per-row ORM statements costs
+# more than running them
+# ------------------------------
+def insert_observations(observations):
+    """Insert `observations`, skipping replayed readings; returns how many were stored."""
+    conn = connections[Observation.objects.db]
+    if conn.vendor not in ('sqlite', 'postgresql'):
+        stored = Observation.objects.filter(consult_id__in={o.consult_id for o in observations})
+        before = stored.count()
+        Observation.objects.bulk_create(observations, ignore_conflicts=True)
+        return stored.count() - before
+    # Only a clash on the reading's key is skipped; any other constraint
+    # failure still raises
+    observed_at = Observation._meta.get_field('observed_at')
+    sql = (
+        f"INSERT INTO {Observation._meta.db_table} (consult_id, code, value, observed_at) "
+        "VALUES (%s, %s, %s, %s) ON CONFLICT (consult_id, code, observed_at) DO NOTHING"
+    )
+    with conn.cursor() as cursor:
+        cursor.executemany(sql, [
+            (o.consult_id, o.code, o.value, observed_at.get_db_prep_save(o.observed_at, conn)) for o in observations
+        ])
+        return cursor.rowcount
+
+
+def update_section_d(consults):
+    conn = connections[ICUConsultation.objects.db]
+    fields = [ICUConsultation._meta.get_field(name) for name in SECTION_D_UPDATE_FIELDS]
+    assignments = ', '.join(f'{conn.ops.quote_name(field.column)} = %s' for field in fields)
+    sql = f"UPDATE {ICUConsultation._meta.db_table} SET {assignments} WHERE id = %s"
+    with conn.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(consult, field.attname), conn) for field in fields] + [consult.pk]
+            for consult in consults
+        ])
+
+
+# ------------------------------
+# Section D projection
+# ------------------------------
+def section_d_value(code, value):
+    return round(value, 1) if code == Observation.TEMPERATURE else round(value)
+
+
+def project_latest(observations):
+    """
+    Copy the newest of `observations` for each (consult, vital) into
+    Section D, unless a newer reading is already stored (late or
+    replayed data never winds a vital back), and rescore the consults.
+    Returns how many consults changed.
+    """
+    newest = {}
+    for observation in observations:
+        key = (observation.consult_id, observation.code)
+        if key not in newest or observation.observed_at > newest[key].observed_at:
+            newest[key] = observation
+    consult_ids = {consult_id for consult_id, _ in newest}
+    stored = {
+        (consult_id, code): latest
+        for consult_id, code, latest in Observation.objects.filter(
+            consult_id__in=consult_ids, code__in={code for _, code in newest},
+        ).values('consult_id', 'code').annotate(latest=Max('observed_at')).values_list('consult_id', 'code', 'latest')
+    }
+    # A reading at an already stored timestamp was ignored by the insert,
+    # so the value copied is the stored one, not the one in the batch
+    stored_values = {
+        (consult_id, code, observed_at): value
+        for consult_id, code, observed_at, value in Observation.objects.filter(
+            consult_id__in=consult_ids, code__in={code for _, code in newest},
+            observed_at__in={observation.observed_at for observation in newest.values()},
+        ).values_list('consult_id', 'code', 'observed_at', 'value')
+    }
+    # Locked until the batch commits, so a Section D form saved meanwhile
+    # waits rather than being overwritten (SQLite already holds its write lock)
+    consults = ICUConsultation.objects.select_for_update().filter(pk__in=consult_ids).only(
+        *PROJECTION_FIELDS,
+    ).order_by('pk').in_bulk()
+
+    changed = {}
+    for key, observation in newest.items():
+        if stored.get(key, observation.observed_at) > observation.observed_at:
+            continue
+        consult, column = consults[observation.consult_id], SECTION_D_COLUMNS[observation.code]
+        value = stored_values.get(key + (observation.observed_at,), observation.value)
+        value = section_d_value(observation.code, value)
+        if getattr(consult, column) != value:
+            setattr(consult, column, value)
+            changed[consult.pk] = consult
+    if not changed:
+        return 0
+
+    now = timezone.now()
+    rescored = []
+    for consult in changed.values():
+        score = severity_score(consult)
+        if score != consult.severity_score:
+            consult.severity_score = score
+            rescored.append(consult)
+        consult.updated_at = now
+    update_section_d(changed.values())
+    for consult in rescored:
+        if consult.submitted:
+            severity_changed.send(sender=ICUConsultation, consult=consult)
+    return len(changed)
+
+
+# ------------------------------
+# Ingestion
+# ------------------------------
+class ObservationIngester:
+    """
+    Reads Readings (and None ticks) and stores them in batches of
+    `batch_size`, or sooner once the oldest buffered reading is
+    `flush_interval` seconds old. Readings are matched to the newest
+    consult for their hospital number; unmatched ones are dropped.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.counts = Counter()
+        self.buffer = []
+        self.buffered_since = None
+        self._consult_ids = {}
+        self._consult_ids_loaded = time.monotonic()
+
+    def ingest(self, readings):
+        for reading in readings:
+            if reading is not None:
+                low, high = PLAUSIBLE_RANGES[reading.code]
+                if low <= reading.value <= high:
+                    if not self.buffer:
+                        self.buffered_since = time.monotonic()
+                    self.buffer.append(reading)
+                else:
+                    self.counts['implausible'] += 1
+            if len(self.buffer) >= self.batch_size or (
+                self.buffer and time.monotonic() - self.buffered_since >= self.flush_interval
+            ):
+                self.flush()
+        self.flush()
+        return self.counts
+
+    def consult_ids(self, hospital_numbers):
+        # hospital number -> newest consult, looked up once a minute at most
+        if time.monotonic() - self._consult_ids_loaded > CONSULT_LOOKUP_TTL:
+            self._consult_ids, self._consult_ids_loaded = {}, time.monotonic()
+        unknown = [number for number in hospital_numbers if number not in self._consult_ids]
+        if unknown:
+            rows = ICUConsultation.objects.filter(hospital_number__in=unknown).order_by(
+                'hospital_number', 'request_datetime', 'id',
+            ).values_list('hospital_number', 'id')
+            # Ascending, so the newest consult per number is written last
+            self._consult_ids.update(rows)
+        return self._consult_ids
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        consult_ids = self.consult_ids({reading.hospital_number for reading in batch})
+        observations = [
+            Observation(
+                consult_id=consult_ids[reading.hospital_number], code=reading.code,
+                value=reading.value, observed_at=reading.observed_at,
+            )
+            for reading in batch if reading.hospital_number in consult_ids
+        ]
+        self.counts['unmatched'] += len(batch) - len(observations)
+        if observations:
+            stored, consults_updated = write_with_retry(self.store, observations)
+            self.counts['observations'] += stored
+            self.counts['consults_updated'] += consults_updated
+
+    def store(self, observations):
+        return insert_observations(observations), project_latest(observations)
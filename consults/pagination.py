@@ -0,0 +1,74 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+# ------------------------------
+# Page size from ?page_size=, clamped to a sane range
+# ------------------------------
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+# ------------------------------
+# Opaque cursor: "<request_datetime>|<id>" of the last row on the page
+# ------------------------------
+def encode_position(request_datetime, pk):
+    raw = f"{request_datetime.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def encode_cursor(consult):
+    return encode_position(consult.request_datetime, consult.pk)
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        stamp, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(stamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None  # tampered or stale cursor -> start from the first page
+
+
+# ------------------------------
+# Keyset pagination, newest first on (request_datetime, id)
+# ------------------------------
+def keyset_queryset(queryset, cursor, page_size):
+    queryset = queryset.order_by('-request_datetime', '-id')
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        stamp, pk = position
+        # The leading "<=" bound lets the database seek straight into the
+        # index instead of walking every row before the cursor.
+        queryset = queryset.filter(
+            Q(request_datetime__lte=stamp),
+            Q(request_datetime__lt=stamp) | Q(id__lt=pk),
+        )
+
+    # Fetch one extra row to know whether another page exists
+    return queryset[:page_size + 1]
+
+
+def split_page(rows, page_size):
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def keyset_page(queryset, cursor, page_size):
+    rows = list(keyset_queryset(queryset, cursor, page_size))
+    return split_page(rows, page_size)
+
+
+async def akeyset_page(queryset, cursor, page_size):
+    rows = [row async for row in keyset_queryset(queryset, cursor, page_size)]
+    return split_page(rows, page_size)
@@ -0,0 +1,174 @@
+import zlib
+
+# A small PDF writer for printed consult summaries: A4 pages of headings
+# and "label: value" text in the built-in Helvetica fonts, so no PDF
+# library or system fonts are needed. Output depends only on the input
+# (no timestamps or random ids), which keeps stored PDFs content-addressed.
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+FONTS = {'regular': ('F1', 'Helvetica'), 'bold': ('F2', 'Helvetica-Bold')}
+
+# Glyph widths (1/1000 em) for characters 32-126, from the standard AFM metrics
+_WIDTHS = {
+    'regular': [
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ],
+    'bold': [
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ],
+}
+DEFAULT_WIDTH = 556
+
+
+def text_width(text, style, size):
+    widths = _WIDTHS[style]
+    return sum(widths[ord(char) - 32] if 32 <= ord(char) <= 126 else DEFAULT_WIDTH for char in text) * size / 1000
+
+
+def wrap(text, style, size, width):
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            candidate = f'{line} {word}' if line else word
+            if line and text_width(candidate, style, size) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+            # A word wider than the line (drug names, URLs) is broken by characters
+            while text_width(line, style, size) > width:
+                head = longest_fit(line, style, size, width)
+                lines.append(head)
+                line = line[len(head):]
+        lines.append(line)
+    return lines
+
+
+def longest_fit(text, style, size, width):
+    # At least one character, so wrapping always makes progress
+    end = 1
+    while end < len(text) and text_width(text[:end + 1], style, size) <= width:
+        end += 1
+    return text[:end]
+
+
+def escape(text):
+    # WinAnsi covers Latin-1; anything else prints as "?"
+    encoded = text.encode('cp1252', 'replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+# ------------------------------
+# Layout: blocks -> page content streams
+# ------------------------------
+class PageLayout:
+    def __init__(self):
+        self.pages = []
+        self.ops = []
+        self.y = None
+
+    def new_page(self):
+        if self.ops:
+            self.pages.append(b'\n'.join(self.ops))
+        self.ops = []
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def line(self, text, style='regular', size=10, x=MARGIN, leading=None):
+        leading = leading or size * 1.35
+        if self.y is None or self.y - leading < MARGIN:
+            self.new_page()
+        self.y -= leading
+        font = FONTS[style][0].encode()
+        self.ops.append(b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (font, size, x, self.y, escape(text)))
+
+    def rule(self):
+        if self.y is None or self.y - 8 < MARGIN:
+            self.new_page()
+        self.y -= 4
+        self.ops.append(b'0.6 G %d %.2f m %d %.2f l S' % (MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y))
+        self.y -= 4
+
+    def finish(self):
+        self.new_page()
+        return self.pages
+
+
+def layout_document(title, subtitle, sections):
+    """
+    Lay out one document, starting on a new page. `sections` is
+    [(heading, [(label, value), ...])]. Returns a list of page content
+    streams for write_pdf(). Pure and picklable, so it runs in worker
+    processes.
+    """
+    layout = PageLayout()
+    layout.line(title, 'bold', 16)
+    layout.line(subtitle, 'regular', 10)
+    for heading, fields in sections:
+        layout.y -= 8
+        layout.line(heading, 'bold', 12)
+        layout.rule()
+        for label, value in fields:
+            label_text = f'{label}: '
+            indent = text_width(label_text, 'bold', 10)
+            value_lines = wrap(value, 'regular', 10, TEXT_WIDTH - indent)
+            layout.line(label_text, 'bold', 10)
+            layout.y += 10 * 1.35  # first value line sits beside the label
+            for value_line in value_lines:
+                layout.line(value_line, 'regular', 10, x=MARGIN + indent)
+    return layout.finish()
+
+
+# ------------------------------
+# Serialisation: page content streams -> PDF bytes
+# ------------------------------
+def write_pdf(pages):
+    objects = []  # body of object n at index n - 1
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    fonts = {
+        name: add(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base.encode())
+        for name, base in FONTS.values()
+    }
+    resources = b'<< /Font << %s >> >>' % b' '.join(b'/%s %d 0 R' % (name.encode(), ref) for name, ref in fonts.items())
+    kids = []
+    for content in pages:
+        stream = zlib.compress(content, 9)
+        content_ref = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+        kids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>'
+            % (page_tree, PAGE_WIDTH, PAGE_HEIGHT, resources, content_ref)
+        ))
+    objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % page_tree
+    objects[page_tree - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids),
+    )
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog, xref)
+    return bytes(out)
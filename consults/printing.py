@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .forms import (
+    REASON_CHOICES, SectionAForm, SectionBForm, SectionCForm, SectionDForm,
+    SectionEForm, SectionFForm, SectionGForm,
+)
+from .models import ICUConsultation
+from .pdf import layout_document, write_pdf
+
+logger = logging.getLogger(__name__)
+
+# Printed consult summaries. Layout (the slow part) runs in a pool of
+# worker processes, never in the request; finished PDFs are stored once
+# under their SHA-256 and an index maps (consult, updated_at) to that
+# hash, so a PDF is reused until the consult changes.
+
+PRINT_SECTIONS = [
+    ('Section A: Patient & Requesting Team Details', SectionAForm),
+    ('Section B: Reason for ICU Consult', SectionBForm),
+    ('Section C: Clinical Summary', SectionCForm),
+    ('Section D: Current Clinical Status', SectionDForm),
+    ('Section E: Investigations', SectionEForm),
+    ('Section F: Current (Planned) Interventions', SectionFForm),
+    ("Section G: ICU Doctor's Assessment", SectionGForm),
+]
+REASON_LABELS = dict(REASON_CHOICES)
+# Where the column's verbose name reads badly on paper
+PRINT_LABELS = {
+    'request_datetime': 'Date & time of request',
+    'requesting_dr': 'Requesting doctor',
+    'requesting_dr_contact': 'Requesting doctor contact',
+    'requesting_dr_speed_dial': 'Requesting doctor speed dial',
+    'breathing_spo2': 'SpO2 (%)',
+    'bp_systolic': 'BP systolic',
+    'bp_diastolic': 'BP diastolic',
+    'gcs': 'GCS',
+    'latest_abg': 'Latest ABG',
+    'iv_fluids': 'IV fluids',
+    'datetime': 'Date & time',
+    'contact_no': 'Contact no.',
+}
+MODEL_FIELDS = {field.name: field for field in ICUConsultation._meta.concrete_fields}
+
+PDF_INDEX_TIMEOUT = 30 * 24 * 60 * 60
+
+
+# ------------------------------
+# What gets printed: plain strings only, so it can cross to a worker
+# process as layout_document() arguments
+# ------------------------------
+def display_value(consult, field):
+    value = getattr(consult, field.name)
+    if value in (None, '', []):
+        return '-'
+    if field.name == 'reason':
+        return ', '.join(REASON_LABELS.get(item, item) for item in value)
+    if field.choices:
+        return str(dict(field.flatchoices).get(value, value))
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime):
+        return date_format(timezone.localtime(value), 'Y-m-d H:i')
+    return str(value)
+
+
+def summary_document(consult):
+    sections = []
+    for heading, form_class in PRINT_SECTIONS:
+        names = [name for name in form_class._meta.fields if name in MODEL_FIELDS]
+        names += list(getattr(form_class, 'derived_fields', []))
+        sections.append((heading, [
+            (PRINT_LABELS.get(name) or str(MODEL_FIELDS[name].verbose_name).capitalize(),
+             display_value(consult, MODEL_FIELDS[name]))
+            for name in names
+        ]))
+    subtitle = f'Hospital no. {consult.hospital_number} - requested {display_value(consult, MODEL_FIELDS["request_datetime"])}'
+    return (f'ICU Consultation: {consult.patient_name}', subtitle, sections)
+
+
+# ------------------------------
+# Content-addressed store and (consult, version) index
+# ------------------------------
+def pdf_storage():
+    return FileSystemStorage(location=getattr(settings, 'CONSULT_PDF_ROOT', settings.BASE_DIR / 'consult_pdfs'))
+
+
+def pdf_index():
+    return caches[getattr(settings, 'CONSULT_PDF_CACHE', 'default')]
+
+
+def artifact_name(digest):
+    return f'{digest[:2]}/{digest}.pdf'
+
+
+def store_pdf(data):
+    """Store PDF bytes under their SHA-256 (once) and return the digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    storage = pdf_storage()
+    if not storage.exists(artifact_name(digest)):
+        storage.save(artifact_name(digest), ContentFile(data))
+    return digest
+
+
+def version_key(consult):
+    return f'consults:pdf:{consult.pk}:{consult.updated_at.isoformat()}'
+
+
+def current_pdf(consult):
+    """Digest of the stored PDF for this version of `consult`, or None."""
+    digest = pdf_index().get(version_key(consult))
+    if digest and pdf_storage().exists(artifact_name(digest)):
+        return digest
+    return None
+
+
+def open_pdf(digest):
+    return pdf_storage().open(artifact_name(digest), 'rb')
+
+
+def save_rendered(consult_key, pages):
+    digest = store_pdf(write_pdf(pages))
+    pdf_index().set(consult_key, digest, PDF_INDEX_TIMEOUT)
+    return digest
+
+
+# ------------------------------
+# Worker pool (one per process, started on first use)
+# ------------------------------
+_pool = None
+_dispatcher = None
+_pool_lock = threading.Lock()
+_pending = {}  # version key -> Future, so each version is queued once
+_pending_lock = threading.Lock()
+
+
+def pdf_workers():
+    return getattr(settings, 'CONSULT_PDF_WORKERS', None) or os.cpu_count() or 1
+
+
+def render_pool(workers=None):
+    # "spawn": forking a threaded server process is not safe
+    return ProcessPoolExecutor(workers or pdf_workers(), mp_context=multiprocessing.get_context('spawn'))
+
+
+def get_pool():
+    global _pool, _dispatcher
+    with _pool_lock:
+        if _pool is None:
+            _pool = render_pool()
+            # Threads that wait on the processes and store what they return
+            _dispatcher = ThreadPoolExecutor(pdf_workers(), thread_name_prefix='consult-pdf')
+        return _pool, _dispatcher
+
+
+def request_summary_pdf(consult):
+    """
+    Digest of the current PDF for `consult` if it is ready; otherwise
+    queue it for rendering (once per version) and return None at once.
+    """
+    digest = current_pdf(consult)
+    if digest:
+        return digest
+    key = version_key(consult)
+    with _pending_lock:
+        if key in _pending:
+            return None
+    # The query and pool start-up run unlocked; the lock only guards _pending
+    document = summary_document(ICUConsultation.objects.get(pk=consult.pk))
+    dispatcher = get_pool()[1]
+    with _pending_lock:
+        if key not in _pending:
+            _pending[key] = dispatcher.submit(_render_and_store, key, document)
+    return None
+
+
+def _render_and_store(key, document):
+    try:
+        return save_rendered(key, get_pool()[0].submit(layout_document, *document).result())
+    except Exception:
+        logger.exception('Rendering %s failed', key)
+        raise
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+
+
+def wait_for_pending():
+    # Block until every queued render is stored (tests, shutdown)
+    with _pending_lock:
+        futures = list(_pending.values())
+    wait(futures)
+
+
+# ------------------------------
+# Bulk printing: a day's consults in one PDF, laid out in parallel
+# ------------------------------
+def consults_for_day(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return ICUConsultation.objects.filter(
+        submitted=True, request_datetime__gte=start, request_datetime__lt=start + timedelta(days=1),
+    ).order_by('request_datetime', 'id')
+
+
+def print_consults(consults, workers=None):
+    """
+    One PDF with each consult starting on a new page. Every consult is
+    laid out in a worker process; consults whose stored PDF is stale are
+    stored as they come back. Returns (pdf bytes, number of consults).
+    """
+    consults = list(consults)
+    if not consults:
+        return None, 0
+    with render_pool(workers) as pool:
+        # layout_document only needs consults.pdf, so workers never set up Django
+        documents = [summary_document(consult) for consult in consults]
+        rendered = pool.map(layout_document, *zip(*documents), chunksize=4)
+        pages = []
+        for consult, consult_pages in zip(consults, rendered):
+            if current_pdf(consult) is None:
+                save_rendered(version_key(consult), consult_pages)
+            pages.extend(consult_pages)
+    return write_pdf(pages), len(consults)
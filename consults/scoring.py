@@ -0,0 +1,133 @@
+import re
+from bisect import bisect_left
+
+# Early-warning severity score from the Section D vitals, NEWS2-style
+# bands plus the ICU red flags Section D records. The band table below is
+# the single source of truth for both the per-save scorer and the
+# vectorised bulk recompute (manage.py recompute_severity).
+
+# (column, inclusive upper bound of each band, points per band)
+VITAL_BANDS = [
+    ('breathing_spo2', (91, 93, 95), (3, 2, 1, 0)),
+    ('bp_systolic', (90, 100, 110, 219), (3, 2, 1, 0, 3)),
+    ('heart_rate', (40, 50, 90, 110, 130), (3, 1, 0, 1, 2, 3)),
+    ('temperature', (35.0, 36.0, 38.0, 39.0), (3, 1, 0, 1, 2)),
+]
+
+SUPPLEMENTAL_O2_POINTS = 2      # any O2 device, or intubated
+ALTERED_CONSCIOUSNESS_POINTS = 3  # GCS below 15
+AIRWAY_THREATENED_POINTS = 3
+INOTROPES_POINTS = 3
+
+# breathing_device values that mean "no supplemental oxygen"
+ROOM_AIR = {'', 'ra', 'room air', 'none', 'nil', 'no'}
+
+SCORE_FIELDS = (
+    [column for column, _, _ in VITAL_BANDS]
+    + ['breathing_device', 'intubated', 'gcs', 'airway_threatened', 'circulation_inotropes']
+)
+
+
+# ------------------------------
+# Input parsing (Section D stores some vitals as free text)
+# ------------------------------
+def parse_number(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_gcs(value):
+    # "14", "14/15" or "E3V4M6"
+    if not value:
+        return None
+    text = str(value).upper()
+    parts = re.fullmatch(r'\s*E(\d)\s*V(\d|T)\s*M(\d)\s*', text)
+    if parts:
+        eyes, verbal, motor = parts.groups()
+        return int(eyes) + (1 if verbal == 'T' else int(verbal)) + int(motor)
+    number = re.match(r'\s*(\d+)', text)
+    return int(number.group(1)) if number else None
+
+
+def on_supplemental_o2(device, intubated):
+    return intubated == 'yes' or (device or '').strip().lower() not in ROOM_AIR
+
+
+# ------------------------------
+# Per-consult score, used when Section D is saved
+# ------------------------------
+def severity_score(consult):
+    """Score `consult`'s Section D, or None if no vitals were recorded."""
+    total = 0
+    recorded = False
+    for column, bounds, points in VITAL_BANDS:
+        value = parse_number(getattr(consult, column))
+        if value is not None:
+            recorded = True
+            total += points[bisect_left(bounds, value)]
+
+    gcs = parse_gcs(consult.gcs)
+    if gcs is not None:
+        recorded = True
+        if gcs < 15:
+            total += ALTERED_CONSCIOUSNESS_POINTS
+
+    if not recorded:
+        return None
+
+    if on_supplemental_o2(consult.breathing_device, consult.intubated):
+        total += SUPPLEMENTAL_O2_POINTS
+    if consult.airway_threatened:
+        total += AIRWAY_THREATENED_POINTS
+    if consult.circulation_inotropes == 'yes':
+        total += INOTROPES_POINTS
+    return total
+
+
+# ------------------------------
+# Whole-table score with NumPy
+# ------------------------------
+def severity_scores(np, rows):
+    """
+    Score many consults at once. `rows` maps each SCORE_FIELDS column to a
+    sequence of raw values; returns a float array with NaN for consults
+    with no vitals. Only distinct free-text values are parsed in Python.
+    """
+    count = len(rows[SCORE_FIELDS[0]])
+    total = np.zeros(count)
+    recorded = np.zeros(count, dtype=bool)
+
+    for column, bounds, points in VITAL_BANDS:
+        try:
+            values = np.array(rows[column], dtype=float)  # None -> NaN
+        except (TypeError, ValueError):
+            # Free text slipped into the column; parse it value by value
+            values = np.fromiter((parse_number(v) for v in rows[column]), dtype=float, count=count)
+        present = ~np.isnan(values)
+        band = np.searchsorted(np.asarray(bounds, dtype=float), np.where(present, values, 0), side='left')
+        total += np.where(present, np.asarray(points)[band], 0)
+        recorded |= present
+
+    gcs = _parse_distinct(np, rows['gcs'], parse_gcs)
+    recorded |= ~np.isnan(gcs)
+    total += np.where(gcs < 15, ALTERED_CONSCIOUSNESS_POINTS, 0)
+
+    devices = _parse_distinct(np, rows['breathing_device'], lambda d: float(on_supplemental_o2(d, None)))
+    intubated = np.asarray(rows['intubated'], dtype=object) == 'yes'
+    total += np.where((devices > 0) | intubated, SUPPLEMENTAL_O2_POINTS, 0)
+    total += np.where(np.asarray(rows['airway_threatened'], dtype=bool), AIRWAY_THREATENED_POINTS, 0)
+    total += np.where(np.asarray(rows['circulation_inotropes'], dtype=object) == 'yes', INOTROPES_POINTS, 0)
+
+    return np.where(recorded, total, np.nan)
+
+
+def _parse_distinct(np, values, parse):
+    # Parse each distinct text value once, then broadcast back
+    text = np.asarray(['' if v is None else str(v) for v in values], dtype=object)
+    distinct, inverse = np.unique(text, return_inverse=True)
+    parsed = np.array([parse(v) for v in distinct], dtype=float)
+    return parsed[inverse] if len(text) else np.zeros(0)
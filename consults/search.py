@@ -0,0 +1,198 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import ICUConsultation
+
+# Narrative fields covered by full-text search
+SEARCH_FIELDS = ('clinical_summary', 'assessment', 'plan_comments', 'imaging_findings', 'key_labs')
+
+FTS_TABLE = 'consults_consult_fts'
+CONSULT_TABLE = ICUConsultation._meta.db_table
+
+# Snippet markers: control characters that cannot come from a browser form,
+# swapped for <mark> tags after the snippet has been HTML escaped.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def highlight(snippet):
+    return escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+# ------------------------------
+# SQLite: FTS5 virtual table, rowid = consult id
+# ------------------------------
+class SQLiteSearchBackend:
+    def create_index(self, cursor):
+        columns = ', '.join(SEARCH_FIELDS)
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5({columns}, tokenize='porter unicode61')"
+        )
+        values = ', '.join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, {columns}) SELECT id, {values} FROM {CONSULT_TABLE}")
+
+    def drop_index(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def index(self, consults):
+        columns = ', '.join(SEARCH_FIELDS)
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        rows = [
+            [consult.pk] + [getattr(consult, field) or '' for field in SEARCH_FIELDS]
+            for consult in consults
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[row[0]] for row in rows])
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES ({placeholders})", rows)
+
+    def index_after(self, pk):
+        # Rows bulk-inserted with raw SQL have no pks on the Python side
+        columns = ', '.join(SEARCH_FIELDS)
+        values = ', '.join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {columns}) SELECT id, {values} FROM {CONSULT_TABLE} WHERE id > %s",
+                [pk],
+            )
+
+    def remove(self, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[pk] for pk in pks])
+
+    def search(self, query, limit, offset):
+        # Each term is quoted so FTS5 operators typed by users are matched
+        # literally; quoted terms are ANDed together.
+        match = ' '.join(f'"{term}"' for term in search_terms(query))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {FTS_TABLE}.rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+                f"FROM {FTS_TABLE} JOIN {CONSULT_TABLE} ON {CONSULT_TABLE}.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND {CONSULT_TABLE}.submitted "
+                f"ORDER BY bm25({FTS_TABLE}) LIMIT %s OFFSET %s",
+                [MARK_START, MARK_END, match, limit, offset],
+            )
+            return cursor.fetchall()
+
+
+# ------------------------------
+# PostgreSQL: GIN index over a tsvector expression
+# ------------------------------
+class PostgresSearchBackend:
+    document = " || ' ' || ".join(f"coalesce({field}, '')" for field in SEARCH_FIELDS)
+
+    def create_index(self, cursor):
+        # The index is maintained by Postgres itself on every UPDATE
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS consult_search_gin ON {CONSULT_TABLE} "
+            f"USING GIN (to_tsvector('english', {self.document}))"
+        )
+
+    def drop_index(self, cursor):
+        cursor.execute("DROP INDEX IF EXISTS consult_search_gin")
+
+    def index(self, consults):
+        pass
+
+    def index_after(self, pk):
+        pass
+
+    def remove(self, pks):
+        pass
+
+    def search(self, query, limit, offset):
+        headline_options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, FragmentDelimiter=…'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, ts_headline('english', {self.document}, q, %s) "
+                f"FROM {CONSULT_TABLE}, websearch_to_tsquery('english', %s) q "
+                f"WHERE submitted AND to_tsvector('english', {self.document}) @@ q "
+                f"ORDER BY ts_rank(to_tsvector('english', {self.document}), q) DESC, id DESC "
+                f"LIMIT %s OFFSET %s",
+                [headline_options, ' '.join(search_terms(query)), limit, offset],
+            )
+            return cursor.fetchall()
+
+
+# ------------------------------
+# Other backends: unranked substring match
+# ------------------------------
+class FallbackSearchBackend:
+    def create_index(self, cursor):
+        pass
+
+    def drop_index(self, cursor):
+        pass
+
+    def index(self, consults):
+        pass
+
+    def index_after(self, pk):
+        pass
+
+    def remove(self, pks):
+        pass
+
+    def search(self, query, limit, offset):
+        consults = ICUConsultation.objects.filter(submitted=True)
+        for term in search_terms(query):
+            term_filter = Q()
+            for field in SEARCH_FIELDS:
+                term_filter |= Q(**{f'{field}__icontains': term})
+            consults = consults.filter(term_filter)
+        rows = consults.order_by('-id').values_list('pk', *SEARCH_FIELDS)[offset:offset + limit]
+        return [(row[0], next((text for text in row[1:] if text), '')[:200]) for row in rows]
+
+
+def get_backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return FallbackSearchBackend()
+
+
+# ------------------------------
+# Public helpers used by views and signals
+# ------------------------------
+def index_consults(consults):
+    consults = list(consults)
+    if consults:
+        get_backend().index(consults)
+
+
+def index_consults_after(pk):
+    get_backend().index_after(pk)
+
+
+def remove_consults(pks):
+    pks = list(pks)
+    if pks:
+        get_backend().remove(pks)
+
+
+def search_consults(query, fields, page=1, page_size=20):
+    """Return (hits, has_next); hits are consults loaded with `fields`, each with a .snippet."""
+    if not search_terms(query):
+        return [], False
+
+    offset = (page - 1) * page_size
+    rows = get_backend().search(query, page_size + 1, offset)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    consults = ICUConsultation.objects.only(*fields).in_bulk([pk for pk, _ in rows])
+    hits = []
+    for pk, snippet in rows:
+        consult = consults.get(pk)
+        if consult is not None:
+            consult.snippet = highlight(snippet)
+            hits.append(consult)
+    return hits, has_next
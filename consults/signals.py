@@ -0,0 +1,95 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .analytics import consult_rollup_counts, rollups_before_save, stored_rollups, update_rollups
+from .events import publish_event
+from .fragments import invalidate_fragments
+from .models import ICUConsultation
+from .search import SEARCH_FIELDS, index_consults, remove_consults
+from .tasks import enqueue_submit_tasks
+
+# Workflow events, sent by the views with consult=<ICUConsultation>
+consult_submitted = Signal()
+decision_recorded = Signal()
+severity_changed = Signal()
+
+
+# ------------------------------
+# Keep the full-text index in step with the consult table
+# ------------------------------
+@receiver(post_save, sender=ICUConsultation)
+def sync_search_index(sender, instance, update_fields=None, **kwargs):
+    # Sections that don't touch a narrative field leave the index alone
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_consults([instance])
+
+
+@receiver(post_delete, sender=ICUConsultation)
+def drop_from_search_index(sender, instance, **kwargs):
+    remove_consults([instance.pk])
+
+
+# ------------------------------
+# Drop cached summary renders as soon as a consult changes
+# ------------------------------
+@receiver(post_save, sender=ICUConsultation)
+@receiver(post_delete, sender=ICUConsultation)
+def invalidate_summary_fragments(sender, instance, **kwargs):
+    invalidate_fragments(instance.pk)
+
+
+# ------------------------------
+# Keep the analytics rollups in step: submissions, decisions and any other
+# edit to a counted column move the consult between rollup rows
+# ------------------------------
+@receiver(pre_save, sender=ICUConsultation)
+def remember_rollups(sender, instance, update_fields=None, **kwargs):
+    instance._rollups_before = rollups_before_save(instance, update_fields)
+
+
+@receiver(post_save, sender=ICUConsultation)
+def move_rollups(sender, instance, **kwargs):
+    before = instance.__dict__.pop('_rollups_before', None)
+    if before is not None:
+        update_rollups(before, consult_rollup_counts(instance))
+
+
+@receiver(pre_delete, sender=ICUConsultation)
+def remember_rollups_before_delete(sender, instance, **kwargs):
+    instance._rollups_before = stored_rollups(instance)
+
+
+@receiver(post_delete, sender=ICUConsultation)
+def drop_from_rollups(sender, instance, **kwargs):
+    update_rollups(instance.__dict__.pop('_rollups_before', Counter()), {})
+
+
+# ------------------------------
+# Push workflow events to live dashboards once they are committed
+# ------------------------------
+@receiver(consult_submitted)
+def announce_submission(sender, consult, **kwargs):
+    transaction.on_commit(lambda: publish_event('submitted', consult))
+
+
+@receiver(decision_recorded)
+def announce_decision(sender, consult, **kwargs):
+    transaction.on_commit(lambda: publish_event('decision', consult))
+
+
+@receiver(severity_changed)
+def announce_severity(sender, consult, **kwargs):
+    transaction.on_commit(lambda: publish_event('severity', consult))
+
+
+# ------------------------------
+# Queue post-submit side effects for manage.py run_tasks, in the submit
+# transaction, so the request only pays for the inserts
+# ------------------------------
+@receiver(consult_submitted)
+def queue_submit_tasks(sender, consult, **kwargs):
+    enqueue_submit_tasks(consult)
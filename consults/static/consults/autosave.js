@@ -0,0 +1,138 @@
+// Autosave for the section forms: edits are collected per field and,
+// once typing pauses, the changed fields go to the server in one PATCH
+// (see views.autosave_section). The Next button still posts the whole
+// section as before.
+(function () {
+    var form = document.querySelector('form[data-autosave-url]');
+    if (!form || !window.fetch) {
+        return;
+    }
+    var DELAY = 1500;
+    var RETRY_DELAYS = [2000, 5000, 15000, 30000];
+    var url = form.dataset.autosaveUrl;
+    var token = form.querySelector('[name=csrfmiddlewaretoken]');
+    var dirty = {};
+    var timer = null;
+    var inFlight = false;
+    var failures = 0;
+
+    var status = document.createElement('small');
+    status.className = 'text-muted ms-3';
+    status.setAttribute('aria-live', 'polite');
+    form.appendChild(status);
+
+    function fieldValue(name) {
+        var field = form.elements[name];
+        if (field instanceof RadioNodeList) {
+            var inputs = Array.prototype.slice.call(field);
+            if (inputs[0].type === 'checkbox') {
+                return inputs.filter(function (input) { return input.checked; })
+                    .map(function (input) { return input.value; });
+            }
+            return field.value;
+        }
+        return field.type === 'checkbox' ? field.checked : field.value;
+    }
+
+    function markErrors(errors) {
+        Object.keys(errors).forEach(function (name) {
+            var field = form.elements[name];
+            var inputs = field instanceof RadioNodeList ? Array.prototype.slice.call(field) : [field];
+            inputs.forEach(function (input) {
+                input.classList.add('is-invalid');
+                input.title = errors[name].join(' ');
+            });
+        });
+        status.textContent = 'Not saved: please check the highlighted fields';
+    }
+
+    function clearErrors(names) {
+        names.forEach(function (name) {
+            var field = form.elements[name];
+            var inputs = field instanceof RadioNodeList ? Array.prototype.slice.call(field) : [field];
+            inputs.forEach(function (input) {
+                input.classList.remove('is-invalid');
+                input.removeAttribute('title');
+            });
+        });
+    }
+
+    function schedule(delay) {
+        clearTimeout(timer);
+        timer = setTimeout(flush, delay);
+    }
+
+    function flush(keepalive) {
+        clearTimeout(timer);
+        var names = Object.keys(dirty);
+        if (!names.length || (inFlight && !keepalive)) {
+            return;
+        }
+        // Values are read now, so several edits to one field send only the last
+        var patch = {};
+        names.forEach(function (name) { patch[name] = fieldValue(name); });
+        dirty = {};
+        inFlight = true;
+        status.textContent = 'Saving…';
+
+        fetch(url, {
+            method: 'PATCH',
+            credentials: 'same-origin',
+            keepalive: keepalive === true,
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': token ? token.value : ''},
+            body: JSON.stringify(patch),
+        }).then(function (response) {
+            if (response.ok) {
+                failures = 0;
+                clearErrors(names);
+                status.textContent = 'Saved ' + new Date().toLocaleTimeString([], {hour: '2-digit', minute: '2-digit'});
+            } else if (response.status === 400) {
+                failures = 0;
+                return response.json().then(function (body) {
+                    clearErrors(names);
+                    markErrors(body.errors || {});
+                });
+            } else {
+                throw new Error(response.status);
+            }
+        }).catch(function () {
+            // Put the fields back (unless edited again meanwhile) and try later
+            names.forEach(function (name) { dirty[name] = true; });
+            status.textContent = 'Not saved yet, retrying…';
+            failures += 1;
+            schedule(RETRY_DELAYS[Math.min(failures, RETRY_DELAYS.length) - 1]);
+        }).then(function () {
+            inFlight = false;
+            if (Object.keys(dirty).length && !failures) {
+                schedule(DELAY);
+            }
+        });
+    }
+
+    function edited(event) {
+        var name = event.target.name;
+        if (!name || name === 'csrfmiddlewaretoken') {
+            return;
+        }
+        dirty[name] = true;
+        status.textContent = '';
+        if (!failures) {
+            schedule(DELAY);
+        }
+    }
+
+    form.addEventListener('input', edited);
+    form.addEventListener('change', edited);
+    // The regular submit saves every field; don't race it
+    form.addEventListener('submit', function () {
+        clearTimeout(timer);
+        dirty = {};
+    });
+    // Leaving the page: send what is left without waiting for the pause
+    window.addEventListener('pagehide', function () { flush(true); });
+    document.addEventListener('visibilitychange', function () {
+        if (document.visibilityState === 'hidden') {
+            flush(true);
+        }
+    });
+})();
@@ -0,0 +1,68 @@
+// Live feed for all_summaries: newly submitted consults are prepended to
+// the table and recorded decisions flagged, from the /events/ SSE stream.
+(function () {
+    var feed = document.querySelector('[data-live-feed]');
+    if (!feed || !window.EventSource) {
+        return;
+    }
+    var notice = document.getElementById('live-feed');
+    var tbody = feed.tagName === 'TABLE' ? feed.querySelector('tbody') : null;
+    var source = new EventSource(feed.dataset.liveFeed);
+
+    function announce(text) {
+        notice.textContent = text;
+        notice.classList.remove('d-none');
+    }
+
+    function cell(text) {
+        var td = document.createElement('td');
+        td.textContent = text;
+        return td;
+    }
+
+    function renumber() {
+        Array.prototype.forEach.call(tbody.rows, function (row, index) {
+            row.cells[0].textContent = index + 1;
+        });
+    }
+
+    function prepend(consult) {
+        var row = document.createElement('tr');
+        row.dataset.consultId = consult.id;
+        row.className = 'table-info';
+        row.appendChild(cell(''));
+        row.appendChild(cell(consult.patient_name));
+        row.appendChild(cell(consult.age === null ? '' : consult.age));
+        row.appendChild(cell(consult.hospital_number));
+        row.appendChild(cell(consult.requesting_dr));
+        // Server time is UTC; show it the way the table does (Y-m-d H:i)
+        row.appendChild(cell((consult.request_datetime || '').slice(0, 16).replace('T', ' ')));
+
+        var link = document.createElement('a');
+        link.href = feed.dataset.reviewUrl.replace(/0\/$/, consult.id + '/');
+        link.className = 'btn btn-sm btn-primary';
+        link.textContent = 'View Summary';
+        var actions = document.createElement('td');
+        actions.appendChild(link);
+        row.appendChild(actions);
+
+        tbody.insertBefore(row, tbody.firstChild);
+        renumber();
+    }
+
+    source.onmessage = function (message) {
+        var event = JSON.parse(message.data);
+        if (event.type === 'resync' || (event.type === 'submitted' && !tbody)) {
+            window.location.reload();
+        } else if (event.type === 'submitted') {
+            prepend(event);
+            announce('New referral: ' + event.patient_name);
+        } else if (event.type === 'decision') {
+            var row = tbody && tbody.querySelector('tr[data-consult-id="' + event.id + '"]');
+            if (row) {
+                row.classList.add('table-warning');
+            }
+            announce('Decision recorded for ' + event.patient_name + ': ' + (event.decision || '').replace(/_/g, ' '));
+        }
+    };
+})();
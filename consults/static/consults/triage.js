@@ -0,0 +1,36 @@
+// Triage queue: re-fetch the queue when the live feed reports a submission,
+// decision or new severity score, and revalidate it once a minute (the
+// server answers 304 when nothing changed).
+(function () {
+    var queue = document.getElementById('triage-queue');
+    if (!queue) {
+        return;
+    }
+    var pending = null;
+
+    function refresh() {
+        fetch(window.location.href, {cache: 'no-cache', credentials: 'same-origin'})
+            .then(function (response) { return response.ok ? response.text() : null; })
+            .then(function (html) {
+                if (!html) {
+                    return;
+                }
+                var fresh = new DOMParser().parseFromString(html, 'text/html').getElementById('triage-queue');
+                if (fresh) {
+                    queue.innerHTML = fresh.innerHTML;
+                }
+            });
+    }
+
+    function refreshSoon() {
+        // A burst of events (e.g. a ward round) costs one fetch
+        clearTimeout(pending);
+        pending = setTimeout(refresh, 500);
+    }
+
+    if (window.EventSource) {
+        var source = new EventSource(queue.dataset.liveFeed);
+        source.onmessage = refreshSoon;
+    }
+    setInterval(refresh, 60000);
+})();
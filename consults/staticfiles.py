@@ -0,0 +1,135 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Static assets are vendored and fingerprinted (app.<hash>.css) by
+# collectstatic, then stored next to .gz/.br copies so nothing is
+# compressed per request. serve_static() hands them out from STATIC_ROOT
+# when no front-end server does (settings.CONSULT_SERVE_STATIC).
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Not worth a second file (or the Content-Encoding) below these
+MIN_COMPRESS_SIZE = 256
+MIN_SAVING = 0.05
+
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Fingerprinted names never change content
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CACHE_CONTROL = 'public, max-age=300'
+
+
+def brotli_compress(data):
+    try:
+        import brotli  # optional dependency; without it only .gz is written
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def precompressed(data):
+    """{suffix: bytes} of the compressed copies worth keeping for `data`."""
+    if len(data) < MIN_COMPRESS_SIZE:
+        return {}
+    copies = {
+        '.gz': gzip.compress(data, compresslevel=9, mtime=0),
+        '.br': brotli_compress(data),
+    }
+    return {
+        suffix: compressed for suffix, compressed in copies.items()
+        if compressed is not None and len(compressed) < len(data) * (1 - MIN_SAVING)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz/.br beside each hashed file."""
+
+    # A template referring to a missing file (the summary logo) renders
+    # the plain URL rather than failing the whole page
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.write_compressed(name)
+
+    def write_compressed(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        for suffix, compressed in precompressed(data).items():
+            with open(self.path(name + suffix), 'wb') as target:
+                target.write(compressed)
+
+
+# ------------------------------
+# Serving STATIC_ROOT
+# ------------------------------
+@lru_cache(maxsize=1)
+def hashed_names():
+    # Read once per process, like the manifest itself
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def accepted_encodings(header):
+    """Accept-Encoding -> {coding: q}; q=0 means the client refuses it."""
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate(request, path):
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    # Highest q wins; ties go to the smaller encoding (ENCODINGS order)
+    best = None
+    for encoding, suffix in ENCODINGS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[0]) and os.path.isfile(path + suffix):
+            best = (q, encoding, path + suffix)
+    return (best[1], best[2]) if best else (None, path)
+
+
+def serve_static(request, path):
+    name = posixpath.normpath(path).lstrip('/')
+    if name.startswith('..'):
+        raise Http404
+    full_path = staticfiles_storage.path(name)
+    if not os.path.isfile(full_path):
+        raise Http404
+    immutable = name in hashed_names()
+    modified = os.stat(full_path).st_mtime
+    if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), modified):
+        return HttpResponseNotModified()
+
+    encoding, served_path = negotiate(request, full_path)
+    content_type, _ = mimetypes.guess_type(name)
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    # FileResponse names the file it was given; assets are not downloads
+    response.headers.pop('Content-Disposition', None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Last-Modified'] = http_date(modified)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else CACHE_CONTROL
+    return response
@@ -0,0 +1,204 @@
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .forms import REASON_CHOICES
+from .models import ICUConsultation
+from .scoring import severity_score
+
+# Seedable generator of realistic consults for scale testing
+# (manage.py generate_consults). Same seed, same rows.
+
+FIRST_NAMES = [
+    'Thabo', 'Naledi', 'Sipho', 'Lerato', 'Johan', 'Anika', 'Ayesha', 'Ravi', 'Grace', 'Peter',
+    'Zanele', 'Bongani', 'Maria', 'David', 'Fatima', 'Pieter', 'Nomsa', 'Kagiso', 'Sarah', 'Ahmed',
+]
+LAST_NAMES = [
+    'Mokoena', 'Dlamini', 'Nkosi', 'van der Merwe', 'Naidoo', 'Botha', 'Khumalo', 'Pillay', 'Smith',
+    'Ndlovu', 'Pretorius', 'Moosa', 'Mahlangu', 'Jacobs', 'Sithole', 'Venter', 'Govender', 'Zulu',
+]
+
+# Consults come mostly from the emergency unit and a few busy wards
+WARDS = [value for value, _ in ICUConsultation.WARD_CHOICES]
+WARD_WEIGHTS = [30] + [8] * 4 + [2] * (len(WARDS) - 5)
+DISCIPLINES = [value for value, _ in ICUConsultation.REQUESTING_DISCIPLINE_CHOICES]
+DISCIPLINE_WEIGHTS = [
+    {'internal medicine': 30, 'General Surgery': 15, 'neurosurgery': 8, 'obstetrics and gynaecology': 8}.get(d, 3)
+    for d in DISCIPLINES
+]
+REASONS = [value for value, _ in REASON_CHOICES]
+REASON_WEIGHTS = [{'respiratory_failure': 30, 'sepsis_syndrome': 25, 'other': 4}.get(r, 10) for r in REASONS]
+DECISIONS = ['admit', 'not_for_icu', 'review_later', '']
+DECISION_WEIGHTS = [45, 30, 15, 10]
+
+DEVICES = ['', 'nasal prongs', 'face mask', 'NRB', 'HFNO', 'NIV']
+RHYTHMS = ['sinus', 'sinus tachycardia', 'atrial fibrillation', 'SVT']
+PUPILS = ['L:3mm reactive, R:3mm reactive', 'L:2mm sluggish, R:2mm sluggish', 'L:5mm fixed, R:3mm reactive']
+GCS_VALUES = ['15'] * 12 + ['14', '13', '12', '10', '8', '6', '3', 'E3V4M6', 'E2VTM5']
+
+# Narrative building blocks; whole paragraphs are assembled once per
+# generator and reused, which keeps text realistic and generation fast.
+PRESENTATIONS = [
+    'Presented with a three day history of productive cough, fever and worsening shortness of breath.',
+    'Brought in after a witnessed collapse at home with reduced level of consciousness.',
+    'Day two post laparotomy for perforated viscus, increasingly tachycardic and oliguric.',
+    'Known diabetic presenting with vomiting, abdominal pain and Kussmaul breathing.',
+    'Motor vehicle accident with chest and abdominal injuries, initially stable in resus.',
+    'Postpartum haemorrhage following caesarean section, transfused four units so far.',
+    'Known COPD with acute exacerbation not responding to nebulisers and steroids.',
+    'Febrile neutropenia on chemotherapy with hypotension despite two litres of crystalloid.',
+]
+HISTORY = [
+    'Background of hypertension and type 2 diabetes on oral agents.',
+    'HIV positive on ART with a recent undetectable viral load.',
+    'No significant past medical history and fully independent at baseline.',
+    'Chronic kidney disease stage 3 and ischaemic heart disease.',
+    'Previous admission to ICU two years ago for pneumonia.',
+]
+PROGRESS = [
+    'Oxygen requirement has increased over the last six hours.',
+    'Lactate rising from 2.1 to 4.3 despite fluid resuscitation.',
+    'Now drowsy and not protecting the airway consistently.',
+    'Blood pressure only maintained with repeated fluid boluses.',
+    'Urine output below 0.5 ml/kg/h since admission.',
+    'Chest X-ray shows progression of bilateral infiltrates.',
+]
+ASSESSMENTS = [
+    'Requires organ support beyond ward capability.',
+    'Reversible pathology and good baseline function; benefits from ICU care.',
+    'Poor premorbid status; ceiling of care discussed with family.',
+    'Currently stable; reassess after the next set of bloods.',
+]
+PLANS = [
+    'Accept to ICU bed when available, continue current management meanwhile.',
+    'Optimise on the ward with HFNO, call back if deteriorating.',
+    'Not for escalation; palliative team involved.',
+    'Review in four hours with repeat ABG.',
+]
+NARRATIVE_POOL_SIZE = 500
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+class ConsultGenerator:
+    """
+    Builds unsaved ICUConsultation instances. `submitted_ratio` of them are
+    complete and submitted; the rest are drafts abandoned part-way through
+    the wizard. Request times are spread over the `days` before `end`.
+    """
+
+    def __init__(self, seed=0, submitted_ratio=0.85, days=365, end=None):
+        self.rng = random.Random(seed)
+        self.submitted_ratio = submitted_ratio
+        self.end = end or timezone.now()
+        self.span_seconds = days * 24 * 60 * 60
+        self.summaries = [self.narrative(PRESENTATIONS, HISTORY, PROGRESS) for _ in range(NARRATIVE_POOL_SIZE)]
+        self.assessments = [self.narrative(ASSESSMENTS, PROGRESS) for _ in range(NARRATIVE_POOL_SIZE)]
+
+    def narrative(self, *parts):
+        rng = self.rng
+        sentences = [rng.choice(part) for part in parts]
+        sentences += rng.sample(PROGRESS, rng.randint(0, 3))
+        return ' '.join(sentences)
+
+    def generate(self, count):
+        for _ in range(count):
+            yield self.consult()
+
+    def consult(self):
+        rng = self.rng
+        submitted = rng.random() < self.submitted_ratio
+        # Drafts stop after a random section (A always exists)
+        sections = 7 if submitted else rng.randint(1, 6)
+        requested = self.end - timedelta(seconds=rng.randrange(self.span_seconds))
+
+        consult = ICUConsultation(
+            patient_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            age=clamp(int(rng.gauss(52, 18)), 13, 98),
+            gender=rng.choice(['male', 'female']) if rng.random() < 0.99 else 'other',
+            hospital_number=f'H{rng.randrange(10 ** 7):07d}',
+            ward=rng.choices(WARDS, WARD_WEIGHTS)[0],
+            request_datetime=requested,
+            requesting_discipline=rng.choices(DISCIPLINES, DISCIPLINE_WEIGHTS)[0],
+            requesting_dr=f'Dr {rng.choice(LAST_NAMES)}',
+            requesting_dr_contact=f'0{rng.randrange(10 ** 9):09d}',
+            requesting_dr_speed_dial=str(rng.randrange(100, 999)),
+            submitted=submitted,
+        )
+        if sections >= 2:
+            self.section_b(consult)
+        if sections >= 3:
+            consult.clinical_summary = rng.choice(self.summaries)
+        if sections >= 4:
+            self.section_d(consult)
+        if sections >= 5:
+            self.section_e(consult, requested)
+        if sections >= 6:
+            self.section_f(consult)
+        if sections >= 7:
+            self.section_g(consult, requested)
+        return consult
+
+    def section_b(self, consult):
+        rng = self.rng
+        reasons = set(rng.choices(REASONS, REASON_WEIGHTS, k=rng.choice([1, 1, 2, 2, 3])))
+        consult.reason = sorted(reasons)
+        if 'other' in reasons:
+            consult.reason_other = 'Massive transfusion'
+
+    def section_d(self, consult):
+        # Roughly a ward population referred to ICU: most vitals abnormal
+        # but plausible, a few recorded incompletely
+        rng = self.rng
+        sick = rng.random()
+        consult.intubated = 'yes' if sick > 0.92 else 'no'
+        consult.airway_patent = consult.intubated == 'yes' or sick < 0.9
+        consult.airway_threatened = sick > 0.85 and consult.intubated == 'no'
+        if rng.random() < 0.95:
+            consult.breathing_spo2 = clamp(int(rng.gauss(95 - 8 * sick, 3)), 55, 100)
+        consult.breathing_distress = 'yes' if sick > 0.5 else 'no'
+        consult.breathing_device = DEVICES[min(len(DEVICES) - 1, int(sick * len(DEVICES)))]
+        if rng.random() < 0.95:
+            consult.bp_systolic = clamp(int(rng.gauss(120 - 30 * sick, 18)), 50, 230)
+            consult.bp_diastolic = clamp(int(consult.bp_systolic * rng.uniform(0.5, 0.7)), 25, 130)
+        consult.circulation_inotropes = 'yes' if sick > 0.8 else 'no'
+        consult.circulation_anti_hpt = 'yes' if rng.random() < 0.1 else 'no'
+        if rng.random() < 0.97:
+            consult.heart_rate = clamp(int(rng.gauss(90 + 35 * sick, 15)), 30, 200)
+        consult.heart_rhythm = rng.choices(RHYTHMS, [70, 20, 8, 2])[0]
+        consult.fluid_type = rng.choice([value for value, _ in ICUConsultation.FLUID_CHOICES])
+        consult.fluid_urine_output = round(max(0.0, rng.gauss(60 - 40 * sick, 20)), 1)
+        if rng.random() < 0.9:
+            consult.temperature = round(clamp(rng.gauss(37.4 + sick, 0.8), 33.0, 42.0), 1)
+        consult.gcs = rng.choice(GCS_VALUES) if sick > 0.4 else '15'
+        consult.sedation = 'yes' if consult.intubated == 'yes' else 'no'
+        consult.pupils = rng.choices(PUPILS, [90, 8, 2])[0]
+        consult.severity_score = severity_score(consult)
+
+    def section_e(self, consult, requested):
+        rng = self.rng
+        consult.latest_abg = f'pH {rng.uniform(7.05, 7.45):.2f} pCO2 {rng.uniform(3.5, 9.0):.1f} lactate {rng.uniform(0.8, 8.0):.1f}'
+        consult.key_labs = f'WCC {rng.uniform(2, 30):.1f}, Hb {rng.uniform(6, 15):.1f}, creatinine {rng.randint(50, 600)}'
+        consult.imaging_findings = rng.choice(['CXR: bilateral infiltrates', 'CT brain: no acute findings', 'CXR clear', ''])
+        consult.time_tests_done = requested - timedelta(minutes=rng.randint(10, 240))
+
+    def section_f(self, consult):
+        rng = self.rng
+        consult.airway = 'ETT' if consult.intubated == 'yes' else 'none'
+        consult.ventilation = consult.breathing_device or 'room air'
+        consult.iv_fluids = rng.choice(['RL 1L', 'NS 500ml', 'none'])
+        consult.inotropes = 'noradrenaline' if consult.circulation_inotropes == 'yes' else 'none'
+        consult.antibiotics = rng.choice(['ceftriaxone', 'piperacillin-tazobactam', 'meropenem', 'none'])
+
+    def section_g(self, consult, requested):
+        rng = self.rng
+        consult.assessment = rng.choice(self.assessments)
+        consult.decision = rng.choices(DECISIONS, DECISION_WEIGHTS)[0]
+        consult.plan_comments = rng.choice(PLANS)
+        consult.consultant_name = f'Dr {rng.choice(LAST_NAMES)}'
+        consult.signature = consult.consultant_name[3:6].upper()
+        consult.datetime = requested + timedelta(minutes=rng.randint(15, 180))
+        consult.contact_no = str(rng.randrange(1000, 9999))
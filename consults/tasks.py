@@ -0,0 +1,195 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .locking import write_with_retry
+from .models import ICUConsultation, Task
+from .pdf import layout_document
+from .printing import current_pdf, save_rendered, summary_document, version_key
+
+logger = logging.getLogger(__name__)
+
+# Side effects of the consult workflow run here, out of the request:
+# views enqueue a row (in the same transaction as the change that caused
+# it) and manage.py run_tasks works the queue. Delivery is at least once,
+# so every task must be safe to run twice.
+
+# Retry backoff: 10 s, 20 s, 40 s ... capped at an hour, with jitter
+RETRY_BASE_SECONDS = 10
+RETRY_CAP_SECONDS = 60 * 60
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 5 * 60
+DONE_RETENTION = timedelta(days=7)
+
+# name -> (function, max attempts)
+TASKS = {}
+
+
+def task(name, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register a function as a task; it is called with the payload as keyword arguments."""
+    def register(func):
+        TASKS[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """
+    Queue task `name`. With an idempotency `key`, only the first enqueue
+    of that key ever creates a task. Call it inside the transaction that
+    makes the task necessary, so both commit or neither does.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown task {name!r}")
+    fields = {
+        'name': name, 'payload': payload or {}, 'max_attempts': TASKS[name][1],
+        'run_after': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        Task.objects.create(**fields)
+    else:
+        # Only a clash on the key is absorbed; other constraint errors raise
+        Task.objects.get_or_create(idempotency_key=key, defaults=fields)
+
+
+def retry_delay(attempts):
+    return min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+# ------------------------------
+# Claiming and finishing (each its own short write)
+# ------------------------------
+def claim_tasks(worker_id, limit, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Lease up to `limit` ready tasks to `worker_id`: queued ones that are
+    due, plus running ones whose worker's lease ran out. Workers never
+    get the same task; on SQLite the claim transaction takes the write
+    lock up front, elsewhere SKIP LOCKED keeps claimers apart.
+    """
+    now = timezone.now()
+    ready = Task.objects.filter(
+        Q(state=Task.QUEUED, run_after__lte=now) | Q(state=Task.RUNNING, locked_until__lt=now),
+    )
+    # An idle poll is a plain read, not a write transaction
+    if not ready.exists():
+        return []
+
+    def claim():
+        ids = list(
+            ready.select_for_update(skip_locked=True).order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Task.objects.filter(id__in=ids).update(
+            state=Task.RUNNING, locked_by=worker_id, locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+        return list(Task.objects.filter(id__in=ids).order_by('run_after', 'id'))
+    return write_with_retry(claim)
+
+
+def _finish(task, **changes):
+    # Only while we still hold the lease: a task reclaimed from us after a
+    # stall belongs to its new worker
+    return write_with_retry(
+        Task.objects.filter(pk=task.pk, state=Task.RUNNING, locked_by=task.locked_by).update,
+        locked_until=None, **changes,
+    )
+
+
+def complete_task(task):
+    _finish(task, state=Task.DONE, finished_at=timezone.now(), last_error='')
+
+
+def fail_task(task, error):
+    if task.attempts >= task.max_attempts:
+        _finish(task, state=Task.FAILED, finished_at=timezone.now(), last_error=error)
+    else:
+        run_after = timezone.now() + timedelta(seconds=retry_delay(task.attempts))
+        _finish(task, state=Task.QUEUED, run_after=run_after, locked_by='', last_error=error)
+
+
+def run_task(task):
+    try:
+        if task.name not in TASKS:
+            raise LookupError(f"Unknown task {task.name!r}")
+        func, _ = TASKS[task.name]
+        func(**task.payload)
+    except Exception:
+        logger.warning('Task %s failed (attempt %d of %d)', task, task.attempts, task.max_attempts, exc_info=True)
+        fail_task(task, traceback.format_exc())
+    else:
+        complete_task(task)
+    finally:
+        # Worker threads are long-lived; don't let them sit on connections
+        connections.close_all()
+
+
+def prune_tasks(older_than=DONE_RETENTION):
+    """Delete tasks finished more than `older_than` ago (their keys can then be reused)."""
+    cutoff = timezone.now() - older_than
+    return Task.objects.filter(state=Task.DONE, finished_at__lt=cutoff).delete()[0]
+
+
+# ------------------------------
+# Worker: one process, up to `concurrency` tasks at a time
+# ------------------------------
+class Worker:
+    def __init__(self, concurrency=4, batch_size=None, lease_seconds=DEFAULT_LEASE_SECONDS, worker_id=None):
+        self.concurrency = concurrency
+        self.batch_size = batch_size or concurrency
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.processed = 0
+
+    def stop(self):
+        # Finish what is running, claim nothing new
+        self.stopping.set()
+
+    def run(self, drain=False, poll_interval=1.0):
+        """Work the queue until stop(), or with `drain` until nothing is ready."""
+        running = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='consult-task') as pool:
+            while not self.stopping.is_set():
+                free = min(self.concurrency - len(running), self.batch_size)
+                claimed = claim_tasks(self.worker_id, free, self.lease_seconds) if free > 0 else []
+                running.update(pool.submit(run_task, task) for task in claimed)
+                if not running:
+                    if drain:
+                        break
+                    self.stopping.wait(poll_interval)
+                    continue
+                finished, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                self.processed += len(finished)
+            wait(running)
+            self.processed += len(running)
+        return self.processed
+
+
+# ------------------------------
+# Tasks
+# ------------------------------
+@task('render_summary_pdf')
+def render_summary_pdf(consult_id):
+    # Have the printable PDF ready before anyone asks for it
+    consult = ICUConsultation.objects.filter(pk=consult_id).first()
+    if consult is None or current_pdf(consult):
+        return
+    save_rendered(version_key(consult), layout_document(*summary_document(consult)))
+
+
+def enqueue_submit_tasks(consult):
+    # One row per side effect; keyed on the consult version so a retried
+    # or repeated submit doesn't queue the work twice
+    version = consult.updated_at.isoformat()
+    enqueue('render_summary_pdf', {'consult_id': consult.pk}, key=f'render_summary_pdf:{consult.pk}:{version}')
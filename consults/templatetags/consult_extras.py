@@ -0,0 +1,26 @@
+from django import template
+from django.contrib.staticfiles import finders
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+# "sepsis_syndrome" -> "sepsis syndrome"
+@register.filter(name="humanize_choice")
+def humanize_choice(value):
+    return str(value).replace("_", " ")
+
+
+# Contents of a static file, for inlining (critical CSS). Read once.
+_inlined = {}
+
+
+@register.simple_tag
+def inline_static(path):
+    if path not in _inlined:
+        found = finders.find(path)
+        if found is None:
+            raise template.TemplateSyntaxError(f"inline_static: static file '{path}' not found")
+        with open(found, encoding="utf-8") as source:
+            _inlined[path] = mark_safe(source.read())
+    return _inlined[path]
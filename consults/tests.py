@@ -1,3 +1,1639 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import api, async_views
+from .ages import AGE_BANDS, age_band_q, age_expression, age_on
+from .benchmarking import WorkflowURLConf, compare_results, run_workflow_benchmark
+from .events import SUBSCRIBER_QUEUE_SIZE, InProcessBroker
+from .forms import (
+    SectionAForm, SectionBForm, SectionCForm, SectionDForm,
+    SectionEForm, SectionFForm, SectionGForm,
+)
+from .fragments import cache_stats, fragment_cache, reset_cache_stats
+from .imports import SectionValidator
+from .instrumentation import N_PLUS_ONE_THRESHOLD, RequestProfile, record_request, reset_endpoint_stats
+from .locking import awrite_with_retry, lock_stats, reset_lock_stats, write_with_retry
+from .management.commands import import_consults
+from .models import ConsultRollup, ICUConsultation, ImportCheckpoint, Observation, ReasonRollup, Task
+from .observations import ObservationIngester, parse_hl7_time, read_csv, read_hl7
+from .pagination import decode_cursor, encode_cursor
+from .pdf import MARGIN, TEXT_WIDTH, PageLayout, layout_document, text_width, wrap, write_pdf
+from .printing import current_pdf, wait_for_pending
+from .scoring import SCORE_FIELDS, severity_score, severity_scores
+from .search import search_consults
+from .staticfiles import IMMUTABLE_CACHE_CONTROL, hashed_names, serve_static
+from .synthetic import ConsultGenerator
+from .tasks import TASKS, Worker, claim_tasks, enqueue
+from .views import save_section, section_fields
+
+
+BASE_TIME = datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def make_consult(**kwargs):
+    fields = {
+        'patient_name': 'Test Patient',
+        'age': 40,
+        'gender': 'female',
+        'hospital_number': 'H0001',
+        'ward': 'ward a',
+        'request_datetime': BASE_TIME,
+        'requesting_discipline': 'internal medicine',
+        'requesting_dr': 'Dr Test',
+        'submitted': True,
+    }
+    fields.update(kwargs)
+    return ICUConsultation.objects.create(**fields)
+
+
+# Valid POST data for each wizard step
+SECTION_DATA = {
+    'section_a': {
+        'patient_name': 'Jane Doe', 'age': '54', 'gender': 'female', 'hospital_number': 'H1234',
+        'ward': 'ward c', 'request_datetime': '2025-01-01T09:30', 'requesting_discipline': 'internal medicine',
+        'requesting_dr': 'Dr Smith', 'requesting_dr_contact': '0123', 'requesting_dr_speed_dial': '42',
+    },
+    'section_b': {'reason': ['sepsis_syndrome', 'respiratory_failure'], 'reason_other': ''},
+    'section_c': {'clinical_summary': 'Pneumonia with worsening hypoxia despite high flow oxygen.'},
+    'section_d': {
+        'airway_patent': 'on', 'intubated': 'no', 'breathing_spo2': '88', 'breathing_distress': 'yes',
+        'breathing_device': 'NRB', 'bp_systolic': '92', 'bp_diastolic': '55', 'circulation_inotropes': 'no',
+        'circulation_anti_hpt': 'no', 'heart_rate': '118', 'heart_rhythm': 'sinus', 'fluid_type': 'fluid_type1',
+        'fluid_urine_output': '20', 'temperature': '38.9', 'measures': 'paracetamol', 'gcs': '14',
+        'sedation': 'no',
+    },
+    'section_e': {
+        'latest_abg': 'pH 7.31 pCO2 6.1', 'key_labs': 'WCC 18, lactate 3.4', 'imaging_findings': 'RLL consolidation',
+        'time_tests_done': '2025-01-01T08:45',
+    },
+    'section_f': {
+        'airway': 'none', 'ventilation': 'HFNO 60L', 'iv_fluids': 'RL 1L', 'inotropes': 'none',
+        'antibiotics': 'ceftriaxone', 'other_interventions': '',
+    },
+    'section_g': {
+        'assessment': 'Needs ICU for NIV', 'decision': 'admit', 'plan_comments': 'Bed 4',
+        'consultant_name': 'Dr Jones', 'signature': 'RJ', 'datetime': '2025-01-01T11:00', 'contact_no': '555',
+    },
+}
+
+SECTION_FORMS = {
+    'section_a': SectionAForm, 'section_b': SectionBForm, 'section_c': SectionCForm, 'section_d': SectionDForm,
+    'section_e': SectionEForm, 'section_f': SectionFForm, 'section_g': SectionGForm,
+}
+
+
+# ------------------------------
+# All Summaries: keyset pagination
+# ------------------------------
+class AllSummariesPaginationTests(TestCase):
+    def setUp(self):
+        # Two consults share a timestamp so the id tie-breaker is exercised
+        self.consults = [
+            make_consult(patient_name=f'Patient {i}', request_datetime=BASE_TIME + timedelta(hours=i // 2))
+            for i in range(7)
+        ]
+        make_consult(patient_name='Draft Patient', submitted=False)
+
+    def newest_first(self):
+        return sorted(self.consults, key=lambda c: (c.request_datetime, c.id), reverse=True)
+
+    def test_pages_walk_every_submitted_consult_once(self):
+        url = reverse('consults:all_summaries')
+        seen = []
+        query = '?page_size=3'
+        while query:
+            response = self.client.get(url + query)
+            seen.extend(c.id for c in response.context['summaries'])
+            query = response.context['next_url']
+
+        self.assertEqual(seen, [c.id for c in self.newest_first()])
+
+    def test_page_is_one_narrow_bounded_query(self):
+        # Plus the high-water mark query behind the conditional GET headers
+        with self.assertNumQueries(2) as ctx:
+            self.client.get(reverse('consults:all_summaries'), {'page_size': 3})
+        sql = ctx.captured_queries[1]['sql']
+        self.assertNotIn('clinical_summary', sql)
+        self.assertIn('LIMIT 4', sql)
+
+    def test_invalid_cursor_and_page_size_fall_back_to_first_page(self):
+        response = self.client.get(reverse('consults:all_summaries'), {'cursor': 'garbage', 'page_size': 'x'})
+        self.assertEqual(len(response.context['summaries']), 7)
+        self.assertIsNone(response.context['next_url'])
+
+    def test_cursor_round_trip(self):
+        consult = self.consults[3]
+        self.assertEqual(decode_cursor(encode_cursor(consult)), (consult.request_datetime, consult.pk))
+
+
+# ------------------------------
+# Query plans use the workflow indexes
+# ------------------------------
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        make_consult()
+
+    def plan_for(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, params or {})
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+        return ' | '.join(plans)
+
+    def test_list_uses_partial_submitted_index(self):
+        plan = self.plan_for(reverse('consults:all_summaries'))
+        self.assertIn('USING INDEX consult_submitted_recent_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_list_next_page_seeks_into_index(self):
+        make_consult(request_datetime=BASE_TIME - timedelta(days=1))
+        response = self.client.get(reverse('consults:all_summaries'), {'page_size': 1})
+        plan = self.plan_for(reverse('consults:all_summaries') + response.context['next_url'])
+        self.assertIn('consult_submitted_recent_idx (request_datetime<?)', plan)
+
+    def test_list_filters_use_their_indexes(self):
+        for param, index in [
+            ('hospital_number', 'consult_hospital_no_idx'),
+            ('ward', 'consult_ward_idx'),
+            ('discipline', 'consult_discipline_idx'),
+            ('decision', 'consult_decision_idx'),
+        ]:
+            with self.subTest(param=param):
+                plan = self.plan_for(reverse('consults:all_summaries'), {param: 'x'})
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_search_uses_full_text_index(self):
+        plan = self.plan_for(reverse('consults:search'), {'q': 'sepsis'})
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+        self.assertIn('USING INTEGER PRIMARY KEY', plan)
+
+    def test_triage_queue_scans_partial_triage_index(self):
+        plan = self.plan_for(reverse('consults:triage_api'))
+        self.assertIn('USING INDEX consult_triage_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_draft_lookup_uses_partial_draft_index(self):
+        plan = ICUConsultation.objects.filter(submitted=False).only('id').explain()
+        self.assertIn('USING INDEX consult_draft_idx', plan)
+
+    def test_single_consult_lookup_uses_primary_key(self):
+        plan = ICUConsultation.objects.filter(pk=1).explain()
+        self.assertIn('USING INTEGER PRIMARY KEY', plan)
+
+
+# ------------------------------
+# Full-text search
+# ------------------------------
+class SearchTests(TestCase):
+    def test_ranked_results_with_highlighted_snippets(self):
+        weak = make_consult(
+            patient_name='Weak',
+            clinical_summary='Community acquired pneumonia on oral antibiotics, sepsis screen negative, '
+                             'tolerating feeds and mobilising with physiotherapy on the ward.',
+        )
+        strong = make_consult(
+            patient_name='Strong',
+            clinical_summary='Septic shock from urosepsis.',
+            assessment='Sepsis with rising lactate, sepsis bundle started.',
+        )
+        make_consult(patient_name='Draft', clinical_summary='Sepsis', submitted=False)
+
+        response = self.client.get(reverse('consults:search'), {'q': 'sepsis'})
+
+        results = response.context['results']
+        self.assertEqual([c.pk for c in results], [strong.pk, weak.pk])
+        self.assertIn('<mark>Sepsis</mark>', results[0].snippet)
+
+    def test_snippets_are_escaped_and_operators_literal(self):
+        make_consult(clinical_summary='<script>alert(1)</script> AND sepsis')
+        hits, _ = search_consults('sepsis AND "', ['id'])
+        self.assertEqual(len(hits), 1)
+        self.assertIn('&lt;script&gt;', hits[0].snippet)
+
+    def test_pagination(self):
+        for i in range(5):
+            make_consult(patient_name=f'P{i}', key_labs='lactate 4.2')
+        first, has_next = search_consults('lactate', ['id'], page=1, page_size=3)
+        second, has_more = search_consults('lactate', ['id'], page=2, page_size=3)
+        self.assertTrue(has_next)
+        self.assertFalse(has_more)
+        self.assertEqual(len({c.pk for c in first + second}), 5)
+
+    def test_index_follows_section_saves_and_deletes(self):
+        consult = make_consult(clinical_summary='Asthma exacerbation')
+        self.client.post(
+            reverse('consults:section_c', args=[consult.pk]),
+            {'clinical_summary': 'Diabetic ketoacidosis'},
+        )
+        self.assertEqual(search_consults('asthma', ['id'])[0], [])
+        self.assertEqual([c.pk for c in search_consults('ketoacidosis', ['id'])[0]], [consult.pk])
+
+        consult.delete()
+        self.assertEqual(search_consults('ketoacidosis', ['id'])[0], [])
+
+
+# ------------------------------
+# Section saves only UPDATE their own columns
+# ------------------------------
+class SectionPartialUpdateTests(TestCase):
+    def update_queries(self, captured):
+        # Writes to the consult row itself (not the analytics rollups)
+        table = ICUConsultation._meta.db_table
+        return [q['sql'] for q in captured if q['sql'].startswith(f'UPDATE "{table}"')]
+
+    def updated_columns(self, sql):
+        assignments = sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0]
+        return set(re.findall(r'"(\w+)" = ', assignments))
+
+    def test_each_section_updates_only_its_fields(self):
+        consult = make_consult(submitted=False)
+        for section in ['section_b', 'section_c', 'section_d', 'section_e', 'section_f', 'section_g']:
+            with self.subTest(section=section):
+                form = SECTION_FORMS[section]()
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.post(reverse(f'consults:{section}', args=[consult.pk]), SECTION_DATA[section])
+                self.assertEqual(response.status_code, 302)
+                updates = self.update_queries(ctx.captured_queries)
+                self.assertEqual(len(updates), 1)
+                self.assertEqual(self.updated_columns(updates[0]), set(section_fields(form)) | {'updated_at'})
+
+    def test_unchanged_section_skips_the_update(self):
+        consult = make_consult(submitted=False)
+        url = reverse('consults:section_f', args=[consult.pk])
+        self.client.post(url, SECTION_DATA['section_f'])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, SECTION_DATA['section_f'])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.update_queries(ctx.captured_queries), [])
+
+    def test_section_save_keeps_concurrent_edits_to_other_sections(self):
+        consult = make_consult(submitted=False, clinical_summary='Original')
+        # Another tab saves Section C while this request's Section F form is in flight
+        ICUConsultation.objects.filter(pk=consult.pk).update(clinical_summary='Edited elsewhere')
+        form = SectionFForm(SECTION_DATA['section_f'], instance=consult)
+        self.assertTrue(form.is_valid())
+        save_section(form)
+        consult.refresh_from_db()
+        self.assertEqual(consult.clinical_summary, 'Edited elsewhere')
+        self.assertEqual(consult.ventilation, 'HFNO 60L')
+
+    def test_submit_only_updates_submitted_flag(self):
+        consult = make_consult(submitted=False)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('consults:consult_summary', args=[consult.pk]))
+        updates = self.update_queries(ctx.captured_queries)
+        self.assertEqual([self.updated_columns(sql) for sql in updates], [{'submitted', 'updated_at'}])
+
+
+# ------------------------------
+# Draft wizard: buffered sections, one write on submit
+# ------------------------------
+class DraftWizardTests(TestCase):
+    def draft_url(self, step):
+        return reverse('consults:draft_section', args=[step])
+
+    def test_sections_are_buffered_until_submit(self):
+        with self.assertNumQueries(0):
+            self.client.get(self.draft_url('a'))
+            for step in 'abcdefg':
+                response = self.client.post(self.draft_url(step), SECTION_DATA[f'section_{step}'])
+                self.assertEqual(response.status_code, 200)
+        # The last step answers with the summary page itself
+        self.assertTemplateUsed(response, 'consults/consult_summary.html')
+        self.assertFalse(ICUConsultation.objects.exists())
+
+        # Submit the way the browser does: to the rendered form's action
+        action = re.search(r'<form method="post" action="([^"]+)"', response.content.decode()).group(1)
+        self.assertEqual(action, reverse('consults:draft_summary'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(action)
+        self.assertTemplateUsed(response, 'consults/consult_complete.html')
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "consults_icu')]), 1)
+
+        consult = ICUConsultation.objects.get()
+        self.assertTrue(consult.submitted)
+        self.assertEqual(consult.reason, ['sepsis_syndrome', 'respiratory_failure'])
+        self.assertEqual(consult.heart_rate, 118)
+        self.assertEqual(consult.decision, 'admit')
+
+        # The draft is gone once submitted
+        response = self.client.get(reverse('consults:draft_summary'))
+        self.assertRedirects(response, self.draft_url('a'))
+
+    def test_post_renders_next_step_posting_to_its_own_url(self):
+        response = self.client.post(self.draft_url('a'), SECTION_DATA['section_a'])
+        self.assertTemplateUsed(response, 'consults/section_b.html')
+        self.assertContains(response, f'action="{self.draft_url("b")}"')
+
+    def test_invalid_section_is_redisplayed_with_errors(self):
+        response = self.client.post(self.draft_url('c'), {'clinical_summary': ''})
+        self.assertTemplateUsed(response, 'consults/section_c.html')
+        self.assertTrue(response.context['form'].errors)
+
+    def test_summary_sends_user_to_first_missing_section(self):
+        self.client.post(self.draft_url('a'), SECTION_DATA['section_a'])
+        self.client.post(self.draft_url('b'), SECTION_DATA['section_b'])
+        response = self.client.post(reverse('consults:draft_summary'))
+        self.assertRedirects(response, self.draft_url('c'))
+        self.assertFalse(ICUConsultation.objects.exists())
+
+    def test_unknown_step_is_404(self):
+        self.assertEqual(self.client.get(self.draft_url('z')).status_code, 404)
+
+    def test_per_section_urls_still_work(self):
+        response = self.client.post(reverse('consults:section_a'), SECTION_DATA['section_a'])
+        consult = ICUConsultation.objects.get()
+        self.assertRedirects(response, reverse('consults:section_b', args=[consult.pk]))
+
+
+# ------------------------------
+# Cached summary fragments
+# ------------------------------
+class SummaryFragmentCacheTests(TestCase):
+    def setUp(self):
+        fragment_cache().clear()
+        reset_cache_stats()
+        self.consult = make_consult(clinical_summary='Massive PE', reason=['sepsis_syndrome'])
+
+    def test_second_view_is_served_from_cache(self):
+        url = reverse('consults:review_summary', args=[self.consult.pk])
+        with self.assertNumQueries(2):
+            first = self.client.get(url)
+        # A hit only reads the version columns
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertContains(second, 'Massive PE')
+        self.assertContains(second, 'Sepsis syndrome')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_section_save_invalidates_both_summaries(self):
+        review_url = reverse('consults:review_summary', args=[self.consult.pk])
+        summary_url = reverse('consults:consult_summary', args=[self.consult.pk])
+        self.client.get(review_url)
+        self.client.get(summary_url)
+
+        self.client.post(reverse('consults:section_c', args=[self.consult.pk]), {'clinical_summary': 'Tamponade'})
+
+        self.assertContains(self.client.get(review_url), 'Tamponade')
+        self.assertContains(self.client.get(summary_url), 'Tamponade')
+        self.assertEqual(cache_stats()['hits'], 0)
+
+    def test_stale_entry_from_older_version_is_not_served(self):
+        url = reverse('consults:review_summary', args=[self.consult.pk])
+        self.client.get(url)
+        # Bypass the signal: the version check alone must reject the entry
+        ICUConsultation.objects.filter(pk=self.consult.pk).update(
+            clinical_summary='Aortic dissection', updated_at=self.consult.updated_at + timedelta(seconds=1),
+        )
+        self.assertContains(self.client.get(url), 'Aortic dissection')
+
+    def test_stats_endpoint(self):
+        self.client.get(reverse('consults:review_summary', args=[self.consult.pk]))
+        response = self.client.get(reverse('consults:cache_stats'))
+        self.assertEqual(response.json(), {'hits': 0, 'misses': 1, 'hit_ratio': 0.0})
+
+
+# ------------------------------
+# Conditional GET (ETag / Last-Modified)
+# ------------------------------
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.consult = make_consult()
+
+    def test_unchanged_consult_answers_304_with_one_query(self):
+        url = reverse('consults:review_summary', args=[self.consult.pk])
+        first = self.client.get(url)
+        self.assertTrue(first['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_section_save_changes_consult_etag(self):
+        url = reverse('consults:review_summary', args=[self.consult.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('consults:section_c', args=[self.consult.pk]), {'clinical_summary': 'New'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_follows_high_water_mark_and_query(self):
+        url = reverse('consults:all_summaries')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'ward': 'ward a'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        draft = make_consult(submitted=False)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post(reverse('consults:consult_summary', args=[draft.pk]))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_revalidates_when_the_date_changes(self):
+        url = reverse('consults:all_summaries')
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return date.today() + timedelta(days=1)
+
+        with mock.patch('consults.views.date', Tomorrow):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 200)
+
+    def test_missing_consult_is_still_404(self):
+        self.assertEqual(self.client.get(reverse('consults:review_summary', args=[999])).status_code, 404)
+
+
+# ------------------------------
+# Streaming export
+# ------------------------------
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admitted = make_consult(
+            patient_name='Admitted', ward='ward b', decision='admit',
+            reason=['sepsis_syndrome', 'other'], reason_other='burns',
+        )
+        self.later = make_consult(
+            patient_name='Later', ward='emergency unit', requesting_discipline='neurosurgery',
+            decision='review_later', request_datetime=BASE_TIME + timedelta(days=3),
+        )
+        make_consult(patient_name='Draft', submitted=False)
+
+    def export(self, **params):
+        response = self.client.get(reverse('consults:export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_uses_choice_labels_and_selected_columns(self):
+        body = self.export(columns='patient_name,ward,requesting_discipline,decision,reason')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ['patient_name', 'ward', 'requesting_discipline', 'decision', 'reason'])
+        self.assertEqual(rows[1], ['Admitted', 'Ward B', 'Internal Medicine', 'Admit to ICU', 'sepsis_syndrome; other'])
+        self.assertEqual(rows[2], ['Later', 'Emergency Unit', 'Neurosurgery', 'Review Later', ''])
+        self.assertEqual(len(rows), 3)
+
+    def test_ndjson_with_filters(self):
+        body = self.export(format='ndjson', columns='id,patient_name,reason', date_from='2025-01-02')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(records, [{'id': self.later.pk, 'patient_name': 'Later', 'reason': []}])
+
+        body = self.export(format='ndjson', columns='id', ward='ward b', decision='admit', date_to='2025-01-01')
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.admitted.pk])
+
+    def test_bad_options_are_rejected(self):
+        self.assertEqual(self.client.get(reverse('consults:export'), {'columns': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('consults:export'), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('consults:export'), {'date_from': 'May'}).status_code, 400)
+
+    def test_management_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.csv')
+            call_command('export_consults', '--columns', 'patient_name', '--discipline', 'neurosurgery', '--output', path)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(f.read().splitlines(), ['patient_name', 'Later'])
+
+
+# ------------------------------
+# Bulk import
+# ------------------------------
+def import_record(**overrides):
+    record = {}
+    for data in SECTION_DATA.values():
+        record.update(data)
+    record.update(overrides)
+    return record
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_ndjson(self, records):
+        path = os.path.join(self.tmp.name, 'consults.ndjson')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        return path
+
+    def run_import(self, path, *args):
+        call_command('import_consults', path, *args, stdout=io.StringIO())
+        with open(f'{path}.errors.csv', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def test_export_round_trip(self):
+        original = make_consult(
+            patient_name='Exported', ward='ward b', decision='admit', clinical_summary='Septic shock',
+            consultant_name='Dr Jones', signature='RJ', datetime=BASE_TIME, reason=['sepsis_syndrome', 'other'], reason_other='burns',
+        )
+        path = os.path.join(self.tmp.name, 'consults.csv')
+        call_command('export_consults', '--output', path)
+        ICUConsultation.objects.all().delete()
+
+        self.assertEqual(self.run_import(path), [])
+        imported = ICUConsultation.objects.get()
+        self.assertEqual(imported.patient_name, 'Exported')
+        self.assertEqual(imported.ward, 'ward b')
+        self.assertEqual(imported.decision, 'admit')
+        self.assertEqual(imported.reason, ['sepsis_syndrome', 'other'])
+        self.assertEqual(imported.request_datetime, original.request_datetime)
+        self.assertTrue(imported.submitted)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+        hits, _ = search_consults('septic', ['id'])
+        self.assertEqual([hit.pk for hit in hits], [imported.pk])
+
+    def test_section_rules_reject_rows_into_error_report(self):
+        path = self.write_ndjson([
+            import_record(patient_name='Good'),
+            import_record(patient_name='No age', age='', date_of_birth=''),
+            import_record(patient_name='Vague', reason=['other'], reason_other=''),
+            import_record(patient_name='Bad ward', ward='ward z'),
+        ])
+        errors = self.run_import(path)
+
+        self.assertEqual(list(ICUConsultation.objects.values_list('patient_name', flat=True)), ['Good'])
+        self.assertEqual(
+            [(row['line'], row['field']) for row in errors],
+            [('2', '__all__'), ('3', 'reason_other'), ('4', 'ward')],
+        )
+        self.assertEqual(errors[0]['message'], 'Please provide either Age or Date of Birth.')
+
+    def test_empty_and_header_only_files_import_nothing(self):
+        empty = self.write_ndjson([])
+        self.assertEqual(self.run_import(empty), [])
+
+        header_only = os.path.join(self.tmp.name, 'consults.csv')
+        with open(header_only, 'w', encoding='utf-8') as f:
+            f.write(','.join(import_record()) + '\n')
+        self.assertEqual(self.run_import(header_only), [])
+
+        self.assertFalse(ICUConsultation.objects.exists())
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_crash_mid_chunk_neither_skips_nor_repeats_rows(self):
+        path = self.write_ndjson([import_record(patient_name=f'P{n}') for n in range(3)])
+        real_insert = import_consults.insert_consults
+
+        def insert_then_crash(consults):
+            real_insert(consults)
+            if consults[0].patient_name == 'P1':
+                raise KeyboardInterrupt
+
+        with mock.patch.object(import_consults, 'insert_consults', insert_then_crash):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import(path, '--chunk-size', '1')
+        self.assertEqual(ImportCheckpoint.objects.get().records, 1)
+
+        self.run_import(path, '--chunk-size', '1')
+        self.assertEqual(sorted(ICUConsultation.objects.values_list('patient_name', flat=True)), ['P0', 'P1', 'P2'])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_memo_tells_true_from_one(self):
+        validator = SectionValidator(SectionAForm)
+        age = SectionAForm.base_fields['age']
+        self.assertEqual(validator.clean_field('age', age, 1), 1)
+        with self.assertRaises(ValidationError):
+            validator.clean_field('age', age, True)
+
+    def test_resumes_after_checkpoint(self):
+        path = self.write_ndjson([import_record(patient_name=f'P{n}') for n in range(5)])
+        ImportCheckpoint.objects.create(name=path, records=3, imported=3, failed=0)
+        with open(f'{path}.errors.csv', 'w', encoding='utf-8') as f:
+            f.write('line,field,message\n')
+
+        self.run_import(path, '--chunk-size', '1')
+        self.assertEqual(sorted(ICUConsultation.objects.values_list('patient_name', flat=True)), ['P3', 'P4'])
+
+        self.run_import(path, '--restart')
+        self.assertEqual(ICUConsultation.objects.count(), 7)
+
+
+# ------------------------------
+# Async (ASGI) views
+# ------------------------------
+@override_settings(ROOT_URLCONF=WorkflowURLConf(async_views))
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.consult = make_consult(clinical_summary='Old summary')
+
+    async def test_section_a_creates_consult(self):
+        response = await self.async_client.post(reverse('consults:section_a'), SECTION_DATA['section_a'])
+        consult = await ICUConsultation.objects.alatest('id')
+        self.assertRedirects(response, reverse('consults:section_b', args=[consult.pk]), fetch_redirect_response=False)
+        self.assertEqual(consult.patient_name, 'Jane Doe')
+        self.assertEqual(await self.async_client.session.aget('consult_id'), consult.pk)
+
+    async def test_section_save_keeps_other_columns(self):
+        url = reverse('consults:section_c', args=[self.consult.pk])
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Old summary')
+
+        # Changed elsewhere after this form was loaded; the section save must not revert it
+        await ICUConsultation.objects.filter(pk=self.consult.pk).aupdate(patient_name='Renamed')
+        response = await self.async_client.post(url, SECTION_DATA['section_c'])
+        self.assertRedirects(response, reverse('consults:section_d', args=[self.consult.pk]), fetch_redirect_response=False)
+        await self.consult.arefresh_from_db()
+        self.assertEqual(self.consult.clinical_summary, SECTION_DATA['section_c']['clinical_summary'])
+        self.assertEqual(self.consult.patient_name, 'Renamed')
+
+        response = await self.async_client.post(reverse('consults:section_g', args=[self.consult.pk]), {'decision': 'nope'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+
+    async def test_summary_submit(self):
+        draft = await ICUConsultation.objects.acreate(patient_name='Draft', age=30, request_datetime=BASE_TIME)
+        url = reverse('consults:consult_summary', args=[draft.pk])
+        self.assertEqual((await self.async_client.get(url)).status_code, 200)
+        response = await self.async_client.post(url)
+        self.assertContains(response, 'Draft')
+        self.assertTrue((await ICUConsultation.objects.aget(pk=draft.pk)).submitted)
+
+    async def test_list_and_review_answer_conditional_gets(self):
+        for n in range(3):
+            await ICUConsultation.objects.acreate(
+                patient_name=f'P{n}', request_datetime=BASE_TIME + timedelta(hours=n), submitted=True,
+            )
+        url = reverse('consults:all_summaries')
+        response = await self.async_client.get(url, {'page_size': 2})
+        self.assertEqual([c.patient_name for c in response.context['summaries']], ['P2', 'P1'])
+        self.assertTrue(response.context['next_url'])
+        again = await self.async_client.get(url, {'page_size': 2}, headers={'if-none-match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+        url = reverse('consults:review_summary', args=[self.consult.pk])
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Old summary')
+        again = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        missing = await self.async_client.get(reverse('consults:review_summary', args=[self.consult.pk + 100]))
+        self.assertEqual(missing.status_code, 404)
+
+
+# ------------------------------
+# Live feed (SSE)
+# ------------------------------
+class LiveFeedTests(TestCase):
+    async def test_broker_fans_out_from_any_thread(self):
+        broker = InProcessBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        publisher = threading.Thread(target=broker.publish, args=({'type': 'submitted', 'id': 1},))
+        publisher.start()
+        publisher.join()
+
+        for subscription in (first, second):
+            seq, payload = await asyncio.wait_for(subscription.get(), 1)
+            self.assertEqual((seq, json.loads(payload)), (1, {'type': 'submitted', 'id': 1}))
+
+        broker.unsubscribe(second)
+        self.assertEqual(broker.subscriptions, {first})
+
+    async def test_lagging_subscriber_is_told_to_resync(self):
+        broker = InProcessBroker()
+        subscription = broker.subscribe()
+        for n in range(SUBSCRIBER_QUEUE_SIZE + 5):
+            broker.publish({'type': 'submitted', 'id': n})
+        await asyncio.sleep(0)
+
+        _, payload = await subscription.get()
+        self.assertEqual(json.loads(payload), {'type': 'resync'})
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_overflowed_stream_ends_with_resync_frame(self):
+        broker = InProcessBroker()
+        stream = async_views.event_stream(broker, broker.subscribe())
+        await anext(stream)  # retry:
+        broker.publish({'type': 'submitted', 'id': 0})
+        self.assertIn('"id": 0', await asyncio.wait_for(anext(stream), 1))
+
+        # Overflow while the consumer is part way through its loop
+        for n in range(1, SUBSCRIBER_QUEUE_SIZE + 5):
+            broker.publish({'type': 'submitted', 'id': n})
+        await asyncio.sleep(0)
+        frames = [frame async for frame in stream]
+        self.assertEqual(json.loads(frames[-1].split('data: ')[1]), {'type': 'resync'})
+        self.assertEqual(broker.subscriptions, set())
+
+    @mock.patch('consults.signals.publish_event')
+    def test_submit_and_decision_publish_after_commit(self, publish):
+        consult = make_consult(submitted=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('consults:consult_summary', args=[consult.pk]))
+            self.client.post(reverse('consults:consult_summary', args=[consult.pk]))  # already submitted
+        self.assertEqual([call.args[0] for call in publish.call_args_list], ['submitted'])
+
+        publish.reset_mock()
+        url = reverse('consults:section_g', args=[consult.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, SECTION_DATA['section_g'])
+            self.client.post(url, SECTION_DATA['section_g'])  # decision unchanged
+        self.assertEqual([call.args[0] for call in publish.call_args_list], ['decision'])
+        self.assertEqual(publish.call_args.args[1].decision, 'admit')
+
+    async def test_event_stream(self):
+        broker = InProcessBroker()
+        with mock.patch('consults.async_views.get_broker', return_value=broker):
+            response = await async_views.consult_events(AsyncRequestFactory().get('/events/'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        consult = await ICUConsultation.objects.acreate(patient_name='Pushed', request_datetime=BASE_TIME)
+        broker.publish({'type': 'submitted', 'id': consult.pk, 'patient_name': 'Pushed'})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertTrue(chunk.startswith(b'id: 1\ndata: '))
+        self.assertEqual(json.loads(chunk.split(b'data: ')[1])['patient_name'], 'Pushed')
+
+        # A client disconnect cancels the task sending the response
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(broker.subscriptions, set())
+
+    async def test_event_stream_needs_asgi(self):
+        response = await async_views.consult_events(RequestFactory().get('/events/'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_list_page_loads_feed_only_on_unfiltered_first_page(self):
+        make_consult()
+        self.assertContains(self.client.get(reverse('consults:all_summaries')), 'live_feed.js')
+        self.assertNotContains(self.client.get(reverse('consults:all_summaries'), {'ward': 'ward a'}), 'live_feed.js')
+
+
+# ------------------------------
+# Severity score
+# ------------------------------
+class SeverityScoreTests(TestCase):
+    def test_bands_and_flags(self):
+        self.assertIsNone(severity_score(ICUConsultation()))
+        well = ICUConsultation(breathing_spo2=98, bp_systolic=120, heart_rate=70, temperature=37.0, gcs='15')
+        self.assertEqual(severity_score(well), 0)
+
+        sick = ICUConsultation(
+            breathing_spo2='91', bp_systolic=90, heart_rate=131, temperature=35.0, gcs='E3V4M6',
+            breathing_device='NRB', airway_threatened=True, circulation_inotropes='yes',
+        )
+        # 3 + 3 + 3 + 3 vitals, 3 GCS 13, 2 oxygen, 3 airway, 3 inotropes
+        self.assertEqual(severity_score(sick), 23)
+        self.assertEqual(severity_score(ICUConsultation(bp_systolic=220, breathing_device='room air')), 3)
+        self.assertEqual(severity_score(ICUConsultation(heart_rate=95, intubated='yes')), 3)
+
+    def test_section_d_save_stores_score(self):
+        consult = make_consult()
+        self.client.post(reverse('consults:section_d', args=[consult.pk]), SECTION_DATA['section_d'])
+        consult.refresh_from_db()
+        self.assertEqual(consult.severity_score, 13)
+        self.assertIn('severity_score', section_fields(SectionDForm()))
+
+    @skipUnless(numpy, "NumPy is not installed")
+    def test_vectorised_scores_match(self):
+        consults = [
+            ICUConsultation(),
+            ICUConsultation(breathing_spo2=92, bp_systolic=101, heart_rate=41, temperature=36.1, gcs='14/15'),
+            ICUConsultation(breathing_spo2=96, bp_systolic=111, heart_rate=51, temperature=39.1, gcs=''),
+            ICUConsultation(gcs='E1VTM1', breathing_device='NIV', airway_threatened=True, circulation_inotropes='yes'),
+            ICUConsultation(heart_rate=90, intubated='yes', breathing_device='RA'),
+        ]
+        rows = {field: [getattr(consult, field) for consult in consults] for field in SCORE_FIELDS}
+        scores = severity_scores(numpy, rows)
+        self.assertEqual(
+            [None if numpy.isnan(score) else int(score) for score in scores],
+            [severity_score(consult) for consult in consults],
+        )
+
+    @skipUnless(numpy, "NumPy is not installed")
+    def test_recompute_command_writes_changed_rows(self):
+        stale = make_consult(breathing_spo2=85, heart_rate=75)
+        current = make_consult(breathing_spo2=99)
+        unscored = make_consult()
+        ICUConsultation.objects.filter(pk=current.pk).update(severity_score=0)
+        ICUConsultation.objects.filter(pk=unscored.pk).update(severity_score=4)
+        before = ICUConsultation.objects.get(pk=current.pk).updated_at
+
+        out = io.StringIO()
+        call_command('recompute_severity', stdout=out)
+        self.assertIn('changed 2', out.getvalue())
+        scores = dict(ICUConsultation.objects.values_list('pk', 'severity_score'))
+        self.assertEqual(scores, {stale.pk: 3, current.pk: 0, unscored.pk: None})
+        self.assertEqual(ICUConsultation.objects.get(pk=current.pk).updated_at, before)
+
+
+# ------------------------------
+# Triage queue
+# ------------------------------
+class TriageQueueTests(TestCase):
+    def test_pending_consults_sickest_then_longest_waiting(self):
+        make_consult(patient_name='Mild', severity_score=2)
+        make_consult(patient_name='Sick later', severity_score=9, request_datetime=BASE_TIME + timedelta(hours=1))
+        make_consult(patient_name='Sick earlier', severity_score=9)
+        make_consult(patient_name='Review', severity_score=5, decision='review_later')
+        make_consult(patient_name='No vitals')
+        make_consult(patient_name='Admitted', severity_score=12, decision='admit')
+        make_consult(patient_name='Draft', severity_score=12, submitted=False)
+
+        queue = self.client.get(reverse('consults:triage_api')).json()['queue']
+        self.assertEqual(
+            [entry['patient_name'] for entry in queue],
+            ['Sick earlier', 'Sick later', 'Review', 'Mild', 'No vitals'],
+        )
+        self.assertGreater(queue[0]['waiting_minutes'], queue[1]['waiting_minutes'])
+
+        response = self.client.get(reverse('consults:triage'), {'page_size': 1})
+        self.assertEqual([entry['patient_name'] for entry in response.context['queue']], ['Sick earlier'])
+        self.assertContains(self.client.get(reverse('consults:triage')), 'Awaiting vitals')
+
+    def test_decision_takes_consult_off_the_queue(self):
+        consult = make_consult(severity_score=4)
+        first = self.client.get(reverse('consults:triage_api'))
+        self.assertEqual(len(first.json()['queue']), 1)
+
+        self.client.post(reverse('consults:section_g', args=[consult.pk]), SECTION_DATA['section_g'])
+        again = self.client.get(reverse('consults:triage_api'), headers={'if-none-match': first['ETag']})
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['queue'], [])
+
+    def test_waiting_times_revalidate_as_the_clock_moves(self):
+        make_consult(severity_score=4)
+        url = reverse('consults:triage_api')
+        now = datetime(2025, 1, 1, 9, 0, 20, tzinfo=timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            first = self.client.get(url)
+            conditional = {'if-none-match': first['ETag'], 'if-modified-since': first['Last-Modified']}
+            self.assertEqual(self.client.get(url, headers=conditional).status_code, 304)
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(minutes=5)):
+            later = self.client.get(url, headers=conditional)
+        self.assertEqual(later.status_code, 200)
+        self.assertEqual(later.json()['queue'][0]['waiting_minutes'], first.json()['queue'][0]['waiting_minutes'] + 5)
+
+    @mock.patch('consults.signals.publish_event')
+    def test_new_score_on_submitted_consult_is_announced(self, publish):
+        consult = make_consult()
+        url = reverse('consults:section_d', args=[consult.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, SECTION_DATA['section_d'])
+            self.client.post(url, SECTION_DATA['section_d'])  # same score
+        self.assertEqual([call.args[0] for call in publish.call_args_list], ['severity'])
+
+
+# ------------------------------
+# Analytics rollups
+# ------------------------------
+def rollup_rows():
+    return (
+        sorted(ConsultRollup.objects.filter(count__gt=0).values_list('day', 'ward', 'requesting_discipline', 'decision', 'count')),
+        sorted(ReasonRollup.objects.filter(count__gt=0).values_list('day', 'reason', 'decision', 'count')),
+    )
+
+
+class AnalyticsRollupTests(TestCase):
+    def test_rollups_follow_submission_decision_and_delete(self):
+        consult = make_consult(submitted=False, reason=['sepsis_syndrome', 'respiratory_failure'])
+        self.assertEqual(rollup_rows(), ([], []))
+
+        self.client.post(reverse('consults:consult_summary', args=[consult.pk]))
+        day = BASE_TIME.date()
+        self.assertEqual(rollup_rows(), (
+            [(day, 'ward a', 'internal medicine', '', 1)],
+            [(day, 'respiratory_failure', '', 1), (day, 'sepsis_syndrome', '', 1)],
+        ))
+
+        self.client.post(reverse('consults:section_g', args=[consult.pk]), SECTION_DATA['section_g'])
+        self.assertEqual(rollup_rows()[0], [(day, 'ward a', 'internal medicine', 'admit', 1)])
+
+        self.client.post(reverse('consults:section_b', args=[consult.pk]), {'reason': ['haemodynamic_instability'], 'reason_other': ''})
+        self.assertEqual(rollup_rows()[1], [(day, 'haemodynamic_instability', 'admit', 1)])
+
+        consult.delete()
+        self.assertEqual(rollup_rows(), ([], []))
+
+    def test_rebuild_matches_incremental_counts(self):
+        make_consult(reason=['haemodynamic_instability'])
+        make_consult(ward='ward c', decision='not_for_icu')
+        make_consult(decision='admit', reason=['haemodynamic_instability', 'post_op_management'], request_datetime=BASE_TIME + timedelta(days=1))
+        make_consult(submitted=False)
+        incremental = rollup_rows()
+
+        ConsultRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(rollup_rows(), incremental)
+        self.assertEqual(sum(row[-1] for row in incremental[0]), 3)
+
+    def test_dashboard_reads_only_the_rollups(self):
+        now = datetime.now(timezone.utc)
+        make_consult(ward='ward c', decision='admit', reason=['haemodynamic_instability'], request_datetime=now)
+        make_consult(ward='ward c', request_datetime=now)
+        make_consult(ward='ward a', request_datetime=now - timedelta(days=60))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('consults:analytics'))
+        self.assertFalse([q for q in ctx.captured_queries if ICUConsultation._meta.db_table in q['sql']])
+        self.assertEqual(response.context['total'], 2)
+        self.assertEqual(response.context['breakdowns'][0][1], [('ward c', [1, 1, 0, 0], 2)])
+
+        response = self.client.get(reverse('consults:analytics'), {'days': 90})
+        self.assertEqual(response.context['total'], 3)
+
+
+# ------------------------------
+# Concurrent writes: lock retries and a multi-process stress run
+# ------------------------------
+class LockRetryTests(TransactionTestCase):
+    # Retries only happen outside an enclosing transaction, which rules
+    # out TestCase here
+
+    def setUp(self):
+        reset_lock_stats()
+
+    def flaky_save(self, failures):
+        consult = make_consult()
+        calls = []
+
+        def save():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+            consult.save(update_fields=['plan_comments'])
+            return consult
+        return save, calls
+
+    @mock.patch('consults.locking.backoff', return_value=0)
+    def test_locked_write_is_retried_then_succeeds(self, backoff):
+        save, calls = self.flaky_save(failures=2)
+        write_with_retry(save)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(lock_stats(), {'retries': 2, 'gave_up': 0})
+
+    @override_settings(CONSULT_DB_LOCK_RETRIES=2)
+    @mock.patch('consults.locking.backoff', return_value=0)
+    def test_retries_are_bounded(self, backoff):
+        save, calls = self.flaky_save(failures=5)
+        with self.assertRaises(OperationalError):
+            write_with_retry(save)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(lock_stats(), {'retries': 2, 'gave_up': 1})
+
+    @mock.patch('consults.locking.backoff', return_value=0)
+    def test_async_write_is_retried(self, backoff):
+        save, calls = self.flaky_save(failures=1)
+        asyncio.run(awrite_with_retry(save))
+        self.assertEqual(len(calls), 2)
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such column: nope')
+        with self.assertRaises(OperationalError):
+            write_with_retry(broken)
+        self.assertEqual(len(calls), 1)
+
+
+class SQLiteStressTests(SimpleTestCase):
+    def test_concurrent_writers_all_succeed(self):
+        # Runs in a subprocess: the command builds its own file database
+        run = subprocess.run(
+            [sys.executable, 'manage.py', 'stress_sqlite', '--mode', 'concurrent',
+             '--processes', '4', '--writes', '15', '--json'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(run.stdout)['concurrent']
+        self.assertEqual(result['saved'], 60)
+        self.assertEqual(result['locked'], 0)
+
+
+# ------------------------------
+# Workflow benchmark harness
+# ------------------------------
+class WorkflowBenchmarkTests(TestCase):
+    def test_drives_the_whole_workflow_and_counts_queries(self):
+        results = run_workflow_benchmark(flows=2, reads=3)
+        steps = results['steps']
+        self.assertEqual(steps['section_a POST']['requests'], 2)
+        self.assertEqual(steps['consult_summary POST']['requests'], 2)
+        self.assertEqual(steps['review_summary GET']['requests'], 3)
+        self.assertEqual(results['total']['requests'], 2 * 16 + 2 * 3)
+        self.assertEqual(steps['section_b GET']['queries_per_request'], 1)
+        # Warm-up flow plus the two measured ones, all submitted
+        self.assertEqual(ICUConsultation.objects.filter(submitted=True, decision='admit').count(), 3)
+
+    def test_compare_flags_slower_steps_and_any_extra_query(self):
+        def run(p50, queries):
+            return {'steps': {'all_summaries GET': {
+                'latency_ms_p50': p50, 'latency_ms_p95': 10.0, 'queries_per_request': queries,
+            }}}
+        rows, regressions = compare_results(run(10.0, 2), run(11.0, 2), threshold_pct=20)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(regressions, [])
+
+        _, regressions = compare_results(run(10.0, 2), run(13.0, 3), threshold_pct=20)
+        self.assertEqual([metric for _, metric, *_ in regressions], ['latency_ms_p50', 'queries_per_request'])
+
+
+# ------------------------------
+# Synthetic data for scale testing
+# ------------------------------
+class SyntheticDataTests(TestCase):
+    def test_same_seed_same_consults(self):
+        def sample(seed):
+            return [
+                (c.patient_name, c.ward, c.reason, c.breathing_spo2, c.decision, c.submitted)
+                for c in ConsultGenerator(seed=seed, end=BASE_TIME).generate(50)
+            ]
+        self.assertEqual(sample(1), sample(1))
+        self.assertNotEqual(sample(1), sample(2))
+
+    def test_generated_consults_are_plausible(self):
+        consults = list(ConsultGenerator(seed=3, submitted_ratio=0.8, end=BASE_TIME).generate(1000))
+        submitted = [c for c in consults if c.submitted]
+        self.assertAlmostEqual(len(submitted) / len(consults), 0.8, delta=0.05)
+        self.assertTrue(all(c.decision in ('', 'admit', 'not_for_icu', 'review_later') for c in submitted))
+        self.assertTrue(all(c.assessment and c.reason for c in submitted))
+        self.assertTrue(all(BASE_TIME - timedelta(days=365) <= c.request_datetime <= BASE_TIME for c in consults))
+
+        spo2 = [c.breathing_spo2 for c in submitted if c.breathing_spo2 is not None]
+        self.assertTrue(all(55 <= value <= 100 for value in spo2))
+        self.assertGreater(sum(spo2) / len(spo2), 85)
+        self.assertTrue(all(c.severity_score == severity_score(c) for c in submitted))
+        self.assertGreater(min(len(c.clinical_summary) for c in submitted), 100)
+
+    def test_command_inserts_consults_with_rollups(self):
+        call_command('generate_consults', '300', '--seed', '5', '--batch-size', '100', stdout=io.StringIO())
+        self.assertEqual(ICUConsultation.objects.count(), 300)
+        submitted = ICUConsultation.objects.filter(submitted=True).count()
+        self.assertEqual(sum(ConsultRollup.objects.values_list('count', flat=True)), submitted)
+        self.assertTrue(search_consults('hypertension', ['id'])[0])
+
+
+# ------------------------------
+# Server-Timing and per-endpoint stats
+# ------------------------------
+def server_timing_metrics(response):
+    metrics = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        reset_endpoint_stats()
+        self.consult = make_consult()
+
+    def test_header_reports_queries_and_template_time(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('consults:section_d', args=[self.consult.pk]))
+        metrics = server_timing_metrics(response)
+        self.assertEqual(metrics['db']['desc'], f'"{len(ctx.captured_queries)} queries"')
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['tpl']['dur']))
+
+    @override_settings(ROOT_URLCONF=WorkflowURLConf(async_views))
+    async def test_async_views_are_measured_too(self):
+        response = await self.async_client.get(reverse('consults:section_b', args=[self.consult.pk]))
+        self.assertEqual(server_timing_metrics(response)['db']['desc'], '"1 queries"')
+
+    def test_staff_page_lists_slow_endpoints_and_repeated_queries(self):
+        self.client.get(reverse('consults:all_summaries'))
+        profile = RequestProfile()
+        profile.statements['SELECT ... WHERE "id" = %s'] = N_PLUS_ONE_THRESHOLD + 2
+        record_request('GET consults:slow_list', profile, 900.0)
+
+        url = reverse('consults:perf')
+        self.assertEqual(self.client.get(url).status_code, 302)  # to the admin login
+
+        User.objects.create_user('ops', password='pw', is_staff=True)
+        self.client.login(username='ops', password='pw')
+        report = self.client.get(url, {'format': 'json'}).json()['endpoints']
+        self.assertEqual(report[0]['endpoint'], 'GET consults:slow_list')
+        self.assertEqual(report[0]['n_plus_one'][0]['max_per_request'], N_PLUS_ONE_THRESHOLD + 2)
+        self.assertIn('GET consults:all_summaries', [row['endpoint'] for row in report])
+        self.assertContains(self.client.get(url), 'WHERE &quot;id&quot; = %s')
+
+
+class StaticAssetTests(TestCase):
+    def test_pages_use_local_assets_and_inline_critical_css(self):
+        response = self.client.get(reverse('consults:section_a'))
+        self.assertNotContains(response, 'cdn.jsdelivr.net')
+        self.assertContains(response, '/static/consults/vendor/bootstrap/bootstrap.min.css')
+        self.assertRegex(response.content.decode(), r'<style>[^<]*\.progress-bar')
+
+    def test_collectstatic_fingerprints_and_precompresses(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES={**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'consults.staticfiles.CompressedManifestStaticFilesStorage',
+            }},
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            hashed_names.cache_clear()
+            self.addCleanup(hashed_names.cache_clear)
+            with open(os.path.join(root, 'staticfiles.json')) as manifest_file:
+                manifest = json.load(manifest_file)['paths']
+            name = manifest['consults/vendor/bootstrap/bootstrap.min.css']
+            with open(os.path.join(root, name), 'rb') as plain, gzip.open(os.path.join(root, name + '.gz')) as packed:
+                self.assertEqual(packed.read(), plain.read())
+
+            factory = RequestFactory()
+            response = serve_static(factory.get('/', headers={'accept-encoding': 'gzip, br;q=0.5'}), name)
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(response.headers['Content-Type'], 'text/css')
+            self.assertEqual(response.headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+            self.assertNotIn('Content-Disposition', response.headers)
+            response.close()
+
+            for refused in ('gzip;q=0, br;q=0', 'identity', '*;q=0'):
+                response = serve_static(factory.get('/', headers={'accept-encoding': refused}), name)
+                self.assertNotIn('Content-Encoding', response.headers)
+                response.close()
+
+            response = serve_static(factory.get('/'), 'consults/vendor/bootstrap/bootstrap.min.css')
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertNotEqual(response.headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+            response.close()
+
+
+# ------------------------------
+# Age computed in the database
+# ------------------------------
+class AgeTests(TestCase):
+    AS_OF = date(2028, 2, 29)
+
+    def setUp(self):
+        births = [
+            date(2010, 2, 28), date(2010, 3, 1),        # 18 today / tomorrow
+            date(1963, 2, 28), date(1963, 3, 1),        # 65 / still 64
+            date(2008, 2, 29), date(2000, 12, 31), date(1990, 1, 1),
+        ]
+        for born in births:
+            make_consult(patient_name=f'Born {born}', date_of_birth=born, age=1)
+        make_consult(patient_name='Age only 70', age=70)
+        make_consult(patient_name='Age only 12', age=12)
+        make_consult(patient_name='No age', age=None)
+
+    def test_database_age_matches_python(self):
+        consults = ICUConsultation.objects.annotate(age_years=age_expression(self.AS_OF))
+        for consult in consults:
+            with self.subTest(consult=consult.patient_name):
+                expected = age_on(consult.date_of_birth, self.AS_OF) if consult.date_of_birth else consult.age
+                self.assertEqual(consult.age_years, expected)
+        self.assertEqual(
+            [c.patient_name for c in consults.order_by('-age_years')[:2]], ['Age only 70', 'Born 1963-02-28'],
+        )
+
+    def test_bands_cover_each_age_once_using_the_age_index(self):
+        ages = {
+            consult.pk: consult.age_years
+            for consult in ICUConsultation.objects.annotate(age_years=age_expression(self.AS_OF))
+        }
+        for band, (_, low, high) in AGE_BANDS.items():
+            with self.subTest(band=band):
+                expected = {
+                    pk for pk, age in ages.items()
+                    if age is not None and (low is None or age >= low) and (high is None or age < high)
+                }
+                found = ICUConsultation.objects.filter(age_band_q(band, self.AS_OF))
+                self.assertEqual(set(found.values_list('pk', flat=True)), expected)
+                self.assertIn('consult_age_idx', found.only('id').explain())
+
+    def test_listing_and_export_filter_by_band(self):
+        response = self.client.get(reverse('consults:all_summaries'), {'age_band': 'elderly'})
+        names = [consult.patient_name for consult in response.context['summaries']]
+        self.assertIn('Age only 70', names)
+        self.assertNotIn('Age only 12', names)
+        self.assertNotIn('Born 1990-01-01', names)
+        self.assertContains(response, '<td>70</td>', html=True)
+        self.assertFalse(response.context['live_feed'])
+
+        response = self.client.get(reverse('consults:export'), {'age_band': 'paediatric', 'columns': 'patient_name'})
+        names = b''.join(response.streaming_content).decode().splitlines()
+        self.assertIn('Age only 12', names)
+        self.assertNotIn('Age only 70', names)
+        self.assertEqual(self.client.get(reverse('consults:export'), {'age_band': 'infant'}).status_code, 400)
+
+    def test_calculated_age_on_instances(self):
+        consult = make_consult(date_of_birth=date(2000, 1, 1), age=None)
+        today = date.today()
+        self.assertEqual(consult.get_calculated_age(), today.year - 2000 - ((today.month, today.day) < (1, 1)))
+
+
+# ------------------------------
+# Printed PDF summaries
+# ------------------------------
+class SummaryPdfTests(TestCase):
+    def setUp(self):
+        self.root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CONSULT_PDF_ROOT=self.root, CONSULT_PDF_WORKERS=2))
+        fragment_cache().clear()
+        self.consult = make_consult(patient_name='Print (Me)', clinical_summary='Septic shock. ' * 80)
+
+    def fetch(self, **headers):
+        response = self.client.get(reverse('consults:summary_pdf', args=[self.consult.pk]), headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_rendered_in_background_then_served_until_the_consult_changes(self):
+        response, _ = self.fetch()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+        wait_for_pending()
+
+        response, pdf = self.fetch()
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(pdf.startswith(b'%PDF-1.4') and pdf.rstrip().endswith(b'%%EOF'))
+        digest = current_pdf(self.consult)
+        self.assertEqual(response['ETag'], f'"{digest}"')
+        self.assertEqual(self.fetch(if_none_match=response['ETag'])[0].status_code, 304)
+
+        self.consult.patient_name = 'Renamed'
+        self.consult.save()
+        self.assertEqual(self.fetch()[0].status_code, 202)
+        wait_for_pending()
+        self.assertNotEqual(current_pdf(self.consult), digest)
+        stored = [name for _, _, names in os.walk(self.root) for name in names]
+        self.assertEqual(sorted(stored), sorted([f'{digest}.pdf', f'{current_pdf(self.consult)}.pdf']))
+
+    def test_layout_is_deterministic_and_escaped(self):
+        document = ('Title (x)', 'sub \\ line', [('Section', [('Label', 'value ' * 4000)])])
+        pages = layout_document(*document)
+        self.assertGreater(len(pages), 1)
+        self.assertIn(b'Title \\(x\\)', pages[0])
+        self.assertEqual(write_pdf(pages), write_pdf(layout_document(*document)))
+
+    def test_long_words_and_rules_stay_inside_the_margins(self):
+        lines = wrap('dose: ' + 'x' * 300, 'regular', 10, TEXT_WIDTH)
+        self.assertGreater(len(lines), 2)
+        self.assertTrue(all(text_width(line, 'regular', 10) <= TEXT_WIDTH for line in lines))
+        self.assertEqual((lines[0], ''.join(lines[1:])), ('dose:', 'x' * 300))
+
+        layout = PageLayout()
+        layout.rule()  # before any line
+        layout.y = MARGIN + 2
+        layout.rule()
+        self.assertEqual(len(layout.finish()), 2)
+
+    def test_day_prints_in_parallel_and_fills_the_cache(self):
+        others = [make_consult(request_datetime=BASE_TIME + timedelta(hours=hour)) for hour in (1, 2)]
+        make_consult(request_datetime=BASE_TIME + timedelta(days=1))
+        output = os.path.join(self.root, 'day.pdf')
+        call_command('print_consults', date='2025-01-01', output=output, workers=2, stdout=io.StringIO())
+
+        with open(output, 'rb') as printed:
+            pdf = printed.read()
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertGreaterEqual(pdf.count(b'/Type /Page '), 3)
+        for consult in [self.consult, *others]:
+            self.assertIsNotNone(current_pdf(consult))
+
+
+# ------------------------------
+# Background task queue
+# ------------------------------
+class TaskQueueTests(TransactionTestCase):
+    # Workers run tasks on their own threads and connections
+
+    def setUp(self):
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CONSULT_PDF_ROOT=root))
+        fragment_cache().clear()
+
+    def test_submit_queues_pdf_once_and_worker_renders_it(self):
+        consult = make_consult(submitted=False)
+        url = reverse('consults:consult_summary', args=[consult.pk])
+        self.client.post(url)
+        self.client.post(url)  # already submitted: nothing new to do
+        task = Task.objects.get()
+        self.assertEqual((task.name, task.payload), ('render_summary_pdf', {'consult_id': consult.pk}))
+        enqueue('render_summary_pdf', task.payload, key=task.idempotency_key)
+        self.assertEqual(Task.objects.count(), 1)
+
+        call_command('run_tasks', drain=True, stdout=io.StringIO())
+        task.refresh_from_db()
+        self.assertEqual((task.state, task.attempts), (Task.DONE, 1))
+        consult.refresh_from_db()
+        self.assertIsNotNone(current_pdf(consult))
+
+    def test_failed_task_backs_off_then_gives_up(self):
+        def boom():
+            raise RuntimeError('pager unreachable')
+
+        with mock.patch.dict(TASKS, {'page_registrar': (boom, 2)}), self.assertLogs('consults.tasks', 'WARNING'):
+            enqueue('page_registrar')
+            Worker(concurrency=1).run(drain=True)
+            task = Task.objects.get()
+            self.assertEqual((task.state, task.attempts), (Task.QUEUED, 1))
+            self.assertGreater(task.run_after, task.created_at)
+            self.assertIn('pager unreachable', task.last_error)
+
+            Task.objects.update(run_after=task.created_at)
+            Worker(concurrency=1).run(drain=True)
+            task.refresh_from_db()
+            self.assertEqual((task.state, task.attempts), (Task.FAILED, 2))
+
+    def test_batches_are_claimed_once_and_concurrency_is_capped(self):
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def slow():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            threading.Event().wait(0.05)
+            with lock:
+                running[0] -= 1
+
+        with mock.patch.dict(TASKS, {'slow': (slow, 1)}):
+            for _ in range(6):
+                enqueue('slow')
+            first, second = claim_tasks('a', 4), claim_tasks('b', 4)
+            self.assertEqual((len(first), len(second)), (4, 2))
+            self.assertFalse({task.pk for task in first} & {task.pk for task in second})
+
+            # Worker "a" died: its tasks come back once the lease runs out
+            Task.objects.filter(locked_by='a').update(locked_until=BASE_TIME)
+            Task.objects.filter(locked_by='b').update(state=Task.QUEUED)
+            self.assertEqual(Worker(concurrency=2, batch_size=3).run(drain=True), 6)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(Task.objects.filter(state=Task.DONE).count(), 6)
+
+
+# ------------------------------
+# Autosave: field-level PATCH
+# ------------------------------
+class AutosaveTests(TestCase):
+    def patch(self, consult, step, data):
+        return self.client.patch(
+            reverse('consults:autosave', args=[consult.pk, step]), json.dumps(data), content_type='application/json',
+        )
+
+    def consult_updates(self, captured):
+        table = ICUConsultation._meta.db_table
+        return [q['sql'] for q in captured if q['sql'].startswith(f'UPDATE "{table}"')]
+
+    def test_patch_updates_only_the_patched_columns(self):
+        consult = make_consult(submitted=False, clinical_summary='Unchanged')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.patch(consult, 'f', {'ventilation': 'HFNO 40L', 'airway': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['saved'], ['ventilation'])
+        updates = self.consult_updates(ctx.captured_queries)
+        self.assertEqual(len(updates), 1)
+        assignments = updates[0].split(' SET ', 1)[1].split(' WHERE ', 1)[0]
+        self.assertEqual(set(re.findall(r'"(\w+)" = ', assignments)), {'ventilation', 'updated_at'})
+
+        # Sending the same value again writes nothing
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.patch(consult, 'f', {'ventilation': 'HFNO 40L'}).json()['saved'], [])
+        self.assertEqual(self.consult_updates(ctx.captured_queries), [])
+
+    def test_derived_score_is_saved_with_the_vitals(self):
+        consult = make_consult()
+        response = self.patch(consult, 'd', {'breathing_spo2': '82', 'heart_rate': '135'})
+        self.assertEqual(response.status_code, 200)
+        consult.refresh_from_db()
+        self.assertEqual(consult.heart_rate, 135)
+        self.assertEqual(consult.severity_score, severity_score(consult))
+        self.assertIn('severity_score', response.json()['saved'])
+
+    def test_only_errors_on_patched_fields_reject_the_patch(self):
+        # Section G's decision and signature are still blank: the assessment saves anyway
+        consult = make_consult(submitted=False)
+        response = self.patch(consult, 'g', {'assessment': 'Needs NIV'})
+        self.assertEqual(response.status_code, 200)
+        consult.refresh_from_db()
+        self.assertEqual(consult.assessment, 'Needs NIV')
+
+        response = self.patch(consult, 'g', {'decision': 'maybe', 'plan_comments': 'Bed 4'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['decision'])
+        consult.refresh_from_db()
+        self.assertEqual(consult.plan_comments, '')
+
+    def test_bad_requests(self):
+        consult = make_consult()
+        url = reverse('consults:autosave', args=[consult.pk, 'c'])
+        self.assertEqual(self.patch(consult, 'c', {'patient_name': 'Elsewhere'}).status_code, 400)
+        self.assertEqual(self.patch(consult, 'c', ['clinical_summary']).status_code, 400)
+        self.assertEqual(self.client.patch(url, 'not json', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'clinical_summary': 'x'}).status_code, 405)
+        self.assertEqual(self.patch(consult, 'a', {'ward': 'ward b'}).status_code, 404)
+        self.assertEqual(self.patch(consult, 'z', {'ward': 'ward b'}).status_code, 404)
+
+    def test_section_pages_enable_autosave(self):
+        consult = make_consult(submitted=False)
+        response = self.client.get(reverse('consults:section_e', args=[consult.pk]))
+        self.assertContains(response, f'data-autosave-url="{reverse("consults:autosave", args=[consult.pk, "e"])}"')
+        # Draft sections have no row to patch
+        response = self.client.get(reverse('consults:draft_section', args=['e']))
+        self.assertNotContains(response, 'data-autosave-url')
+
+
+# ------------------------------
+# JSON API
+# ------------------------------
+class ConsultAPITests(TestCase):
+    def setUp(self):
+        self.consults = [
+            make_consult(
+                patient_name=f'Patient {i}', ward='ward a' if i % 2 else 'ward b', decision='admit' if i < 3 else '',
+                request_datetime=BASE_TIME + timedelta(hours=i), submitted=i != 4,
+            )
+            for i in range(6)
+        ]
+        self.url = reverse('consults:api_consults')
+
+    def test_cursor_pages_cover_every_consult_once(self):
+        seen, url = [], f'{self.url}?page_size=4'
+        while url:
+            body = self.client.get(url).json()
+            seen += [row['id'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(seen, [c.pk for c in reversed(self.consults)])
+
+    def test_sparse_fields_read_only_those_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get(self.url, {'fields': 'patient_name,ward'}).json()
+        self.assertEqual(body['results'][0], {'id': self.consults[-1].pk, 'patient_name': 'Patient 5', 'ward': 'ward a'})
+        select = [q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql']][0]
+        self.assertNotIn('clinical_summary', select)
+        self.assertEqual(self.client.get(self.url, {'fields': 'ward,password'}).status_code, 400)
+
+    def test_filters(self):
+        def ids(**params):
+            return [row['id'] for row in self.client.get(self.url, {'fields': 'id', **params}).json()['results']]
+        self.assertEqual(ids(ward='ward b'), [c.pk for c in self.consults[4::-2]])
+        self.assertEqual(ids(decision='admit', submitted='true'), [c.pk for c in self.consults[2::-1]])
+        self.assertEqual(ids(submitted='false'), [self.consults[4].pk])
+        self.assertEqual(ids(date_from=BASE_TIME.date().isoformat(), date_to=BASE_TIME.date().isoformat()),
+                         [c.pk for c in reversed(self.consults)])
+        self.assertEqual(self.client.get(self.url, {'submitted': 'maybe'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'age_band': 'toddler'}).status_code, 400)
+
+    def test_batch_fetch_is_one_query_in_request_order(self):
+        wanted = [self.consults[3].pk, 999999, self.consults[0].pk]
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get(self.url, {'ids': ','.join(map(str, wanted)), 'fields': 'patient_name'}).json()
+        self.assertEqual([row['id'] for row in body['results']], [wanted[0], wanted[2]])
+        self.assertEqual(body['missing'], [999999])
+        self.assertEqual(len([q for q in ctx.captured_queries if 'IN (' in q['sql']]), 1)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, 400)
+
+    def test_detail_gzip_and_conditional_get(self):
+        consult = self.consults[0]
+        detail = self.client.get(reverse('consults:api_consult', args=[consult.pk]), {'fields': 'request_datetime'})
+        self.assertEqual(detail.json(), {'id': consult.pk, 'request_datetime': '2025-01-01T08:00:00Z'})
+        self.assertEqual(self.client.get(reverse('consults:api_consult', args=[999999])).status_code, 404)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 6)
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.patch(
+            reverse('consults:autosave', args=[consult.pk, 'f']), json.dumps({'airway': 'ETT'}),
+            content_type='application/json',
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stdlib_json_matches_orjson(self):
+        payload = {'results': [{'when': BASE_TIME, 'day': BASE_TIME.date(), 'reason': ['other'], 'name': 'Zoë'}]}
+        with mock.patch.dict(sys.modules, {'orjson': None}):
+            fallback = api.dumps(payload)
+        self.assertEqual(json.loads(fallback)['results'][0]['when'], '2025-01-01T08:00:00Z')
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return
+        self.assertEqual(api.dumps(payload), fallback)
+
+
+# ------------------------------
+# Bedside monitor observations
+# ------------------------------
+def oru_message(hospital_number, stamp, *results):
+    # One HL7 ORU^R01 in MLLP framing; results are (identifier, value, unit)
+    segments = [
+        f'MSH|^~\\&|MONITOR|ICU|CONSULTS|HOSP|{stamp}||ORU^R01|1|P|2.5',
+        f'PID|1||{hospital_number}^^^HOSP^MR||Doe^Jane',
+        f'OBR|1|||VITALS|||{stamp}',
+    ] + [
+        f'OBX|{n}|NM|{identifier}||{value}|{unit}|||||F' for n, (identifier, value, unit) in enumerate(results, 1)
+    ]
+    return '\x0b' + '\r'.join(segments) + '\r\x1c\r'
+
+
+class ObservationIngestTests(TestCase):
+    def setUp(self):
+        self.consult = make_consult(hospital_number='H100', heart_rate=80)
+
+    def ingest(self, parser, lines, **kwargs):
+        ingester = ObservationIngester(**kwargs)
+        ingester.ingest(parser(lines, ingester.counts))
+        self.consult.refresh_from_db()
+        return ingester.counts
+
+    def test_hl7_parsing(self):
+        message = oru_message(
+            'H100', '20250101100000+0200',
+            ('8867-4^Heart rate^LN', '118', '/min'), ('8310-5^Body temp^LN', '101.3', '[degF]'),
+            ('MDC_PULS_OXIM_SAT_O2', '93', '%'), ('X-UNKNOWN', '1', ''),
+        )
+        counts = Counter()
+        readings = list(read_hl7(message.split('\r'), counts))
+        self.assertEqual([(r.hospital_number, r.code, round(r.value, 1)) for r in readings], [
+            ('H100', Observation.HEART_RATE, 118), ('H100', Observation.TEMPERATURE, 38.5),
+            ('H100', Observation.SPO2, 93),
+        ])
+        self.assertEqual(readings[0].observed_at, datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc))
+        self.assertEqual(counts['skipped'], 1)
+        self.assertEqual(parse_hl7_time('202501011000'), datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc))
+
+    def test_latest_values_project_into_section_d(self):
+        feed = [
+            oru_message('H100', '20250101100000', ('8867-4', '140', '/min'), ('8480-6', '85', 'mm[Hg]')),
+            oru_message('H100', '20250101100500', ('8867-4', '125', '/min'), ('59408-5', '0', '%')),
+            oru_message('H999', '20250101100500', ('8867-4', '99', '/min')),
+        ]
+        counts = self.ingest(read_hl7, feed)
+        self.assertEqual(Observation.objects.filter(consult=self.consult).count(), 3)
+        self.assertEqual((counts['implausible'], counts['unmatched']), (1, 1))
+        self.assertEqual((self.consult.heart_rate, self.consult.bp_systolic), (125, 85))
+        self.assertEqual(self.consult.severity_score, severity_score(self.consult))
+
+        # A late reading is stored but doesn't wind Section D back; a replay adds nothing
+        counts = self.ingest(read_hl7, [oru_message('H100', '20250101095000', ('8867-4', '60', '/min'))] + feed)
+        self.assertEqual(counts['observations'], 1)
+        self.assertEqual(self.consult.heart_rate, 125)
+        self.assertEqual(Observation.objects.filter(consult=self.consult).count(), 4)
+
+    def test_conflicting_reading_at_stored_time_keeps_stored_value(self):
+        self.ingest(read_hl7, [oru_message('H100', '20250101100000', ('8867-4', '140', '/min'))])
+        self.ingest(read_hl7, [oru_message('H100', '20250101100000', ('8867-4', '90', '/min'))])
+        self.assertEqual(list(Observation.objects.values_list('value', flat=True)), [140])
+        self.assertEqual(self.consult.heart_rate, 140)
+
+    def test_csv_feed_in_batches(self):
+        lines = ['hospital_number,observed_at,vital,value,unit\n'] + [
+            f'H100,2025-01-01T10:{minute:02d}:00,heart_rate,{100 + minute},\n' for minute in range(25)
+        ] + ['H100,not a time,heart_rate,90,\n', 'H100,2025-01-01T11:00:00,temperature,37.84,Cel\n']
+        with CaptureQueriesContext(connection) as ctx:
+            counts = self.ingest(read_csv, lines, batch_size=10)
+        self.assertEqual((counts['observations'], counts['skipped']), (26, 1))
+        self.assertEqual((self.consult.heart_rate, self.consult.temperature), (124, 37.8))
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertLessEqual(len(inserts), 3)
+        with self.assertRaises(ValueError):
+            list(read_csv(['hospital_number,value\n'], Counter()))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.hl7', delete=False) as feed:
+            feed.write(oru_message('H100', '20250101100000', ('8867-4', '131', '/min')))
+        self.addCleanup(os.remove, feed.name)
+        out = io.StringIO()
+        call_command('ingest_observations', feed.name, stdout=out)
+        self.assertIn('Stored 1 observations', out.getvalue())
+        self.consult.refresh_from_db()
+        self.assertEqual(self.consult.heart_rate, 131)
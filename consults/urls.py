@@ -1,24 +1,53 @@
-from django.urls import path
-from . import views
-from .views import (
-    SectionAView, SectionBView, SectionCView,
-    SectionDView, SectionEView, SectionFView,
-    SectionGView, ConsultSummaryView, 
-)
+from django.conf import settings
+from django.urls import path, reverse_lazy
+from . import api, async_views, views
+from .views import DraftSectionView, DraftSummaryView
 from django.views.generic import RedirectView
 app_name = 'consults'
 
-urlpatterns = [
-    path('', RedirectView.as_view(url='/section_a/', permanent=False)),  # redirect root of app to Section A
-    path('section_a/', SectionAView.as_view(), name='section_a'),
-    path('section_b/<int:pk>/', SectionBView.as_view(), name='section_b'),
-    path('section_c/<int:pk>/', SectionCView.as_view(), name='section_c'),
-    path('section_d/<int:pk>/', SectionDView.as_view(), name='section_d'),
-    path('section_e/<int:pk>/', SectionEView.as_view(), name='section_e'),
-    path('section_f/<int:pk>/', SectionFView.as_view(), name='section_f'),
-    path('section_g/<int:pk>/', SectionGView.as_view(), name='section_g'),
-    path('consult_summary/<int:pk>/', ConsultSummaryView.as_view(), name='consult_summary'),
-    
-    path('all_summaries/', views.all_summaries, name='all_summaries'),
-    path('review_summary/<int:id>/', views.review_summary, name='review_summary')
-]
+# CONSULT_DRAFT_WIZARD starts new consults in the server-side buffered draft wizard
+if getattr(settings, 'CONSULT_DRAFT_WIZARD', False):
+    WIZARD_START = reverse_lazy('consults:draft_section', kwargs={'step': 'a'})
+else:
+    WIZARD_START = '/section_a/'
+
+
+def consult_urlpatterns(workflow):
+    # `workflow` serves the section, summary and list pages: views, or
+    # async_views when running under ASGI
+    return [
+        path('', RedirectView.as_view(url=WIZARD_START, permanent=False)),  # redirect root of app to Section A
+        path('section_a/', workflow.SectionAView.as_view(), name='section_a'),
+        path('section_b/<int:pk>/', workflow.SectionBView.as_view(), name='section_b'),
+        path('section_c/<int:pk>/', workflow.SectionCView.as_view(), name='section_c'),
+        path('section_d/<int:pk>/', workflow.SectionDView.as_view(), name='section_d'),
+        path('section_e/<int:pk>/', workflow.SectionEView.as_view(), name='section_e'),
+        path('section_f/<int:pk>/', workflow.SectionFView.as_view(), name='section_f'),
+        path('section_g/<int:pk>/', workflow.SectionGView.as_view(), name='section_g'),
+        path('consult_summary/<int:pk>/', workflow.ConsultSummaryView.as_view(), name='consult_summary'),
+        path('autosave/<int:pk>/<str:step>/', views.autosave_section, name='autosave'),
+
+        # Draft wizard: nothing is written until the summary is submitted
+        path('draft/summary/', DraftSummaryView.as_view(), name='draft_summary'),
+        path('draft/<str:step>/', DraftSectionView.as_view(), name='draft_section'),
+
+        path('all_summaries/', workflow.all_summaries, name='all_summaries'),
+        path('triage/', views.triage, name='triage'),
+        path('triage/api/', views.triage_api, name='triage_api'),
+        path('search/', views.search, name='search'),
+        path('export/', views.export_consults, name='export'),
+        path('analytics/', views.analytics, name='analytics'),
+        path('review_summary/<int:id>/', workflow.review_summary, name='review_summary'),
+        path('review_summary/<int:id>/pdf/', views.summary_pdf, name='summary_pdf'),
+        path('cache_stats/', views.summary_cache_stats, name='cache_stats'),
+        path('perf/', views.perf_stats, name='perf'),
+        path('events/', async_views.consult_events, name='events'),
+
+        # Versioned JSON API for other hospital systems
+        path('api/v1/consults/', api.consult_list, name='api_consults'),
+        path('api/v1/consults/<int:pk>/', api.consult_detail, name='api_consult'),
+    ]
+
+
+# CONSULT_ASYNC_VIEWS serves the consult workflow from async views (ASGI deployments)
+urlpatterns = consult_urlpatterns(async_views if getattr(settings, 'CONSULT_ASYNC_VIEWS', False) else views)
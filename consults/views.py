@@ -1,6 +1,18 @@
+import hashlib
+import json
+from datetime import date, datetime
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from .forms import (
     SectionAForm, 
     SectionBForm, 
@@ -11,6 +23,37 @@ from .forms import (
     SectionGForm
 )
 from . models import ICUConsultation
+from .ages import AGE_BANDS, age_band_q, age_expression
+from .analytics import DEFAULT_ANALYTICS_DAYS, analytics_summary
+from .drafts import DraftStore
+from .exports import export_columns, export_queryset, export_stream
+from .fragments import cache_stats, render_fragment, summary_fragment
+from .instrumentation import HISTOGRAM_BOUNDS_MS, N_PLUS_ONE_THRESHOLD, ROLLING_WINDOW, endpoint_report
+from .locking import write_with_retry
+from .pagination import get_page_size, keyset_page
+from .printing import current_pdf, open_pdf, request_summary_pdf
+from .search import search_consults
+from .signals import consult_submitted, decision_recorded, severity_changed
+
+# ------------------------------
+# Save only the columns a section owns
+# ------------------------------
+def section_fields(form):
+    # Meta.fields minus form-only extras (e.g. the Section D pupil inputs),
+    # plus any columns the form's save() derives (the severity score)
+    model_fields = {field.name for field in ICUConsultation._meta.concrete_fields}
+    return [name for name in form._meta.fields if name in model_fields] + list(getattr(form, 'derived_fields', []))
+
+
+def save_section(form):
+    # A full form.save() rewrites every column of the consult row and can
+    # clobber another section saved in the meantime.
+    if not form.has_changed():
+        return form.instance
+    consult = form.save(commit=False)
+    write_with_retry(consult.save, update_fields=section_fields(form) + ['updated_at'])
+    return consult
+
 
 # ------------------------------
 # Section A: Patient Details
@@ -24,7 +67,8 @@ class SectionAView(View):
         form = SectionAForm(request.POST)
         if form.is_valid():
             # Save Section A data and create a new ICUConsultation
-            consult = form.save()
+            consult = form.save(commit=False)
+            write_with_retry(consult.save)
             
             # Store consult ID in session (optional, helps track multi-step forms)
             request.session['consult_id'] = consult.id
@@ -49,7 +93,7 @@ class SectionBView(View):
         consult = get_object_or_404(ICUConsultation, pk=pk)
         form = SectionBForm(request.POST, instance=consult)
         if form.is_valid():
-            form.save()
+            save_section(form)
             return redirect('consults:section_c', pk=consult.pk)
         return render(request, 'consults/section_b.html', {'form': form, 'consult': consult})
 
@@ -67,7 +111,7 @@ class SectionCView(View):
         consult = get_object_or_404(ICUConsultation, pk=pk)
         form = SectionCForm(request.POST, instance=consult)
         if form.is_valid():
-            form.save()
+            save_section(form)
             return redirect('consults:section_d', pk=consult.pk)  # go to next section
         return render(request, 'consults/section_c.html', {'form': form, 'consult': consult})
 
@@ -89,12 +133,11 @@ class SectionDView(View):
         form = SectionDForm(request.POST, instance=consult)
         
         if form.is_valid():
-            form.save()
-            print(f"Section D saved successfully for consult {consult.pk}")
+            save_section(form)
+            if consult.submitted and getattr(form, 'severity_changed', False):
+                severity_changed.send(sender=ICUConsultation, consult=consult)
             return redirect('consults:section_e', pk=consult.pk)
-        else:
-            print("Section D form invalid:", form)
-            
+
         return render(request, 'consults/section_d.html', {
             'form': form, 
             'consult': consult
@@ -114,7 +157,7 @@ class SectionEView(View):
         consult = get_object_or_404(ICUConsultation, pk=pk)
         form = SectionEForm(request.POST, instance=consult)
         if form.is_valid():
-            form.save()
+            save_section(form)
             return redirect('consults:section_f', pk=consult.pk)
         return render(request, 'consults/section_e.html', {'form': form, 'consult': consult})
 
@@ -132,7 +175,7 @@ class SectionFView(View):
         consult = get_object_or_404(ICUConsultation, pk=pk)
         form = SectionFForm(request.POST, instance=consult)
         if form.is_valid():
-            form.save()
+            save_section(form)
             return redirect('consults:section_g', pk=consult.pk)
         return render(request, 'consults/section_f.html', {'form': form, 'consult': consult})
 
@@ -150,7 +193,9 @@ class SectionGView(View):
         consult = get_object_or_404(ICUConsultation, pk=pk)
         form = SectionGForm(request.POST, instance=consult)
         if form.is_valid():
-            form.save()
+            save_section(form)
+            if 'decision' in form.changed_data:
+                decision_recorded.send(sender=ICUConsultation, consult=consult)
             # Redirect to summary page for review before final submission
             return redirect('consults:consult_summary', pk=consult.pk)
         return render(request, 'consults/section_g.html', {'form': form, 'consult': consult})
@@ -159,30 +204,503 @@ class SectionGView(View):
 # ------------------------------
 # Summary Page
 # ------------------------------
+def submit_consult(consult, newly_submitted):
+    # One transaction: the flag, and the side-effect tasks it queues
+    consult.save(update_fields=['submitted', 'updated_at'])
+    if newly_submitted:
+        consult_submitted.send(sender=ICUConsultation, consult=consult)
+
+
 class ConsultSummaryView(View):
     def get(self, request, pk):
-        consult = get_object_or_404(ICUConsultation, pk=pk)
-        return render(request, 'consults/consult_summary.html', {'consult': consult})
+        # Only the version columns; the full row is read on a cache miss
+        consult = get_object_or_404(consult_versions(), pk=pk)
+        return render(request, 'consults/consult_summary.html', {
+            'consult': consult,
+            'summary_html': summary_fragment('consult_summary', consult),
+        })
 
     def post(self, request, pk):
         consult = get_object_or_404(ICUConsultation, pk=pk)
         # Mark as submitted
+        newly_submitted = not consult.submitted
         consult.submitted = True
-        consult.save()
+        write_with_retry(submit_consult, consult, newly_submitted)
         return render(request, 'consults/consult_complete.html', {'consult': consult})
 
 
+# ------------------------------
+# Draft Wizard: sections buffered server-side, one write on submit
+# ------------------------------
+WIZARD_STEPS = [
+    ('a', SectionAForm, 'consults/section_a.html'),
+    ('b', SectionBForm, 'consults/section_b.html'),
+    ('c', SectionCForm, 'consults/section_c.html'),
+    ('d', SectionDForm, 'consults/section_d.html'),
+    ('e', SectionEForm, 'consults/section_e.html'),
+    ('f', SectionFForm, 'consults/section_f.html'),
+    ('g', SectionGForm, 'consults/section_g.html'),
+]
+STEP_ORDER = [step for step, _, _ in WIZARD_STEPS]
+STEP_FORMS = {step: (form_class, template) for step, form_class, template in WIZARD_STEPS}
+
+
+def build_draft_consult(store):
+    # Re-validate every buffered section onto one unsaved consult.
+    # Returns (consult, None), or (None, step) for the first step to redo.
+    consult = ICUConsultation()
+    for step, form_class, _ in WIZARD_STEPS:
+        data = store.get(step)
+        if data is None:
+            return None, step
+        form = form_class(data, instance=consult)
+        if not form.is_valid():
+            return None, step
+        form.save(commit=False)
+    return consult, None
+
+
+def render_draft_summary(request, store):
+    consult, missing = build_draft_consult(store)
+    if missing:
+        return redirect('consults:draft_section', step=missing)
+    return store.attach(render(request, 'consults/consult_summary.html', {
+        'consult': consult,
+        'summary_html': render_fragment('consult_summary', consult),
+        'edit_url': reverse('consults:draft_section', args=[STEP_ORDER[-1]]),
+        # Also the answer to the last step's POST, so the URL is not ours to rely on
+        'form_action': reverse('consults:draft_summary'),
+    }))
+
+
+class DraftSectionView(View):
+    def dispatch(self, request, *args, step, **kwargs):
+        if step not in STEP_FORMS:
+            raise Http404("Unknown consult section")
+        return super().dispatch(request, *args, step=step, **kwargs)
+
+    def render_step(self, request, store, step, form=None):
+        form_class, template = STEP_FORMS[step]
+        if form is None:
+            data = store.get(step)
+            form = form_class(data) if data is not None else form_class()
+        index = STEP_ORDER.index(step)
+        return store.attach(render(request, template, {
+            'form': form,
+            'form_action': reverse('consults:draft_section', args=[step]),
+            'back_url': reverse('consults:draft_section', args=[STEP_ORDER[index - 1]]) if index else None,
+            'summary_url': reverse('consults:draft_summary'),
+        }))
+
+    def get(self, request, step):
+        return self.render_step(request, DraftStore(request), step)
+
+    def post(self, request, step):
+        store = DraftStore(request)
+        form_class, _ = STEP_FORMS[step]
+        form = form_class(request.POST)
+        if not form.is_valid():
+            return self.render_step(request, store, step, form)
+
+        store.save(step, request.POST)
+
+        # Answer with the next step directly rather than a redirect + GET
+        index = STEP_ORDER.index(step)
+        if index + 1 < len(STEP_ORDER):
+            return self.render_step(request, store, STEP_ORDER[index + 1])
+        return render_draft_summary(request, store)
+
+
+def submit_draft_consult(consult):
+    consult.save()
+    consult_submitted.send(sender=ICUConsultation, consult=consult)
+
+
+class DraftSummaryView(View):
+    def get(self, request):
+        return render_draft_summary(request, DraftStore(request))
+
+    def post(self, request):
+        store = DraftStore(request)
+        consult, missing = build_draft_consult(store)
+        if missing:
+            return redirect('consults:draft_section', step=missing)
+
+        # The whole consult is written at once, inside one transaction
+        consult.submitted = True
+        write_with_retry(submit_draft_consult, consult)
+        store.clear()
+
+        return render(request, 'consults/consult_complete.html', {
+            'consult': consult,
+            'start_url': reverse('consults:draft_section', args=[STEP_ORDER[0]]),
+        })
+
+
+# ------------------------------
+# Autosave: PATCH the fields a section changed, UPDATE only those columns
+# ------------------------------
+def autosave_form(form_class, consult, patch):
+    # Bind the section as it stands in the database with the patch on top,
+    # so cross-field rules see the whole section
+    unbound = form_class(instance=consult)
+    data = {name: unbound[name].value() for name in unbound.fields}
+    data.update(patch)
+    return form_class(data, instance=consult)
+
+
+@require_http_methods(['PATCH'])
+def autosave_section(request, pk, step):
+    """
+    {field: value} for fields of section `step` -> one UPDATE of the
+    columns that changed. Only errors on the patched fields reject the
+    patch: a half-filled section still autosaves, and the section's POST
+    validates it whole.
+    """
+    # Section A creates the consult, so there is nothing to patch yet
+    if step not in STEP_FORMS or step == STEP_ORDER[0]:
+        raise Http404("Unknown consult section")
+    try:
+        patch = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest("Expected a JSON object")
+    if not isinstance(patch, dict) or not patch:
+        return HttpResponseBadRequest("Expected a JSON object")
+
+    form_class, _ = STEP_FORMS[step]
+    unknown = [name for name in patch if name not in form_class.base_fields]
+    if unknown:
+        return JsonResponse({'errors': {name: ['Not a field of this section.'] for name in unknown}}, status=400)
+
+    consult = get_object_or_404(ICUConsultation, pk=pk)
+    # Form-only inputs (the Section D pupils) are validated but never stored
+    before = {name: getattr(consult, name) for name in section_fields(form_class) if name in patch}
+    before.update((name, getattr(consult, name)) for name in getattr(form_class, 'derived_fields', []))
+    form = autosave_form(form_class, consult, patch)
+    form.is_valid()
+    errors = {name: list(form.errors[name]) for name in patch if name in form.errors}
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    # Leave the rest of the section to its own POST
+    for name in list(form.errors):
+        del form.errors[name]
+
+    form.save(commit=False)
+    saved = [name for name, value in before.items() if getattr(consult, name) != value]
+    if saved:
+        write_with_retry(consult.save, update_fields=saved + ['updated_at'])
+        if consult.submitted and 'severity_score' in saved:
+            severity_changed.send(sender=ICUConsultation, consult=consult)
+        if 'decision' in saved:
+            decision_recorded.send(sender=ICUConsultation, consult=consult)
+    return JsonResponse({'saved': saved, 'updated_at': consult.updated_at})
+
+
 # ------------------------------
 # View All Submitted Summaries (Public)
 # ------------------------------
+# Only the columns the list table shows; the wide TextFields stay on disk
+SUMMARY_LIST_FIELDS = ('id', 'patient_name', 'hospital_number', 'requesting_dr', 'request_datetime')
+
+
+# ?<param>=<value> filters accepted by the list, each backed by an index
+SUMMARY_FILTERS = {
+    'hospital_number': 'hospital_number',
+    'ward': 'ward',
+    'discipline': 'requesting_discipline',
+    'decision': 'decision',
+}
+# ... plus ?age_band=paediatric|adult|elderly (consults/ages.py)
+LIST_FILTER_PARAMS = (*SUMMARY_FILTERS, 'age_band')
+
+
+# ------------------------------
+# Conditional GET validators
+# ------------------------------
+# Each is memoised on the request: the condition() decorator asks for the
+# ETag and Last-Modified separately and we want one cheap query, not two.
+LIST_MARK = {'last_updated': Max('updated_at'), 'total': Count('id')}
+
+
+def list_high_water_mark(request):
+    if not hasattr(request, '_consult_list_mark'):
+        request._consult_list_mark = ICUConsultation.objects.filter(submitted=True).aggregate(**LIST_MARK)
+    return request._consult_list_mark
+
+
+def list_etag(request, *args, **kwargs):
+    mark = list_high_water_mark(request)
+    stamp = mark['last_updated'].isoformat() if mark['last_updated'] else ''
+    # The query string picks the page and filters, so it is part of the tag;
+    # ages and age bands are worked out as of today, so the date is too
+    raw = f"{stamp}|{mark['total']}|{request.GET.urlencode()}|{date.today().isoformat()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def list_last_modified(request, *args, **kwargs):
+    # Never earlier than midnight, so yesterday's copy is not reused today
+    start_of_today = timezone.make_aware(datetime.combine(date.today(), datetime.min.time()))
+    last_updated = list_high_water_mark(request)['last_updated']
+    return max(last_updated, start_of_today) if last_updated else start_of_today
+
+
+def consult_versions():
+    return ICUConsultation.objects.only('id', 'updated_at')
+
+
+def consult_probe(request, id):
+    # Just the id and version; the summary itself comes from the fragment cache
+    if not hasattr(request, '_consult_probe'):
+        request._consult_probe = consult_versions().filter(pk=id).first()
+    return request._consult_probe
+
+
+def consult_etag(request, id):
+    consult = consult_probe(request, id)
+    return hashlib.sha1(f"{id}|{consult.updated_at.isoformat()}".encode()).hexdigest() if consult else None
+
+
+def consult_last_modified(request, id):
+    consult = consult_probe(request, id)
+    return consult.updated_at if consult else None
+
+
+def summary_list_queryset(request):
+    consultations = (
+        ICUConsultation.objects.filter(submitted=True)
+        .only(*SUMMARY_LIST_FIELDS)
+        .annotate(age_years=age_expression())
+    )
+    for param, field in SUMMARY_FILTERS.items():
+        value = request.GET.get(param)
+        if value:
+            consultations = consultations.filter(**{field: value})
+    if request.GET.get('age_band') in AGE_BANDS:
+        consultations = consultations.filter(age_band_q(request.GET['age_band']))
+    return consultations
+
+
+def summary_list_context(request, summaries, next_cursor):
+    # Navigation links keep any other query parameters (page size, filters)
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    first_url = f"?{params.urlencode()}" if 'cursor' in request.GET else None
+    next_url = None
+    if next_cursor:
+        params['cursor'] = next_cursor
+        next_url = f"?{params.urlencode()}"
+    return {
+        'summaries': summaries,
+        'first_url': first_url,
+        'next_url': next_url,
+        # New submissions are pushed only onto the unfiltered newest page
+        'live_feed': 'cursor' not in request.GET and not any(request.GET.get(p) for p in LIST_FILTER_PARAMS),
+    }
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
 def all_summaries(request):
-    consultations = ICUConsultation.objects.filter(submitted=True).order_by('-id')
-    return render(request, 'consults/all_summaries.html', {'summaries': consultations})
+    summaries, next_cursor = keyset_page(
+        summary_list_queryset(request), request.GET.get('cursor'), get_page_size(request),
+    )
+    return render(request, 'consults/all_summaries.html', summary_list_context(request, summaries, next_cursor))
+
+
+# ------------------------------
+# Triage Queue: pending consults, sickest and longest waiting first
+# ------------------------------
+TRIAGE_FIELDS = ('id', 'patient_name', 'hospital_number', 'ward', 'request_datetime', 'severity_score', 'decision')
+DEFAULT_TRIAGE_SIZE = 20
+
+
+def triage_queue(limit):
+    """Return the top `limit` pending consults, sickest then longest waiting."""
+    # triage_priority is maintained by the database on every write and
+    # indexed for exactly this ordering, so the cost is the LIMIT, not the
+    # queue length. Unscored consults (priority -1) come last.
+    return list(
+        ICUConsultation.objects.filter(triage_priority__isnull=False)
+        .order_by('-triage_priority', 'request_datetime', 'id')
+        .only(*TRIAGE_FIELDS)[:limit]
+    )
+
+
+def triage_entry(consult, now):
+    return {
+        'id': consult.pk,
+        'patient_name': consult.patient_name,
+        'hospital_number': consult.hospital_number,
+        'ward': consult.ward,
+        'severity_score': consult.severity_score,
+        'decision': consult.decision,
+        'request_datetime': consult.request_datetime,
+        'waiting_minutes': int((now - consult.request_datetime).total_seconds() // 60),
+        'url': reverse('consults:review_summary', args=[consult.pk]),
+    }
+
+
+def triage_context(request):
+    now = timezone.now()
+    queue = triage_queue(get_page_size(request, default=DEFAULT_TRIAGE_SIZE))
+    return {'queue': [triage_entry(consult, now) for consult in queue]}
+
+
+# Waiting times move with the clock, not just with the consults: the
+# validators change every minute as well, so the once-a-minute poll
+# gets fresh waiting times instead of a 304
+def triage_minute():
+    return timezone.now().replace(second=0, microsecond=0)
+
+
+def triage_etag(request, *args, **kwargs):
+    raw = f"{list_etag(request)}|{triage_minute().isoformat()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def triage_last_modified(request, *args, **kwargs):
+    last_updated = list_last_modified(request)
+    return max(last_updated, triage_minute()) if last_updated else triage_minute()
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=triage_etag, last_modified_func=triage_last_modified)
+def triage(request):
+    return render(request, 'consults/triage.html', triage_context(request))
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=triage_etag, last_modified_func=triage_last_modified)
+def triage_api(request):
+    return JsonResponse(triage_context(request))
+
+
+# ------------------------------
+# Full-text Search over Submitted Summaries
+# ------------------------------
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_size = get_page_size(request, default=20)
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+
+    results, has_next = search_consults(query, SUMMARY_LIST_FIELDS, page, page_size)
+
+    params = request.GET.copy()
+    params['page'] = page - 1
+    previous_url = f"?{params.urlencode()}" if page > 1 else None
+    params['page'] = page + 1
+    next_url = f"?{params.urlencode()}" if has_next else None
+
+    return render(request, 'consults/search.html', {
+        'query': query,
+        'results': results,
+        'previous_url': previous_url,
+        'next_url': next_url,
+    })
 
 
 # ------------------------------
 # Review Single Summary
 # ------------------------------
+@cache_control(no_cache=True)
+@condition(etag_func=consult_etag, last_modified_func=consult_last_modified)
 def review_summary(request, id):
-    consult =get_object_or_404(ICUConsultation, pk=id)
-    return render(request, 'consults/review_summary.html', {'consult': consult})
\ No newline at end of file
+    consult = consult_probe(request, id)
+    if consult is None:
+        raise Http404("No consultation matches the given query.")
+    return render(request, 'consults/review_summary.html', {
+        'consult': consult,
+        'summary_html': summary_fragment('review_summary', consult),
+    })
+
+
+# ------------------------------
+# Printable PDF Summary: rendered by the worker pool, never in the request
+# ------------------------------
+PDF_RETRY_SECONDS = 2
+
+
+def pdf_etag(request, id):
+    consult = consult_probe(request, id)
+    return current_pdf(consult) if consult else None
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=pdf_etag)
+def summary_pdf(request, id):
+    consult = consult_probe(request, id)
+    if consult is None:
+        raise Http404("No consultation matches the given query.")
+    digest = request_summary_pdf(consult)
+    if digest is None:
+        response = HttpResponse("Preparing the PDF; this page reloads when it is ready.", status=202, content_type='text/plain')
+        response['Retry-After'] = response['Refresh'] = PDF_RETRY_SECONDS
+        return response
+    response = FileResponse(open_pdf(digest), content_type='application/pdf', filename=f'consult-{id}.pdf')
+    response['ETag'] = f'"{digest}"'
+    return response
+
+
+# ------------------------------
+# Streaming Export (CSV / NDJSON)
+# ------------------------------
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def export_consults(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_CONTENT_TYPES:
+        return HttpResponseBadRequest(f"Unknown export format {fmt!r}")
+    try:
+        consults = export_queryset(request.GET)
+        columns = export_columns(request.GET.get('columns'))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    response = StreamingHttpResponse(export_stream(fmt, consults, columns), content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="icu_consultations.{fmt}"'
+    return response
+
+
+# ------------------------------
+# Analytics: counts by day, ward, discipline, reason and decision
+# ------------------------------
+MAX_ANALYTICS_DAYS = 366
+
+
+def analytics(request):
+    # Reads only the rollup tables, never the consult table
+    try:
+        days = min(max(int(request.GET.get('days', DEFAULT_ANALYTICS_DAYS)), 1), MAX_ANALYTICS_DAYS)
+    except ValueError:
+        days = DEFAULT_ANALYTICS_DAYS
+    return render(request, 'consults/analytics.html', analytics_summary(days))
+
+
+# ------------------------------
+# Summary Cache Counters
+# ------------------------------
+def summary_cache_stats(request):
+    return JsonResponse(cache_stats())
+
+
+# ------------------------------
+# Per-endpoint timings (staff only)
+# ------------------------------
+@staff_member_required
+def perf_stats(request):
+    report = endpoint_report()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'endpoints': report})
+    return render(request, 'consults/perf.html', {
+        'endpoints': report,
+        'window': ROLLING_WINDOW,
+        'bounds': HISTOGRAM_BOUNDS_MS,
+        'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+    })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'consults.instrumentation.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +57,8 @@ ROOT_URLCONF = 'icu_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, with render times reported to Server-Timing
+        'BACKEND': 'consults.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,6 +85,90 @@ DATABASES = {
     }
 }
 
+# High-concurrency SQLite, on unless CONSULT_SQLITE_CONCURRENT=0: WAL so
+# readers never block the writer, synchronous=NORMAL (durable enough under
+# WAL), writers wait up to CONSULT_SQLITE_TIMEOUT seconds for the lock, and
+# transactions take the write lock up front (BEGIN IMMEDIATE) rather than
+# failing with "database is locked" when a read lock cannot be upgraded.
+SQLITE_CONCURRENT_OPTIONS = {
+    'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': float(os.environ.get('CONSULT_SQLITE_TIMEOUT', '20')),
+}
+if os.environ.get('CONSULT_SQLITE_CONCURRENT', '1') == '1':
+    DATABASES['default']['OPTIONS'] = SQLITE_CONCURRENT_OPTIONS
+
+# Workflow writes that still hit a locked database are retried this many
+# times, with exponential backoff (consults/locking.py)
+CONSULT_DB_LOCK_RETRIES = int(os.environ.get('CONSULT_DB_LOCK_RETRIES', '5'))
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Rendered consult summaries go to the "fragments" cache. Choose its
+# backend with CONSULT_CACHE_BACKEND: "locmem" (per process), "file"
+# (shared by every worker on the box) or "redis" (a local Redis server at
+# CONSULT_REDIS_URL).
+
+CONSULT_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'consult-fragments',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'fragments',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CONSULT_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': CONSULT_CACHE_BACKENDS[os.environ.get('CONSULT_CACHE_BACKEND', 'locmem')],
+}
+
+CONSULT_FRAGMENT_CACHE = 'fragments'
+
+# Printed summaries (consults/printing.py): PDFs stored by SHA-256 under
+# CONSULT_PDF_ROOT, indexed by consult version in CONSULT_PDF_CACHE, laid
+# out by CONSULT_PDF_WORKERS processes (default: one per core)
+CONSULT_PDF_ROOT = Path(os.environ.get('CONSULT_PDF_ROOT', BASE_DIR / 'consult_pdfs'))
+CONSULT_PDF_CACHE = 'fragments'
+CONSULT_PDF_WORKERS = int(os.environ.get('CONSULT_PDF_WORKERS', '0')) or None
+
+
+# Consult wizard
+# CONSULT_DRAFT_WIZARD: send new consults through the draft wizard, which
+# buffers sections A-G in the cache and writes the row once on submit.
+# CONSULT_DRAFT_CACHE: cache alias holding those drafts. Use a shared
+# backend (file or Redis) when running more than one worker process.
+
+CONSULT_DRAFT_WIZARD = False
+CONSULT_DRAFT_CACHE = 'default'
+
+# Server-Timing headers and per-endpoint stats at /perf/
+# (consults/instrumentation.py); CONSULT_SERVER_TIMING=0 turns them off
+CONSULT_SERVER_TIMING = os.environ.get('CONSULT_SERVER_TIMING', '1') == '1'
+
+# CONSULT_ASYNC_VIEWS: serve the section, summary and list pages from
+# consults/async_views.py. Only worth turning on when running under ASGI
+# (icu_project/asgi.py, e.g. uvicorn); under WSGI every async view is run
+# through an event loop per request.
+CONSULT_ASYNC_VIEWS = os.environ.get('CONSULT_ASYNC_VIEWS', '') == '1'
+
+# Live feed (/events/, Server-Sent Events, ASGI only)
+# CONSULT_EVENTS_BROKER: "memory" fans events out within one process;
+# "redis" relays them through Redis pub/sub so every worker process sees
+# every event (needs the redis package).
+CONSULT_EVENTS_BROKER = os.environ.get('CONSULT_EVENTS_BROKER', 'memory')
+CONSULT_EVENTS_REDIS_URL = os.environ.get('CONSULT_REDIS_URL', 'redis://127.0.0.1:6379/1')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,6 +206,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Production static pipeline: collectstatic fingerprints every asset and
+# writes .gz/.br copies next to it (consults/staticfiles.py). Off under
+# DEBUG, where runserver serves files straight from the app directories.
+CONSULT_STATIC_PIPELINE = os.environ.get('CONSULT_STATIC_PIPELINE', '0' if DEBUG else '1') == '1'
+if CONSULT_STATIC_PIPELINE:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'consults.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
+
+# Serve STATIC_ROOT (precompressed, far-future cached) from Django itself;
+# set to 0 when a front-end server such as nginx serves /static/
+CONSULT_SERVE_STATIC = CONSULT_STATIC_PIPELINE and os.environ.get('CONSULT_SERVE_STATIC', '1') == '1'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
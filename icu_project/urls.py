@@ -14,11 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from consults.staticfiles import serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('consults.urls')),  # include consults app urls here
 ]
 
+if settings.CONSULT_SERVE_STATIC:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+    ]